@@ -0,0 +1,204 @@
+"""
+answer_store.py — Batched, rate-limited, persistent AI answers for PYQ questions.
+
+The same classic questions ("Explain deadlock") come back in paper after
+paper, so answers are stored in a local SQLite database keyed by the
+normalized question text (near_duplicates.normalize: case, punctuation and
+marks do not matter) plus the content-hashed diagrams it shows, and are
+generated at most once. The same words asked about a different figure are a
+different question.
+
+Questions missing from the store are answered several per LLM call, as one
+JSON object. Batches run in parallel on a small pool, and every call first
+takes a token from a requests-per-minute bucket so a large analysis cannot
+burst past the provider's rate limit. A question already being answered for
+another request waits for that batch instead of being asked twice.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import telemetry
+from diagram_store import DIAGRAM_RE
+
+ANSWER_DB = os.path.join("data", "pyq_answers.db")
+BATCH_SIZE = int(os.getenv("PYQ_ANSWER_BATCH_SIZE", "8"))          # questions per LLM call
+MAX_CONCURRENCY = int(os.getenv("PYQ_ANSWER_CONCURRENCY", "4"))    # LLM calls in flight
+REQUESTS_PER_MINUTE = float(os.getenv("PYQ_ANSWER_RPM", "30"))     # 0 disables the limit
+ANSWER_TIMEOUT = float(os.getenv("PYQ_ANSWER_TIMEOUT", "60"))      # seconds a caller waits for its batches
+TOKENS_PER_ANSWER = 160
+MAX_ANSWER_CHARS = 1500
+
+
+def answer_key(question: str) -> str:
+    from near_duplicates import normalize
+    key = normalize(question)
+    diagrams = sorted(set(DIAGRAM_RE.findall(question)))
+    if diagrams:
+        key += "|" + ",".join(diagrams)
+    return hashlib.sha1(key.encode()).hexdigest()[:20]
+
+
+def _clean(answer) -> str | None:
+    if not isinstance(answer, str):
+        return None
+    answer = answer.strip()
+    return answer[:MAX_ANSWER_CHARS] or None
+
+
+class RateLimiter:
+    """Token bucket: `per_minute` calls a minute on average, up to `burst` at once."""
+    def __init__(self, per_minute: float = REQUESTS_PER_MINUTE, burst: int = MAX_CONCURRENCY):
+        self.per_minute = per_minute
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.per_minute <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.per_minute / 60)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                delay = (1 - self._tokens) * 60 / self.per_minute
+            time.sleep(delay)
+
+
+class AnswerStore:
+    def __init__(self, db_path: str = ANSWER_DB, batch_size: int = BATCH_SIZE,
+                 max_concurrency: int = MAX_CONCURRENCY, limiter: RateLimiter | None = None,
+                 timeout: float = ANSWER_TIMEOUT):
+        self.db_path = db_path
+        self.batch_size = max(1, batch_size)
+        self.timeout = timeout
+        self.limiter = limiter or RateLimiter()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._inflight = {}  # answer key -> future of the batch answering it
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_concurrency), thread_name_prefix="pyq-answers")
+
+    def _connect(self) -> sqlite3.Connection:
+        # Opened on first use, so constructing the analyzer never touches disk
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS answers ("
+                         "key TEXT PRIMARY KEY, question TEXT NOT NULL, answer TEXT NOT NULL, created REAL NOT NULL)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def lookup(self, keys: list[str]) -> dict:
+        """Stored answers for the given keys (answer key -> answer)."""
+        if not keys:
+            return {}
+        with self._lock:
+            rows = self._connect().execute(
+                f"SELECT key, answer FROM answers WHERE key IN ({','.join('?' * len(keys))})", keys).fetchall()
+        return dict(rows)
+
+    def _save(self, rows: list[tuple]):
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO answers (key, question, answer, created) VALUES (?, ?, ?, ?)",
+                                 [(key, question, answer, time.time()) for key, question, answer in rows])
+
+    def _ask(self, llm, batch: list[tuple]) -> dict:
+        """One LLM call answering every (key, question) in `batch`; stores and returns key -> answer."""
+        numbered = "\n".join(f"{number}. {question[:500]}" for number, (_, question) in enumerate(batch, 1))
+        prompt = (
+            "Answer each numbered exam question directly and concisely in 2-3 sentences. "
+            "Return exactly a JSON object mapping each question number to its answer, no markdown fences, e.g. "
+            '{"1": "...", "2": "..."}\n\n' + numbered
+        )
+        self.limiter.acquire()
+        raw = llm(prompt, max_tokens=TOKENS_PER_ANSWER * len(batch) + 50, task="pyq_answer")
+        match = re.search(r'\{.*\}', raw or "", re.DOTALL)
+        if not match:
+            return {}
+        try:
+            replies = json.loads(match.group())
+        except ValueError:
+            return {}
+        if not isinstance(replies, dict):
+            return {}
+        answers = {}
+        for number, (key, question) in enumerate(batch, 1):
+            answer = _clean(replies.get(str(number)))
+            if answer:
+                answers[key] = (question, answer)
+        if answers:
+            self._save([(key, question, answer) for key, (question, answer) in answers.items()])
+        return {key: answer for key, (_, answer) in answers.items()}
+
+    def answer(self, questions: list[str], llm=None) -> dict:
+        """Answer every question: stored answers first, the rest in batched LLM calls.
+
+        Without `llm` only stored answers are returned. Questions the LLM
+        skipped or did not answer in time are left out (and retried next time).
+        Returns question -> answer.
+        """
+        key_of = {question: answer_key(question) for question in questions if question and question.strip()}
+        by_key = {}
+        for question, key in key_of.items():
+            by_key.setdefault(key, question)
+        answers = self.lookup(list(by_key))
+        for key in by_key:
+            telemetry.cache_lookup("pyq_answer", key in answers)
+
+        missing = [key for key in by_key if key not in answers]
+        futures, submitted = set(), []
+        if missing and llm:
+            with self._lock:
+                to_ask = []
+                for key in missing:
+                    if key in self._inflight:
+                        futures.add(self._inflight[key])  # another request is answering it already
+                    else:
+                        to_ask.append((key, by_key[key]))
+                for start in range(0, len(to_ask), self.batch_size):
+                    batch = to_ask[start:start + self.batch_size]
+                    future = self._executor.submit(self._ask, llm, batch)
+                    for key, _ in batch:
+                        self._inflight[key] = future
+                    submitted.append(([key for key, _ in batch], future))
+                    futures.add(future)
+            # Registered outside the lock: a batch that already finished runs its callback right here
+            for keys, future in submitted:
+                future.add_done_callback(lambda f, keys=keys: self._finish(keys, f))
+
+        done, pending = wait(futures, timeout=self.timeout)
+        if pending:
+            print(f"{len(pending)} answer batch(es) exceeded {self.timeout}s; answering the rest later")
+        for future in done:
+            try:
+                replies = future.result()
+            except Exception as e:
+                print(f"Answer generation error: {e}")
+                continue
+            answers.update({key: answer for key, answer in replies.items() if key in by_key})
+
+        return {question: answers[key] for question, key in key_of.items() if key in answers}
+
+    def _finish(self, keys: list[str], future):
+        with self._lock:
+            for key in keys:
+                if self._inflight.get(key) is future:
+                    del self._inflight[key]
+
+
+answers = AnswerStore()
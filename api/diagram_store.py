@@ -0,0 +1,97 @@
+"""
+diagram_store.py — Content-addressed storage and garbage collection for static/images.
+
+Diagrams are written as diagram_{sha256[:16]}.png, so re-analyzing a paper
+reuses the files it produced before instead of writing fresh copies. Because a
+name always maps to the same bytes, they can be served as immutable.
+
+A stored file's mtime records the last time any analysis produced it (a
+duplicate write refreshes it). The collector deletes diagrams that no root
+references and that have not been produced within the grace period, which
+covers results already handed to clients.
+"""
+
+import hashlib
+import io
+import os
+import re
+import threading
+import time
+import uuid
+
+import scratch
+
+IMAGE_DIR = os.path.join("static", "images")
+GRACE_SECONDS = float(os.getenv("DIAGRAM_GRACE_SECONDS", str(7 * 24 * 3600)))
+DIAGRAM_RE = re.compile(r'diagram_[0-9a-f]{8,64}\.png')
+
+
+def save_png(image, image_dir: str = IMAGE_DIR, resolution: int = 150) -> str:
+    """Store a PIL image as a 256-colour PNG under its content hash; returns the file name."""
+    from PIL import Image
+    buffer = io.BytesIO()
+    image.quantize(256, method=Image.Quantize.FASTOCTREE).convert("P").save(
+        buffer, format="PNG", dpi=(resolution, resolution))
+    data = buffer.getvalue()
+    filename = f"diagram_{hashlib.sha256(data).hexdigest()[:16]}.png"
+    path = os.path.join(image_dir, filename)
+    if os.path.exists(path):
+        os.utime(path)  # produced again: restart its grace period
+        return filename
+    # Write under a temporary name so concurrent workers never serve a partial file
+    tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return filename
+
+
+class DiagramCollector:
+    def __init__(self, image_dir: str = IMAGE_DIR, grace_seconds: float = GRACE_SECONDS):
+        self.image_dir = image_dir
+        self.grace_seconds = grace_seconds
+        self._roots = []
+        self._lock = threading.Lock()
+
+    def add_root(self, provider):
+        """Register a callable returning strings (results, cached text) that may reference diagrams."""
+        self._roots.append(provider)
+
+    def referenced(self) -> set:
+        names = set()
+        for provider in self._roots:
+            try:
+                for text in provider():
+                    names.update(DIAGRAM_RE.findall(text))
+            except Exception as e:
+                # A failing root must not let its diagrams be collected
+                raise RuntimeError(f"Diagram root {provider!r} failed: {e}") from e
+        return names
+
+    def collect(self) -> int:
+        """Delete unreferenced diagrams past the grace period; returns bytes reclaimed."""
+        if not os.path.isdir(self.image_dir):
+            return 0
+        with self._lock:
+            referenced = self.referenced()
+            cutoff = time.time() - self.grace_seconds
+            reclaimed = 0
+            for name in os.listdir(self.image_dir):
+                path = os.path.join(self.image_dir, name)
+                stale_tmp = name.endswith(".tmp")
+                if not (DIAGRAM_RE.fullmatch(name) or stale_tmp) or name in referenced:
+                    continue
+                try:
+                    stat = os.stat(path)
+                    if stat.st_mtime > cutoff:
+                        continue
+                    os.remove(path)
+                except OSError:
+                    continue
+                reclaimed += stat.st_size
+                scratch.RECLAIMED_BYTES.inc(stat.st_size, reason="diagram_gc")
+                scratch.RECLAIMED_FILES.inc(reason="diagram_gc")
+            return reclaimed
+
+
+collector = DiagramCollector()
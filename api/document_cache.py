@@ -0,0 +1,101 @@
+"""
+document_cache.py — Per-document PYQ extraction cache.
+
+Past papers are uploaded again and again. The parsed questions, the diagrams
+the text references and a short sample of its lines are stored per document
+(the full text is not), keyed by the SHA-256 of the file bytes plus
+EXTRACTOR_VERSION, as one JSON file each under data/pyq_cache. Least recently
+used entries are evicted past a size bound.
+
+Bump EXTRACTOR_VERSION whenever extraction or question parsing changes output;
+entries written by older versions are then never hit and age out.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import uuid
+
+EXTRACTOR_VERSION = "4"
+CACHE_DIR = os.path.join("data", "pyq_cache")
+CACHE_MAX_BYTES = int(os.getenv("PYQ_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+
+def file_key(file_path: str) -> str:
+    """Content key for a document: SHA-256 of its bytes, its type, and the extractor version."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    ext = file_path.rsplit('.', 1)[-1].lower()
+    return f"{digest.hexdigest()}-{ext}-v{EXTRACTOR_VERSION}"
+
+
+class DocumentCache:
+    def __init__(self, directory: str = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> dict | None:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            os.utime(path)  # mtime doubles as LRU recency
+            return entry
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key: str, entry: dict):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _entries(self) -> list[tuple[float, int, str]]:
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _evict(self):
+        with self._lock:
+            entries = self._entries()
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
+
+    def diagram_refs(self):
+        """Diagram file names referenced by cached documents (a diagram GC root)."""
+        for _, _, path in self._entries():
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    yield " ".join(json.load(f).get("diagrams", []))
+            except (OSError, ValueError):
+                continue
+
+
+cache = DocumentCache()
@@ -13,8 +13,22 @@ from fastapi.middleware.cors import CORSMiddleware
 import uuid
 import shutil
 import json
+import hashlib
+import threading
 import processor
+import scratch
+import telemetry
 from pyq_analyzer import PYQAnalyzer
+from pyq_jobs import JobCancelled, jobs as pyq_jobs
+from singleflight import SingleFlight, text_key, upload_key, youtube_key
+from diagram_store import collector as diagram_collector
+from document_cache import cache as document_cache
+from pyq_index import index as question_index
+from user_store import UserStore
+from token_cache import TokenCache
+from scheduler import FairScheduler, AdmissionError, parse_weights
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 
 from fastapi.staticfiles import StaticFiles
 from fastapi import Header, HTTPException, Depends
@@ -23,10 +37,11 @@ from jose import JWTError, jwt
 from pydantic import BaseModel, EmailStr
 
 from fastapi import FastAPI, BackgroundTasks, UploadFile, File, Form, HTTPException, Request
-from fastapi.responses import HTMLResponse, JSONResponse, FileResponse
+from fastapi.responses import HTMLResponse, JSONResponse, FileResponse, PlainTextResponse
 from pydantic import BaseModel, Field, HttpUrl
 from typing import List, Optional, Dict, Any
 from fastapi.openapi.docs import get_swagger_ui_html, get_redoc_html
+from fastapi.concurrency import run_in_threadpool
 
 UPLOAD_FOLDER = os.path.join(project_root, "uploads")
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
@@ -62,6 +77,10 @@ class TaskResponse(BaseModel):
     result: Optional[LectureResult] = None
     error: Optional[str] = None
     wordCount: Optional[int] = None
+    queue_position: Optional[int] = None
+
+class PYQAnswerRequest(BaseModel):
+    questions: List[str] = Field(..., example=["Explain deadlock and its necessary conditions."])
 
 # --- Security Configuration ---
 SECRET_KEY = "lecgen_ai_secret_key_change_me"
@@ -74,8 +93,13 @@ if not os.path.exists(DATA_DIR):
     os.makedirs(DATA_DIR)
 
 USERS_FILE = os.path.join(DATA_DIR, "users.json")
+USERS_DB = os.path.join(DATA_DIR, "users.db")
 HISTORY_FILE = os.path.join(DATA_DIR, "history.json")
 
+# bcrypt is deliberately slow; run it off the event loop on a small bounded pool
+AUTH_WORKERS = int(os.getenv("AUTH_WORKERS", "2"))
+auth_executor = ThreadPoolExecutor(max_workers=AUTH_WORKERS, thread_name_prefix="bcrypt")
+
 class UserCreate(BaseModel):
     email: EmailStr
     password: str
@@ -89,20 +113,9 @@ class User(BaseModel):
     email: str
     name: str
 
-def load_users():
-    if os.path.exists(USERS_FILE):
-        try:
-            with open(USERS_FILE, "r") as f:
-                return json.load(f)
-        except:
-            return {}
-    return {}
-
-def save_users(users_data):
-    with open(USERS_FILE, "w") as f:
-        json.dump(users_data, f, indent=4)
-
-users = load_users()
+# Indexed user store; users.json is imported once on first start
+users = UserStore(USERS_DB, legacy_json=USERS_FILE)
+token_cache = TokenCache(max_size=int(os.getenv("TOKEN_CACHE_SIZE", "1024")))
 
 def get_password_hash(password):
     return pwd_context.hash(password)
@@ -110,6 +123,14 @@ def get_password_hash(password):
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
+async def hash_password_async(password):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(auth_executor, get_password_hash, password)
+
+async def verify_password_async(plain_password, hashed_password):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(auth_executor, verify_password, plain_password, hashed_password)
+
 def create_access_token(data: dict):
     to_encode = data.copy()
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
@@ -118,11 +139,15 @@ async def get_current_user(authorization: Optional[str] = Header(None)):
     if not authorization or not authorization.startswith("Bearer "):
         return None
     token = authorization.split(" ")[1]
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
         if email is None:
             return None
+        token_cache.put(token, email, payload.get("exp"))
         return email
     except JWTError:
         return None
@@ -148,16 +173,60 @@ app = FastAPI(
         "url": "https://github.com/Shridipa/LecGenAI",
     }
 )
-pyq_analyzer = PYQAnalyzer()
+# The PYQ stack (pandas, scikit-learn, pdfplumber, ...) loads on first use
+_pyq_analyzer = None
+_pyq_analyzer_lock = threading.Lock()
+
+def get_pyq_analyzer() -> PYQAnalyzer:
+    global _pyq_analyzer
+    if _pyq_analyzer is None:
+        with _pyq_analyzer_lock:
+            if _pyq_analyzer is None:
+                _pyq_analyzer = PYQAnalyzer()
+    return _pyq_analyzer
+
+class ImmutableStaticFiles(StaticFiles):
+    """Static files whose names are content hashes, so clients may cache them forever."""
+    async def get_response(self, path, scope):
+        response = await super().get_response(path, scope)
+        if response.status_code == 200:
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
 
 # Ensure static directory exists
 os.makedirs("static/images", exist_ok=True)
+app.mount("/static/images", ImmutableStaticFiles(directory="static/images"), name="diagrams")
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 
 @app.on_event("startup")
 async def startup_event():
     print("🚀 LecGen AI Engine ONLINE — Groq API ready (no local model warmup needed)")
+    scratch.space.add_root(UPLOAD_FOLDER)
+    # Diagrams referenced by any stored result survive garbage collection
+    diagram_collector.add_root(
+        lambda: (json.dumps(task["result"]) for task in list(tasks.values()) if task.get("result")))
+    # PYQ roots read the on-disk cache and index directly, without building the analyzer
+    diagram_collector.add_root(document_cache.diagram_refs)
+    diagram_collector.add_root(question_index.diagram_refs)
+    scratch.space.add_sweep_hook(diagram_collector.collect)
+    scratch.space.start_sweeper()
+    # Opt-in: video searches for known syllabus topics are cached before the first PYQ request needs them
+    from resource_lookup import WARM_LIMIT, WARM_TOPICS
+    if WARM_TOPICS or WARM_LIMIT > 0:
+        asyncio.get_running_loop().run_in_executor(None, warm_pyq_resources)
+
+
+def warm_pyq_resources():
+    from resource_lookup import WARM_LIMIT, WARM_TOPICS, lookup as resource_lookup
+    try:
+        topics = WARM_TOPICS + (question_index.topics(WARM_LIMIT) if WARM_LIMIT > 0 else [])
+    except Exception as e:
+        print(f"Could not read indexed PYQ topics: {e}")
+        topics = WARM_TOPICS
+    started = resource_lookup.prefetch(topics)
+    if started:
+        print(f"Prefetching video resources for {started} PYQ topics")
 
 
 # Enable CORS for React frontend
@@ -223,6 +292,11 @@ async def api_reference():
 async def ping():
     return {"status": "ok"}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus text exposition of pipeline timings, tokens, queue and cache metrics."""
+    return PlainTextResponse(telemetry.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 # --- SPA (Single Page Application) Serving ---
 @app.get("/", tags=["UI"])
 async def serve_index():
@@ -240,11 +314,9 @@ async def signup(user_data: UserCreate):
     if user_data.email in users:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    users[user_data.email] = {
-        "password": get_password_hash(user_data.password),
-        "name": user_data.name
-    }
-    save_users(users)
+    password_hash = await hash_password_async(user_data.password)
+    if not users.add(user_data.email, password_hash, user_data.name):
+        raise HTTPException(status_code=400, detail="Email already registered")
     
     access_token = create_access_token(data={"sub": user_data.email})
     return {"access_token": access_token, "token_type": "bearer", "user": {"email": user_data.email, "name": user_data.name}}
@@ -252,7 +324,7 @@ async def signup(user_data: UserCreate):
 @app.post("/auth/login", tags=["Authentication"])
 async def login(user_data: UserLogin):
     user = users.get(user_data.email)
-    if not user or not verify_password(user_data.password, user["password"]):
+    if not user or not await verify_password_async(user_data.password, user["password"]):
         raise HTTPException(status_code=400, detail="Incorrect email or password")
     
     access_token = create_access_token(data={"sub": user_data.email})
@@ -262,7 +334,7 @@ async def login(user_data: UserLogin):
 async def get_me(current_user: str = Depends(get_current_user)):
     if not current_user:
         raise HTTPException(status_code=401, detail="Unauthorized")
-    user = users.get(current_user)
+    user = users.get(current_user) or {}
     return {"email": current_user, "name": user.get("name", "User")}
 
 # --- Modified History Endpoint ---
@@ -292,14 +364,38 @@ async def get_task_status(task_id: str):
     Check the current status and get results of a specific processing task.
     
     ### Statuses:
-    - **pending**: Task is in queue.
+    - **queued**: Task is waiting for a worker; `queue_position` shows its place in line.
     - **processing/compressing**: AI is analyzing content.
     - **completed**: Results are ready.
     - **failed**: An error occurred.
     """
     if task_id not in tasks:
         raise HTTPException(status_code=404, detail="Task not found")
-    return tasks[task_id]
+    task = tasks[task_id]
+    run_id = task_id
+    leader = tasks.get(task.get("coalesced_with"))
+    if leader and "result" not in task and task.get("status") != "failed":
+        # Follower of an in-flight run: report the shared pipeline's progress
+        run_id = task["coalesced_with"]
+        task = {**task, "status": leader.get("status", task.get("status"))}
+    if task.get("status") == "queued":
+        return {**task, "queue_position": scheduler.position(run_id)}
+    return task
+
+@app.get("/tasks/{task_id}/timeline", tags=["Task Management"])
+async def get_task_timeline(task_id: str):
+    """
+    Stage-by-stage timeline of a processing task: stage name, start offset and
+    duration in seconds, bytes and LLM tokens, with the parallel LLM calls nested.
+    """
+    if task_id not in tasks:
+        raise HTTPException(status_code=404, detail="Task not found")
+    run_id = tasks[task_id].get("coalesced_with") or task_id
+    if "timeline" in tasks[task_id]:
+        return tasks[task_id]["timeline"]
+    if run_id in running_timelines:
+        return running_timelines[run_id].to_dict()
+    raise HTTPException(status_code=404, detail="Timeline not available yet")
 
 @app.delete("/history/{task_id}", tags=["History Management"])
 async def delete_history_item(task_id: str):
@@ -320,15 +416,17 @@ async def download_history_result(task_id: str):
     title = tasks[task_id].get("title", "lecture_analysis")
     safe_title = "".join([c if c.isalnum() else "_" for c in title])
     
-    temp_json = f"temp_{task_id}.json"
+    temp_json = os.path.join(UPLOAD_DIR, f"temp_{task_id}.json")
     with open(temp_json, "w") as f:
         json.dump(result_data, f, indent=4)
     
     from fastapi.responses import FileResponse
+    from starlette.background import BackgroundTask
     return FileResponse(
         temp_json, 
         media_type='application/json', 
-        filename=f"{safe_title}.json"
+        filename=f"{safe_title}.json",
+        background=BackgroundTask(os.remove, temp_json)
     )
 
 
@@ -355,28 +453,131 @@ def compress_file(input_path):
     ]
     
     try:
-        subprocess.run(cmd, check=True, capture_output=True)
+        with telemetry.stage("compress"):
+            telemetry.annotate(bytes=os.path.getsize(input_path))
+            subprocess.run(cmd, check=True, capture_output=True)
+        scratch.track(output_path)
         return output_path if os.path.exists(output_path) else input_path
     except:
         return input_path
 
-def run_processing_task(task_id: str, source_type: str, data: str, target_lang: str = 'en'):
+# Identical in-flight submissions share one pipeline run
+inflight = SingleFlight()
+FINAL_FIELDS = ("status", "result", "error", "date", "wordCount", "timeline")
+# Timelines of tasks still running, so /tasks/{id}/timeline can show live progress
+running_timelines: Dict[str, telemetry.Timeline] = {}
+
+# Admission control and fair queuing for the processing pipeline
+scheduler = FairScheduler(
+    max_workers=int(os.getenv("MAX_CONCURRENT_JOBS", "2")),
+    max_queue_depth=int(os.getenv("MAX_QUEUE_DEPTH", "50")),
+    max_jobs_per_user=int(os.getenv("MAX_JOBS_PER_USER", "3")),
+    user_weights=parse_weights(os.getenv("SCHEDULER_USER_WEIGHTS", "")),
+)
+TASKS_FINISHED = telemetry.REGISTRY.counter(
+    "lecgen_tasks_finished_total", "Processing tasks finished, by source type and final status.")
+telemetry.REGISTRY.gauge("lecgen_queue_depth", "Processing jobs waiting for a worker.", callback=scheduler.queue_depth)
+telemetry.REGISTRY.gauge("lecgen_active_tasks", "Processing jobs currently running.", callback=scheduler.active)
+telemetry.REGISTRY.gauge("lecgen_inflight_sources", "Distinct sources being processed (coalescing leaders).", callback=inflight.in_flight)
+YOUTUBE_JOB_COST = 20.0  # Video length is unknown up front; assume a long lecture
+
+def estimate_cost(source_type: str, data: str) -> float:
+    """Rough relative cost used for fair scheduling: short text ≈ 1, media scales with size."""
+    if source_type == "text":
+        return 1.0 + len(data) / 50_000
+    if source_type == "youtube":
+        return YOUTUBE_JOB_COST
+    size_mb = os.path.getsize(data) / (1024 * 1024) if os.path.exists(data) else 0
+    return 2.0 + size_mb
+
+def client_key(request: Request, current_user: Optional[str]) -> str:
+    """Identity used for per-user quotas; anonymous clients are keyed by address."""
+    if current_user:
+        return current_user
+    host = request.client.host if request.client else "unknown"
+    return f"anon:{host}"
+
+def too_busy(e: AdmissionError) -> HTTPException:
+    return HTTPException(status_code=429, detail=e.reason, headers={"Retry-After": str(e.retry_after)})
+
+def submit_task(task_id: str, user_key: str, source_key: str, source_type: str, data: str) -> bool:
+    """
+    Queue a processing task unless the same source is already in flight.
+    Returns True if the task was attached to an existing run instead of queued.
+    Raises AdmissionError (and forgets the task) if the scheduler is saturated.
+    """
+    leader_id = inflight.join(source_key, task_id)
+    telemetry.cache_lookup("singleflight", leader_id is not None)
+    if leader_id is not None:
+        tasks[task_id]["coalesced_with"] = leader_id
+        save_history()
+        return True
+    tasks[task_id]["source_key"] = source_key
+    tasks[task_id]["status"] = "queued"
+    try:
+        scheduler.submit(task_id, user_key, estimate_cost(source_type, data),
+                         run_processing_task, task_id, tasks[task_id], source_type, data)
+    except AdmissionError as e:
+        tasks[task_id]["status"] = "failed"
+        tasks[task_id]["error"] = e.reason
+        finish_task(task_id)
+        del tasks[task_id]
+        raise
+    save_history()
+    return False
+
+def finish_task(task_id: str, task: dict | None = None):
+    """Release the task's source key and copy its outcome to every attached follower."""
+    task = task if task is not None else tasks.get(task_id)
+    source_key = task.pop("source_key", None) if task else None
+    if source_key is None:
+        return
+    for follower_id in inflight.finish(source_key, task_id):
+        if follower_id not in tasks:
+            continue
+        for field in FINAL_FIELDS:
+            if field in task:
+                tasks[follower_id][field] = task[field]
+
+def run_processing_task(task_id: str, task: dict, source_type: str, data: str, target_lang: str = 'en'):
+    # `task` is the task's own record: if the task is deleted from history while
+    # queued or running, the run still finishes, releases its source key and
+    # hands its result to any followers
+    timeline = telemetry.Timeline(task_id=task_id, source=source_type)
+    running_timelines[task_id] = timeline
+    try:
+        with scratch.owned_by(task_id), timeline.activate(), telemetry.stage("task", source=source_type):
+            _run_pipeline(task, source_type, data)
+    except Exception as e:
+        task["status"] = "failed"
+        task["error"] = str(e)
+    finally:
+        try:
+            task["timeline"] = timeline.to_dict()
+            finish_task(task_id, task)
+        finally:
+            running_timelines.pop(task_id, None)
+            TASKS_FINISHED.inc(source=source_type, status=task.get("status", "unknown"))
+            scratch.release(task_id)
+            save_history()
+
+def _run_pipeline(task: dict, source_type: str, data: str):
     # Tiered Compression Logic (Only for Media)
     is_media = source_type in ["video", "audio", "upload", "youtube"]
     if is_media and os.path.exists(data):
         size = os.path.getsize(data)
         if size > MAX_FILE_SIZE:
              # > 10MB: Explicit notification
-            tasks[task_id]["status"] = "compressing"
+            task["status"] = "compressing"
             save_history()
             data = compress_file(data)
         elif size < SILENT_COMPRESS_SIZE:
             # < 5MB: Silent auto-compression
-            tasks[task_id]["status"] = "optimizing" 
+            task["status"] = "optimizing" 
             save_history()
             data = compress_file(data)
             
-    tasks[task_id]["status"] = "processing"
+    task["status"] = "processing"
     save_history()
     
     try:
@@ -384,24 +585,22 @@ def run_processing_task(task_id: str, source_type: str, data: str, target_lang:
         result = processor.process_lecture(source_type, data, target_lang="en")
         
         if result:
-            tasks[task_id]["status"] = "completed"
-            tasks[task_id]["result"] = result
-            tasks[task_id]["date"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            task["status"] = "completed"
+            task["result"] = result
+            task["date"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             # Calculate word count for history view
             transcript = result.get('transcript', '')
-            tasks[task_id]["wordCount"] = len(transcript.split())
+            task["wordCount"] = len(transcript.split())
         else:
-            tasks[task_id]["status"] = "failed"
-            tasks[task_id]["error"] = "AI Engine failed to extract content."
+            task["status"] = "failed"
+            task["error"] = "AI Engine failed to extract content."
     except Exception as e:
-        tasks[task_id]["status"] = "failed"
-        tasks[task_id]["error"] = str(e)
-    
-    save_history()
+        task["status"] = "failed"
+        task["error"] = str(e)
 
 @app.post("/process/youtube", tags=["Processing"])
 async def process_youtube(
-    background_tasks: BackgroundTasks, 
+    request: Request,
     url: str = Form(...),
     current_user: Optional[str] = Depends(get_current_user)
 ):
@@ -416,22 +615,40 @@ async def process_youtube(
         "title": url.split('=')[-1] if '=' in url else "YouTube Lecture",
         "user_email": current_user
     }
-    background_tasks.add_task(run_processing_task, task_id, "youtube", url)
-    return {"task_id": task_id}
+    source_key = youtube_key(url, processor.youtube_video_id(url))
+    try:
+        coalesced = submit_task(task_id, client_key(request, current_user), source_key, "youtube", url)
+    except AdmissionError as e:
+        raise too_busy(e)
+    return {"task_id": task_id, "coalesced": coalesced}
 
 @app.post("/process/file", tags=["Processing"])
 async def process_file(
-    background_tasks: BackgroundTasks, 
+    request: Request,
     file: UploadFile = File(...),
     current_user: Optional[str] = Depends(get_current_user)
 ):
     """
     Upload and process an audio or video file.
     """
+    user_key = client_key(request, current_user)
+    # Refuse before writing anything to uploads/ when saturated
+    try:
+        scheduler.check_admission(user_key)
+    except AdmissionError as e:
+        raise too_busy(e)
+
     task_id = str(uuid.uuid4())
     file_path = os.path.join(UPLOAD_DIR, f"{task_id}_{file.filename}")
+    # Hash while copying so duplicate uploads can be coalesced without a second read
+    digest = hashlib.sha256()
     with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+        while chunk := file.file.read(1024 * 1024):
+            digest.update(chunk)
+            buffer.write(chunk)
+            telemetry.UPLOAD_BYTES.inc(len(chunk), endpoint="process_file")
+    # Owned by the task from the start, so a queued upload is never swept
+    scratch.track(file_path, owner=task_id)
     
     tasks[task_id] = {
         "status": "processing",
@@ -440,12 +657,19 @@ async def process_file(
         "title": file.filename,
         "user_email": current_user
     }
-    background_tasks.add_task(run_processing_task, task_id, "upload", file_path)
-    return {"task_id": task_id}
+    try:
+        coalesced = submit_task(task_id, user_key, upload_key(digest.hexdigest()), "upload", file_path)
+    except AdmissionError as e:
+        scratch.release(task_id)
+        raise too_busy(e)
+    if coalesced:
+        # The leader already holds an identical copy
+        scratch.release(task_id)
+    return {"task_id": task_id, "coalesced": coalesced}
 
 @app.post("/process/text", tags=["Processing"])
 async def process_text(
-    background_tasks: BackgroundTasks, 
+    request: Request,
     text: str = Form(...),
     current_user: Optional[str] = Depends(get_current_user)
 ):
@@ -460,96 +684,238 @@ async def process_text(
         "title": f"Text: {text[:20]}...",
         "user_email": current_user
     }
-    background_tasks.add_task(run_processing_task, task_id, "text", text)
-    return {"task_id": task_id}
+    try:
+        coalesced = submit_task(task_id, client_key(request, current_user), text_key(text), "text", text)
+    except AdmissionError as e:
+        raise too_busy(e)
+    return {"task_id": task_id, "coalesced": coalesced}
 
 @app.post("/translate/{task_id}", tags=["Knowledge Translation"])
 async def translate_task_result(task_id: str, target_lang: str = Form(...)):
     """
     Translate an existing analysis result into a different language.
-    Utilizes high-speed cloud translation services.
+    Translations are cached per language alongside the original result, so
+    switching back and forth between languages is instant.
     """
     if task_id not in tasks or "result" not in tasks[task_id]:
         raise HTTPException(status_code=404, detail="Task result not found")
-        
-    tasks[task_id]["status"] = "translating"
-    save_history()
     
-    try:
-        # Perform translation on existing result
-        translated_result = processor.translate_result(tasks[task_id]["result"], target_lang)
-        tasks[task_id]["result"] = translated_result
-        tasks[task_id]["status"] = "completed"
-        tasks[task_id]["language"] = target_lang
-        save_history()
-        return {"status": "success", "result": translated_result}
-    except Exception as e:
-        tasks[task_id]["status"] = "completed" # Reset to completed even if translation fails
-        raise HTTPException(status_code=500, detail=str(e))
+    task = tasks[task_id]
+    original = task["result"]
+    if target_lang == original.get("language", "en"):
+        task["language"] = target_lang
+        return {"status": "success", "result": original}
+
+    translations = task.setdefault("translations", {})
+    cached = translations.get(target_lang)
+    telemetry.cache_lookup("translation", cached is not None)
+    if cached is None:
+        try:
+            # LLM calls are blocking; keep them off the event loop
+            cached = await run_in_threadpool(processor.translate_result, original, target_lang)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        if cached.get("translation_incomplete"):
+            # Partial output is returned but not cached, so a retry can complete it
+            return {"status": "success", "result": cached}
+        translations[target_lang] = cached
+
+    task["language"] = target_lang
+    save_history()
+    return {"status": "success", "result": cached}
 
 from typing import List
 
+PYQ_DRIVE_JOB_COST = 10.0  # Drive folder size is unknown up front
+
 @app.post("/analyze/pyq", tags=["Exam Preparation"])
-def analyze_pyq(files: List[UploadFile] = File(default=None), drive_link: str = Form(default=None)):
+def analyze_pyq(request: Request, files: List[UploadFile] = File(default=None), drive_link: str = Form(default=None),
+                subject: str = Form(default=None), answers: str = Form(default="eager"),
+                current_user: Optional[str] = Depends(get_current_user)):
     """
-    Perform a Previous Year Question (PYQ) analysis.
+    Start a Previous Year Question (PYQ) analysis job and return its ID immediately.
     Accepts direct file uploads or a Google Drive link containing multiple documents.
+    An optional subject adds the papers to that subject's persistent topic model.
+    With answers=lazy only stored AI answers are included; fetch the rest per topic from /analyze/pyq/answers.
+    Poll GET /analyze/pyq/{job_id} for progress and topic sections; DELETE it to cancel.
     """
-    import traceback
+    if answers not in ("eager", "lazy"):
+        raise HTTPException(status_code=400, detail="answers must be 'eager' or 'lazy'")
     with open("pyq_crash_log.txt", "a") as f:
         f.write(f"\n--- New Request: files={bool(files)}, drive_link={drive_link} ---\n")
+    user_key = client_key(request, current_user)
+    # Refuse before writing anything to uploads/ when saturated
     try:
-        temp_files = []
-        
-        # 1. Handle File Uploads
-        if files:
-            with open("pyq_crash_log.txt", "a") as f: f.write(f"Processing {len(files)} files...\n")
-            for file in files:
-                file_ext = file.filename.split(".")[-1].lower()
-                if file_ext in ['pdf', 'docx', 'txt', 'csv']:
-                    temp_path = os.path.join(UPLOAD_FOLDER, f"pyq_{uuid.uuid4().hex}.{file_ext}")
-                    with open(temp_path, "wb") as buffer:
-                        shutil.copyfileobj(file.file, buffer)
-                    temp_files.append(temp_path)
-            with open("pyq_crash_log.txt", "a") as f: f.write(f"Files saved: {temp_files}\n")
-
-        # 2. Handle Google Drive Link
-        if drive_link:
-            with open("pyq_crash_log.txt", "a") as f: f.write(f"Processing drive link: {drive_link}\n")
-            clean_link = drive_link.strip()
-            drive_files = pyq_analyzer.process_drive_link(clean_link, UPLOAD_FOLDER)
-            temp_files.extend(drive_files)
-            with open("pyq_crash_log.txt", "a") as f: f.write(f"Drive files: {drive_files}\n")
-            
-        if not temp_files:
-             with open("pyq_crash_log.txt", "a") as f: f.write("No files provided, raising 400.\n")
-             raise HTTPException(status_code=400, detail="No valid files provided. Upload files or provide a valid Google Drive link.")
-        
-        # 3. Analyze content
-        with open("pyq_crash_log.txt", "a") as f: f.write(f"Starting full analysis on {temp_files}...\n")
-        result = pyq_analyzer.perform_full_analysis(temp_files)
-        with open("pyq_crash_log.txt", "a") as f: f.write("Analysis successful!\n")
-        
-        # Cleanup
-        for path in temp_files:
-            if os.path.exists(path):
-                try:
-                    os.remove(path)
-                except:
-                    pass
-            
-        return result
+        scheduler.check_admission(user_key)
+    except AdmissionError as e:
+        raise too_busy(e)
+
+    job = pyq_jobs.create(user_key)
+    temp_files = []
+    sources = []  # display name per file, for question provenance
+    for file in files or []:
+        file_ext = file.filename.split(".")[-1].lower()
+        if file_ext in ['pdf', 'docx', 'txt', 'csv']:
+            temp_path = os.path.join(UPLOAD_FOLDER, f"pyq_{uuid.uuid4().hex}.{file_ext}")
+            # Owned by the job from the start, so a queued upload is never swept
+            scratch.track(temp_path, owner=job.id)
+            with open(temp_path, "wb") as buffer:
+                shutil.copyfileobj(file.file, buffer)
+            telemetry.UPLOAD_BYTES.inc(os.path.getsize(temp_path), endpoint="analyze_pyq")
+            temp_files.append(temp_path)
+            sources.append(file.filename)
+    drive_link = (drive_link or "").strip() or None
+
+    if not temp_files and not drive_link:
+        scratch.release(job.id)
+        pyq_jobs.discard(job.id)
+        raise HTTPException(status_code=400, detail="No valid files provided. Upload files or provide a valid Google Drive link.")
+
+    cost = 2.0 + sum(os.path.getsize(path) for path in temp_files) / (1024 * 1024)
+    if drive_link:
+        cost += PYQ_DRIVE_JOB_COST
+    try:
+        scheduler.submit(job.id, user_key, cost, run_pyq_job, job, temp_files, sources, drive_link, subject, answers)
+    except AdmissionError as e:
+        scratch.release(job.id)
+        pyq_jobs.discard(job.id)
+        raise too_busy(e)
+    return {"job_id": job.id, "status": job.status, "queue_position": scheduler.position(job.id)}
+
+def run_pyq_job(job, temp_files, sources, drive_link, subject, answers):
+    import traceback
+    try:
+        job.check()
+        with scratch.owned_by(job.id):
+            if drive_link:
+                job.advance("download")
+                with telemetry.stage("pyq_drive_download"):
+                    drive_files = get_pyq_analyzer().process_drive_link(drive_link, UPLOAD_FOLDER)
+                temp_files = temp_files + drive_files
+                sources = sources + [os.path.basename(path) for path in drive_files]
+            if not temp_files:
+                job.finish("failed", error="No valid files found at the Google Drive link.")
+                return
+            result = get_pyq_analyzer().perform_full_analysis(temp_files, sources, subject, answers, job=job)
+        if "error" in result:
+            job.finish("failed", error=result["error"])
+        else:
+            job.finish("completed", result)
+    except JobCancelled:
+        job.finish("cancelled")
     except Exception as e:
-        with open("pyq_crash_log.txt", "a") as f: 
+        with open("pyq_crash_log.txt", "a") as f:
             f.write(f"EXCEPTION CAUGHT:\n{traceback.format_exc()}\n")
-        # Cleanup on error too
-        for path in temp_files:
-            if os.path.exists(path):
-                try:
-                    os.remove(path)
-                except:
-                    pass
-        raise HTTPException(status_code=500, detail=str(e))
+        job.finish("failed", error=str(e))
+    finally:
+        TASKS_FINISHED.inc(source="pyq", status=job.status)
+        # Uploads and Drive downloads are deleted whether or not analysis succeeded
+        scratch.release(job.id)
+
+MAX_ANSWER_QUESTIONS = 20
+PYQ_ANSWER_WAIT = float(os.getenv("PYQ_ANSWER_WAIT", "90"))  # seconds a request waits for generated answers
+# On-demand answer batches are short LLM calls (answer_store rate-limits them), so they get their own
+# small pool instead of queuing behind lecture and PYQ jobs and counting against the job quota
+PYQ_ANSWER_WORKERS = int(os.getenv("PYQ_ANSWER_WORKERS", "2"))
+PYQ_ANSWER_BATCHES_PER_USER = int(os.getenv("PYQ_ANSWER_BATCHES_PER_USER", "4"))
+answer_executor = ThreadPoolExecutor(max_workers=PYQ_ANSWER_WORKERS, thread_name_prefix="pyq-answers")
+answer_batches: Dict[str, int] = {}  # client -> answer batches queued or running
+answer_batches_lock = threading.Lock()
+
+def generate_answers(user: str, analyzer, questions: List[str]) -> Dict[str, str]:
+    try:
+        return analyzer.answer_questions(questions)
+    except Exception as e:
+        print(f"Answer generation error: {e}")
+        return {}
+    finally:
+        with answer_batches_lock:
+            remaining = answer_batches.get(user, 1) - 1
+            if remaining > 0:
+                answer_batches[user] = remaining
+            else:
+                answer_batches.pop(user, None)
+
+@app.post("/analyze/pyq/answers", tags=["Exam Preparation"])
+async def answer_pyq_questions(
+    body: PYQAnswerRequest,
+    request: Request,
+    current_user: Optional[str] = Depends(get_current_user)
+):
+    """
+    AI answers for one topic's questions, on demand. Stored answers return immediately;
+    the rest are generated in batched LLM calls and stored for every later request.
+    Each client may have `PYQ_ANSWER_BATCHES_PER_USER` batches generating at once, then gets `429 Retry-After`.
+    """
+    if len(body.questions) > MAX_ANSWER_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_ANSWER_QUESTIONS} questions per request")
+    analyzer = get_pyq_analyzer()
+    replies = await run_in_threadpool(analyzer.answer_questions, body.questions, False)
+    missing = [q for q in body.questions if not replies.get(q)]
+    if missing:
+        user = client_key(request, current_user)
+        with answer_batches_lock:
+            if answer_batches.get(user, 0) >= PYQ_ANSWER_BATCHES_PER_USER:
+                raise too_busy(AdmissionError(
+                    f"You already have {PYQ_ANSWER_BATCHES_PER_USER} answer requests in progress", 10))
+            answer_batches[user] = answer_batches.get(user, 0) + 1
+        generated = asyncio.get_running_loop().run_in_executor(
+            answer_executor, generate_answers, user, analyzer, missing)
+        try:
+            # shield: a timed-out request must not cancel the batch, whose answers are still stored
+            replies.update(await asyncio.wait_for(asyncio.shield(generated), PYQ_ANSWER_WAIT))
+        except asyncio.TimeoutError:
+            pass  # Still queued or running: the answers are stored when they arrive
+    return {"answers": [{"text": q, "ai_answer": replies.get(q)} for q in body.questions],
+            "pending": sum(1 for q in body.questions if not replies.get(q))}
+
+@app.get("/analyze/pyq/questions/search", tags=["Exam Preparation"])
+def search_pyq_questions(q: str, subject: str = None, year: int = None, limit: int = 50):
+    """
+    Full-text search over every question analyzed so far, e.g. all questions mentioning "deadlock".
+    Results are near-duplicate groups, best match first.
+    """
+    results = get_pyq_analyzer().question_index.search(q, subject=subject, year=year, limit=max(1, limit))
+    return {"query": q, "count": len(results), "results": results}
+
+@app.get("/analyze/pyq/questions/top", tags=["Exam Preparation"])
+def top_pyq_questions(subject: str = None, q: str = None, topic: str = None, year: int = None, limit: int = 20):
+    """
+    Most-asked questions (by number of distinct papers), optionally for one subject, topic or search term.
+    """
+    results = get_pyq_analyzer().question_index.top(subject=subject, text=q, topic=topic, year=year,
+                                                     limit=max(1, limit))
+    return {"count": len(results), "results": results}
+
+@app.get("/analyze/pyq/{job_id}", tags=["Exam Preparation"])
+def get_pyq_job(job_id: str, since: int = 0):
+    """
+    Progress of a PYQ analysis job: status, current stage and the topic sections published
+    after sequence number `since` (pass back `next`). `result` is included once completed.
+    """
+    job = pyq_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="PYQ job not found")
+    state = job.snapshot(since)
+    if state["status"] == "queued":
+        state["queue_position"] = scheduler.position(job_id)
+    return state
+
+@app.delete("/analyze/pyq/{job_id}", tags=["Exam Preparation"])
+def cancel_pyq_job(job_id: str):
+    """
+    Cancel a queued or running PYQ analysis job. A running job stops at its next stage or topic.
+    """
+    job = pyq_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="PYQ job not found")
+    if not job.cancel():
+        raise HTTPException(status_code=409, detail=f"PYQ job already {job.status}")
+    if scheduler.cancel(job_id):
+        # Never started: free its queue slot, quota and uploads now instead of when a worker reaches it
+        TASKS_FINISHED.inc(source="pyq", status="cancelled")
+        scratch.release(job_id)
+    return {"job_id": job_id, "status": job.status}
 
 @app.get("/{full_path:path}", tags=["UI"], include_in_schema=False)
 async def serve_spa(full_path: str):
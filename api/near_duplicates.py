@@ -0,0 +1,176 @@
+"""
+near_duplicates.py — Near-duplicate grouping of exam questions.
+
+The same question comes back across papers and years with small edits
+("Explain TCP congestion control." / "Q3. Explain congestion control in TCP").
+Questions are normalized, exact repeats are collapsed, and the rest are
+compared by their content words (stop words and generic exam verbs such as
+"explain" dropped) plus the pairs of content words that are adjacent, using
+MinHash signatures. LSH banding only puts likely matches in the same bucket,
+so the work grows with the number of questions rather than the number of
+pairs; every candidate pair is confirmed with the exact Jaccard similarity.
+
+Short questions differ in very few words, and one word is often the whole
+question ("Explain the TCP header" / "Explain the UDP header", "B tree" /
+"B+ tree"). So a pair must share at least MIN_SHARED_WORDS content words, and
+a short question never merges with one that swaps a word for another: only
+with one that asks the same words with more added. Questions without any
+words are never merged with others.
+"""
+
+import os
+import re
+import zlib
+
+SIMILARITY_THRESHOLD = float(os.getenv("PYQ_DUPLICATE_THRESHOLD", "0.5"))  # Jaccard over words and word pairs
+MIN_SHARED_WORDS = 2
+SHORT_QUESTION_WORDS = 4  # up to this many content words, a question may not swap any of them
+FEATURES_VERSION = 2      # bump when normalize() or features() change, so stored keys are rebuilt
+BANDS, ROWS = 20, 3  # 60 hash functions; pairs at the threshold collide in some band ~93% of the time
+MAX_BUCKET_REPS = 50  # group leaders kept per bucket, bounds work on degenerate buckets
+_PRIME = (1 << 32) + 15
+# numpy and scikit-learn load on first use, so importing this module stays cheap
+_hash_params = None
+_ignored_words = None
+
+DIAGRAM_LINK_RE = re.compile(r'!\[Diagram\]\([^)]*\)|\(Diagram Content:[^)]*\)', re.IGNORECASE)
+# "+" and "#" stay inside words: C++, C#, B+ tree
+NON_WORD_RE = re.compile(r'[^a-z0-9+#]+')
+LOOSE_SYMBOL_RE = re.compile(r'(?<![a-z0-9+#])[+#]+')
+MARKS_RE = re.compile(r'\[?\(?\b\d+\s*(?:marks?|m)\b\)?\]?', re.IGNORECASE)
+# Words that say how to answer rather than what is asked
+EXAM_WORDS = {'explain', 'define', 'describe', 'discuss', 'compare', 'analyze', 'analyse', 'evaluate',
+              'list', 'state', 'write', 'derive', 'prove', 'solve', 'briefly', 'brief', 'detail',
+              'example', 'examples', 'suitable', 'neat', 'diagram', 'short', 'note', 'notes', 'working',
+              'following', 'give', 'illustrate', 'justify', 'answer', 'mention', 'significance'}
+
+
+def ignored_words() -> frozenset:
+    """English stop words plus EXAM_WORDS."""
+    global _ignored_words
+    if _ignored_words is None:
+        from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+        _ignored_words = frozenset(ENGLISH_STOP_WORDS | EXAM_WORDS)
+    return _ignored_words
+
+
+def normalize(text: str) -> str:
+    """Lowercase words only; diagram links, marks and punctuation do not make questions different."""
+    text = MARKS_RE.sub(' ', DIAGRAM_LINK_RE.sub(' ', text))
+    return " ".join(LOOSE_SYMBOL_RE.sub(' ', NON_WORD_RE.sub(' ', text.lower())).split())
+
+
+def content_words(normalized: str) -> list[str]:
+    """Words that carry the subject, with a plural 's' folded away; all words if there are none."""
+    words = normalized.split()
+    ignored = ignored_words()
+    content = [w for w in words if w not in ignored] or words
+    return [w[:-1] if len(w) > 3 and w.endswith('s') and not w.endswith('ss') else w for w in content]
+
+
+def features(normalized: str) -> set[int]:
+    """Hashes of the content words and of each pair of adjacent content words."""
+    words = content_words(normalized)
+    pairs = [f"{a} {b}" for a, b in zip(words, words[1:])]
+    return {zlib.crc32(term.encode()) for term in words + pairs}
+
+
+def fingerprint(normalized: str) -> tuple[frozenset, set[int]]:
+    """(content words, features) of a normalized question, as compared by `score`."""
+    return frozenset(content_words(normalized)), features(normalized)
+
+
+def signature(feature_set: set[int]):
+    """MinHash signature (numpy array of BANDS * ROWS values)."""
+    global _hash_params
+    import numpy as np
+    if _hash_params is None:
+        rng = np.random.default_rng(42)
+        _hash_params = (rng.integers(1, 1 << 31, size=BANDS * ROWS, dtype=np.uint64),
+                        rng.integers(0, 1 << 31, size=BANDS * ROWS, dtype=np.uint64))
+    a, b = _hash_params
+    if not feature_set:
+        feature_set = {0}
+    values = np.fromiter(feature_set, dtype=np.uint64, count=len(feature_set))
+    return ((a[:, None] * values[None, :] + b[:, None]) % _PRIME).min(axis=1)
+
+
+def band_keys(feature_set: set[int]) -> list[bytes]:
+    """LSH bucket keys: similar feature sets share at least one key with high probability."""
+    sig = signature(feature_set)
+    return [bytes([band]) + sig[band * ROWS:(band + 1) * ROWS].tobytes() for band in range(BANDS)]
+
+
+def jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def score(a: tuple, b: tuple) -> float:
+    """Similarity of two fingerprints; 0 if the questions must not be merged, whatever the threshold."""
+    (words_a, features_a), (words_b, features_b) = a, b
+    if not words_a or not words_b:
+        return 0.0
+    if words_a == words_b:
+        return 1.0  # same words in another order
+    if len(words_a & words_b) < MIN_SHARED_WORDS:
+        return 0.0
+    if max(len(words_a), len(words_b)) <= SHORT_QUESTION_WORDS and not (words_a <= words_b or words_b <= words_a):
+        return 0.0  # a short question with a word swapped asks something else
+    return jaccard(features_a, features_b)
+
+
+def similarity(a: str, b: str) -> float:
+    """Similarity of two questions, as used for grouping."""
+    return score(fingerprint(normalize(a)), fingerprint(normalize(b)))
+
+
+def group(texts: list[str], threshold: float = SIMILARITY_THRESHOLD) -> list[dict]:
+    """Group near-duplicate texts.
+
+    Returns one dict per group, in order of first appearance:
+    {"text": canonical text, "count": occurrences, "members": indices into texts}.
+    The canonical text is the group's most frequent wording (ignoring case,
+    punctuation and marks), as first written; the earliest wording wins ties.
+    """
+    # Exact repeats (after normalization) are collapsed before any hashing
+    by_key = {}
+    for index, text in enumerate(texts):
+        # Nothing left after normalizing (e.g. only a diagram): only an identical text is a repeat
+        by_key.setdefault(normalize(text) or ("", text.strip()), []).append(index)
+    keys = list(by_key)
+    fingerprints = [fingerprint(key if isinstance(key, str) else "") for key in keys]
+
+    # Leader clustering: a question joins the most similar earlier group leader that shares
+    # an LSH bucket with it, so groups cannot chain into each other through borderline pairs
+    leaders = {}  # bucket -> group leaders hashed into it
+    leader_of = []
+    for k, (words, feature_set) in enumerate(fingerprints):
+        if not words:
+            leader_of.append(k)
+            continue
+        bands = band_keys(feature_set)
+        best, best_similarity = k, threshold
+        for candidate in dict.fromkeys(c for band in bands for c in leaders.get(band, ())):
+            similarity = score(fingerprints[k], fingerprints[candidate])
+            if similarity >= best_similarity and (best == k or similarity > best_similarity):
+                best, best_similarity = candidate, similarity
+        leader_of.append(best)
+        if best == k:
+            for band in bands:
+                bucket = leaders.setdefault(band, [])
+                if len(bucket) < MAX_BUCKET_REPS:
+                    bucket.append(k)
+
+    grouped = {}
+    for k in range(len(keys)):
+        grouped.setdefault(leader_of[k], []).append(k)
+
+    groups = []
+    for wordings in grouped.values():
+        # Wordings are in first-appearance order, so max() keeps the earliest on ties
+        canonical = max(wordings, key=lambda k: len(by_key[keys[k]]))
+        members = sorted(i for k in wordings for i in by_key[keys[k]])
+        groups.append({"text": texts[by_key[keys[canonical]][0]].strip(), "count": len(members), "members": members})
+    return groups
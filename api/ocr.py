@@ -0,0 +1,160 @@
+"""
+ocr.py — Bounded, cached OCR for extracted diagrams.
+
+Page workers preprocess each diagram (grayscale, downscale, binarize), drop
+images unlikely to contain text, and hand the rest over as small 1-bit PNGs
+keyed by a hash of the binarized pixels. The API process OCRs them on a
+bounded pool and caches results by that key, so a re-uploaded paper, or a
+logo repeated on every page, is only OCR'd once.
+
+pytesseract runs the tesseract binary as a subprocess, so a bounded thread
+pool already caps the number of concurrent tesseract processes; each is
+limited to one OpenMP thread so N workers use about N cores.
+"""
+
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import telemetry
+
+OCR_WORKERS = int(os.getenv("PYQ_OCR_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+OCR_TIMEOUT = 30
+OCR_CACHE_SIZE = int(os.getenv("PYQ_OCR_CACHE_SIZE", "4096"))
+MAX_SIDE = 1600          # px; larger diagrams are downscaled before OCR
+MIN_INK, MAX_INK = 0.01, 0.5   # dark-pixel fraction range for text-like images
+MIN_TRANSITIONS = 0.02   # ink/paper flips per pixel along rows; text flips often
+
+OCR_IMAGES = telemetry.REGISTRY.counter(
+    "lecgen_ocr_images_total", "Diagrams seen by OCR, by outcome (ocr, cached, skipped).")
+
+
+# ── Preprocessing (runs in page workers) ───────────────────────────────────────────
+def _otsu_threshold(histogram: list[int]) -> int:
+    total = sum(histogram)
+    weighted_total = sum(i * count for i, count in enumerate(histogram))
+    background, weighted_background = 0, 0.0
+    best, threshold = -1.0, 127
+    for level, count in enumerate(histogram):
+        background += count
+        if background == 0:
+            continue
+        foreground = total - background
+        if foreground == 0:
+            break
+        weighted_background += level * count
+        mean_b = weighted_background / background
+        mean_f = (weighted_total - weighted_background) / foreground
+        variance = background * foreground * (mean_b - mean_f) ** 2
+        if variance > best:
+            best, threshold = variance, level
+    return threshold
+
+
+def preprocess(image):
+    """Grayscale, downscale to MAX_SIDE, and binarize with Otsu's threshold (1-bit image)."""
+    gray = image.convert("L")
+    if max(gray.size) > MAX_SIDE:
+        gray.thumbnail((MAX_SIDE, MAX_SIDE))
+    threshold = _otsu_threshold(gray.histogram())
+    return gray.point(lambda p: 255 if p > threshold else 0, mode="1")
+
+
+def likely_text(binary) -> bool:
+    """Blank, solid or photographic images rarely hold OCR-able text."""
+    width, height = binary.size
+    pixels = binary.tobytes()  # 1 bit per pixel, rows padded to whole bytes
+    row_bytes = (width + 7) // 8
+    ink = 0
+    transitions = 0
+    for y in range(height):
+        row = int.from_bytes(pixels[y * row_bytes:(y + 1) * row_bytes], "big") >> (row_bytes * 8 - width)
+        ink += width - row.bit_count()          # 0 bits are dark pixels
+        transitions += (row ^ (row >> 1)).bit_count()
+    area = width * height
+    if not area:
+        return False
+    ink_ratio = ink / area
+    return MIN_INK <= ink_ratio <= MAX_INK and transitions / area >= MIN_TRANSITIONS
+
+
+def image_key(binary) -> str:
+    digest = hashlib.sha256(f"{binary.size}".encode())
+    digest.update(binary.tobytes())
+    return digest.hexdigest()[:32]
+
+
+def encode(binary) -> bytes:
+    buffer = io.BytesIO()
+    binary.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+# ── OCR service (runs in the API process) ─────────────────────────────────────────
+def _run_tesseract(png: bytes, tesseract_cmd: str | None) -> str:
+    try:
+        import pytesseract
+    except ImportError:
+        print("OCR skipped: pytesseract module not installed or could not be loaded.")
+        return ""
+    from PIL import Image
+    if tesseract_cmd:
+        pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    try:
+        with telemetry.stage("pyq_ocr"):
+            return pytesseract.image_to_string(Image.open(io.BytesIO(png)), timeout=OCR_TIMEOUT).strip()
+    except Exception as e:
+        print(f"OCR execution failed: {e}")
+        return ""
+
+
+class OCRService:
+    def __init__(self, max_workers: int = OCR_WORKERS, cache_size: int = OCR_CACHE_SIZE):
+        self.max_workers = max_workers
+        self.cache_size = cache_size
+        self._executor = None
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()  # image key -> text
+        self._pending = {}           # image key -> Future, so concurrent duplicates share one run
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ocr")
+        return self._executor
+
+    def submit(self, key: str, png: bytes, tesseract_cmd: str | None = None) -> Future:
+        """OCR text for an image; served from cache or shared with an identical in-flight image."""
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                future = Future()
+                future.set_result(self._cache[key])
+                telemetry.cache_lookup("ocr", True)
+                OCR_IMAGES.inc(outcome="cached")
+                return future
+            if key in self._pending:
+                OCR_IMAGES.inc(outcome="cached")
+                return self._pending[key]
+            telemetry.cache_lookup("ocr", False)
+            OCR_IMAGES.inc(outcome="ocr")
+            future = self._get_executor().submit(_run_tesseract, png, tesseract_cmd)
+            self._pending[key] = future
+        future.add_done_callback(lambda f: self._store(key, f))
+        return future
+
+    def _store(self, key: str, future: Future):
+        with self._lock:
+            self._pending.pop(key, None)
+            if future.cancelled() or future.exception() is not None:
+                return
+            self._cache[key] = future.result()
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+
+service = OCRService()
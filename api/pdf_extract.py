@@ -0,0 +1,325 @@
+"""
+pdf_extract.py — Page-parallel PDF extraction for the PYQ analyzer.
+
+pdfplumber is pure Python and CPU-bound, so threads serialize on the GIL.
+Pages are split into contiguous ranges and extracted on a process pool sized
+to the host; results stream back in page order. Workers are recycled after a
+fixed number of tasks and run under an address-space limit, so a pathological
+PDF takes down one worker instead of bloating the API process.
+
+Most exam pages are plain text. Pages without a significant image are read
+straight from pdfium's text layer; only pages with figures go through
+pdfplumber's positional word/image merge. Diagram OCR is handed back to the
+API process (see ocr.py) rather than run inside the page workers.
+"""
+
+import os
+import sys
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+MAX_PAGES = int(os.getenv("PYQ_MAX_PAGES", "200"))               # page budget per document
+PAGES_PER_TASK = int(os.getenv("PYQ_PAGES_PER_TASK", "8"))
+WORKERS = int(os.getenv("PYQ_EXTRACT_WORKERS", str(os.cpu_count() or 2)))
+WORKER_MAX_TASKS = int(os.getenv("PYQ_WORKER_MAX_TASKS", "50"))
+WORKER_MEMORY_MB = int(os.getenv("PYQ_WORKER_MEMORY_MB", "2048"))  # 0 disables the limit
+RANGES_AHEAD = int(os.getenv("PYQ_RANGES_AHEAD", str(2 * WORKERS)))  # page ranges in flight per document
+DIAGRAM_RESOLUTION = 150
+MIN_IMAGE_SIZE = 50  # points; smaller images (bullets, logos, rules) are not diagrams
+FAST_TEXT_PATH = os.getenv("PYQ_FAST_TEXT", "1") != "0"
+IMAGE_URL = "http://localhost:8000/static/images"
+OCR_MARKER = "\x00ocr:{}\x00"  # placeholder in page text until the diagram's OCR text is known
+
+_pool = None
+_pool_lock = threading.Lock()
+_pdfium_lock = threading.Lock()  # pdfium is not thread-safe, even across documents
+
+
+# ── Worker side ──────────────────────────────────────────────────────────────────
+def _init_worker(memory_mb: int):
+    if memory_mb and sys.platform != "win32":
+        import resource
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _group_lines(words: list[dict]) -> list[dict]:
+    """Group positioned words into lines (5px tolerance), top to bottom."""
+    lines = []
+    current_line = []
+    last_top = 0
+    for word in sorted(words, key=lambda w: (w['top'], w['x0'])):
+        if current_line and abs(word['top'] - last_top) >= 5:
+            lines.append({
+                'type': 'text',
+                'top': min(w['top'] for w in current_line),
+                'bottom': max(w['bottom'] for w in current_line),
+                'text': ' '.join(w['text'] for w in current_line)
+            })
+            current_line = []
+        if not current_line:
+            last_top = word['top']
+        current_line.append(word)
+    if current_line:
+        lines.append({
+            'type': 'text',
+            'top': min(w['top'] for w in current_line),
+            'bottom': max(w['bottom'] for w in current_line),
+            'text': ' '.join(w['text'] for w in current_line)
+        })
+    return lines
+
+
+class PageRaster:
+    """Renders a page at most once per resolution; diagrams are cropped from that raster."""
+    def __init__(self, page):
+        self.page = page
+        self._images = {}
+
+    def crop(self, bbox: tuple, resolution: int = DIAGRAM_RESOLUTION):
+        """PIL image of a page-space (x0, top, x1, bottom) region."""
+        page_image = self._images.get(resolution)
+        if page_image is None:
+            with _pdfium_lock:
+                page_image = self.page.to_image(resolution=resolution)
+            self._images[resolution] = page_image
+        origin_x, origin_top = page_image.bbox[0], page_image.bbox[1]
+        scale = page_image.scale
+        x0, top, x1, bottom = bbox
+        return page_image.original.crop((
+            int((x0 - origin_x) * scale), int((top - origin_top) * scale),
+            int((x1 - origin_x) * scale), int((bottom - origin_top) * scale),
+        ))
+
+
+def _extract_page(page, image_dir: str, ocr_jobs: dict) -> tuple[str, int]:
+    """Merge a page's text lines and diagrams (saved as PNG) in reading order.
+
+    Diagrams that look like they hold text get an OCR marker in the page text
+    and an entry in `ocr_jobs` (key -> 1-bit PNG). Returns the text and the
+    number of diagrams skipped as unlikely to contain text.
+    """
+    import ocr
+    from diagram_store import save_png
+    skipped = 0
+    raster = PageRaster(page)
+    content_items = _group_lines(page.extract_words())
+    for img in page.images:
+        if img['width'] < MIN_IMAGE_SIZE or img['height'] < MIN_IMAGE_SIZE:
+            continue
+        content_items.append({'type': 'image', 'top': img['top'], 'bottom': img['bottom'], 'obj': img})
+    content_items.sort(key=lambda x: x['top'])
+
+    parts = []
+    for item in content_items:
+        if item['type'] == 'text':
+            parts.append(item['text'] + "\n")
+            continue
+        try:
+            # Validate bbox coordinates
+            x0 = max(0, item['obj']['x0'])
+            top = max(0, item['obj']['top'])
+            x1 = min(page.width, item['obj']['x1'])
+            bottom = min(page.height, item['obj']['bottom'])
+            if x1 - x0 < 10 or bottom - top < 10:
+                continue
+
+            diagram = raster.crop((x0, top, x1, bottom))
+            img_filename = save_png(diagram, image_dir, DIAGRAM_RESOLUTION)
+
+            parts.append(f"\n\n![Diagram]({IMAGE_URL}/{img_filename})\n")
+            binary = ocr.preprocess(diagram)
+            if ocr.likely_text(binary):
+                key = ocr.image_key(binary)
+                ocr_jobs.setdefault(key, ocr.encode(binary))
+                parts.append(OCR_MARKER.format(key))
+            else:
+                skipped += 1
+                parts.append("\n\n")
+        except Exception as e:
+            import traceback
+            print(f"Image extraction item failed: {e}\nDetails: {traceback.format_exc()}")
+    return "".join(parts), skipped
+
+
+def _has_significant_image(pdfium_page) -> bool:
+    """Cheap classifier: does the page draw any image at least MIN_IMAGE_SIZE on both sides?"""
+    import pypdfium2.raw as pdfium_c
+    for obj in pdfium_page.get_objects(filter=[pdfium_c.FPDF_PAGEOBJ_IMAGE]):
+        # get_pos() was renamed get_bounds() in pypdfium2 5
+        get_bounds = getattr(obj, "get_bounds", None) or obj.get_pos
+        left, bottom, right, top = get_bounds()
+        if right - left >= MIN_IMAGE_SIZE and top - bottom >= MIN_IMAGE_SIZE:
+            return True
+    return False
+
+
+def _fast_page_text(pdfium_page) -> str:
+    """Plain text layer, one non-empty line per row, like the layout path's output."""
+    textpage = pdfium_page.get_textpage()
+    try:
+        text = textpage.get_text_range()
+    finally:
+        textpage.close()
+    return "".join(line.strip() + "\n" for line in text.splitlines() if line.strip())
+
+
+def extract_page_range(file_path: str, start: int, stop: int, image_dir: str,
+                       fast_path: bool = True) -> tuple[list[str], dict, int]:
+    """Extract pages [start, stop) of a PDF.
+
+    Returns one string per page ('' for failed pages), the OCR jobs the page
+    texts' markers refer to, and the number of diagrams skipped for OCR.
+    """
+    import pdfplumber
+    import pypdfium2 as pdfium
+    ocr_jobs = {}
+    skipped = 0
+    texts = []
+    layout_pdf = None  # opened only if some page in the range needs the layout pass
+    with _pdfium_lock:
+        document = pdfium.PdfDocument(file_path)
+    try:
+        for index in range(start, stop):
+            try:
+                if fast_path:
+                    with _pdfium_lock:
+                        pdfium_page = document[index]
+                        try:
+                            needs_layout = _has_significant_image(pdfium_page)
+                            if not needs_layout:
+                                texts.append(_fast_page_text(pdfium_page))
+                        finally:
+                            pdfium_page.close()
+                    if not needs_layout:
+                        continue
+                if layout_pdf is None:
+                    layout_pdf = pdfplumber.open(file_path, pages=list(range(start + 1, stop + 1)))
+                page = layout_pdf.pages[index - start]
+                try:
+                    page_text, page_skipped = _extract_page(page, image_dir, ocr_jobs)
+                    texts.append(page_text)
+                    skipped += page_skipped
+                finally:
+                    page.close()  # drop pdfplumber's per-page object cache
+            except Exception as e:
+                print(f"Error processing page {index}: {e}")
+                texts.append("")
+    finally:
+        if layout_pdf is not None:
+            layout_pdf.close()
+        with _pdfium_lock:
+            document.close()
+    return texts, ocr_jobs, skipped
+
+
+# ── Parent side ──────────────────────────────────────────────────────────────────
+def page_count(file_path: str) -> int:
+    import pypdfium2 as pdfium
+    with _pdfium_lock:
+        document = pdfium.PdfDocument(file_path)
+        try:
+            return len(document)
+        finally:
+            document.close()
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            import multiprocessing
+            _pool = ProcessPoolExecutor(
+                max_workers=WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(WORKER_MEMORY_MB,),
+                max_tasks_per_child=WORKER_MAX_TASKS,
+            )
+        return _pool
+
+
+def _reset_pool(broken: ProcessPoolExecutor):
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def _submit_ocr(result: tuple, tesseract_cmd: str | None) -> dict:
+    """Start OCR for a page range's diagrams; returns key -> Future."""
+    import ocr
+    _, ocr_jobs, skipped = result
+    if skipped:
+        ocr.OCR_IMAGES.inc(skipped, outcome="skipped")
+    return {key: ocr.service.submit(key, png, tesseract_cmd) for key, png in ocr_jobs.items()}
+
+
+def _resolve_ocr(texts: list[str], futures: dict):
+    """Yield page texts with each OCR marker replaced by the diagram's caption."""
+    for text in texts:
+        for key, future in futures.items():
+            marker = OCR_MARKER.format(key)
+            if marker in text:
+                ocr_text = future.result()
+                text = text.replace(marker, f"(Diagram Content: {ocr_text})\n\n" if ocr_text else "\n\n")
+        yield text
+
+
+def _blank_range(start: int, stop: int) -> tuple:
+    return [""] * (stop - start), {}, 0
+
+
+def extract_pages(file_path: str, max_pages: int = MAX_PAGES, tesseract_cmd: str | None = None,
+                  fast_path: bool | None = None):
+    """Yield the text of each page (up to the page budget) in order, extracted in parallel."""
+    fast_path = FAST_TEXT_PATH if fast_path is None else fast_path
+    from diagram_store import IMAGE_DIR
+    image_dir = os.path.abspath(IMAGE_DIR)
+    n_pages = min(page_count(file_path), max_pages)
+    ranges = [(start, min(start + PAGES_PER_TASK, n_pages)) for start in range(0, n_pages, PAGES_PER_TASK)]
+    if len(ranges) <= 1 or WORKERS <= 1:
+        for start, stop in ranges:
+            result = extract_page_range(file_path, start, stop, image_dir, fast_path)
+            yield from _resolve_ocr(result[0], _submit_ocr(result, tesseract_cmd))
+        return
+
+    # Only RANGES_AHEAD ranges are in flight, so finished pages (and their diagram PNGs)
+    # never pile up ahead of a slow consumer: memory stays flat however long the document
+    pool = get_pool()
+
+    def submit(start, stop):
+        try:
+            return pool.submit(extract_page_range, file_path, start, stop, image_dir, fast_path)
+        except BrokenProcessPool as e:
+            failed = Future()
+            failed.set_exception(e)  # handled (and retried) like a range that crashed while running
+            return failed
+
+    ahead = max(1, RANGES_AHEAD)
+    futures = {index: submit(*ranges[index]) for index in range(min(ahead, len(ranges)))}
+    for index, (start, stop) in enumerate(ranges):
+        future = futures.pop(index)
+        try:
+            result = future.result()
+        except BrokenProcessPool as e:
+            # One dead worker (e.g. past its memory limit) fails every pending range,
+            # so rebuild the pool and retry each affected range once
+            print(f"PDF worker crashed on {file_path} pages {start}-{stop - 1}: {e}")
+            _reset_pool(pool)
+            try:
+                pool = get_pool()
+                result = pool.submit(extract_page_range, file_path, start, stop, image_dir, fast_path).result()
+            except Exception as e:
+                print(f"PDF extraction retry failed on {file_path} pages {start}-{stop - 1}: {e}")
+                if isinstance(e, BrokenProcessPool):
+                    _reset_pool(pool)
+                result = _blank_range(start, stop)
+        except Exception as e:
+            print(f"PDF extraction failed on {file_path} pages {start}-{stop - 1}: {e}")
+            result = _blank_range(start, stop)
+        if index + ahead < len(ranges):
+            futures[index + ahead] = submit(*ranges[index + ahead])
+        yield from _resolve_ocr(result[0], _submit_ocr(result, tesseract_cmd))
@@ -6,24 +6,27 @@ try:
     from processor import _llm
 except ImportError:
     _llm = None
+import scratch
+import telemetry
+from answer_store import answers as answer_store
+from diagram_store import DIAGRAM_RE
+from document_cache import cache as document_cache, file_key
+from pyq_index import index as question_index
+from pyq_jobs import JobCancelled
+from question_segmenter import segment, year_from_name
+from resource_lookup import lookup as resource_lookup
+from topic_model import models as topic_models
+from topic_naming import namer as topic_namer
 
-import pandas as pd
 import re
-import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer, CountVectorizer
-from sklearn.cluster import KMeans
-from sklearn.decomposition import LatentDirichletAllocation
-from youtubesearchpython import VideosSearch
-import pdfplumber
-import docx
-import gdown
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import uuid
-import PIL.Image
-try:
-    import pytesseract
-except ImportError:
-    pytesseract = None
+
+# The heavy stack (pandas, scikit-learn, python-docx, gdown, transformers) is
+# imported inside the methods that use it, so importing this module — and
+# booting the API — stays fast. PDF text and OCR live in pdf_extract and ocr.
+
+SAMPLE_LINES = 200  # lines analyzed as questions when a paper has no numbered questions
 
 
 class PYQAnalyzer:
@@ -33,6 +36,12 @@ class PYQAnalyzer:
         self.stop_words = 'english'
         self.answer_generator = None
         self.enable_ai_answers = False  # Disabled by default for speed
+        self.document_cache = document_cache
+        self.answer_store = answer_store
+        self.topic_models = topic_models
+        self.question_index = question_index
+        self.resource_lookup = resource_lookup
+        self.topic_namer = topic_namer
 
         # Configure Tesseract Path once
         self.tesseract_cmd = None
@@ -64,170 +73,113 @@ class PYQAnalyzer:
                 print(f"Could not load answer generator: {e}")
                 self.answer_generator = False
         
-    def extract_text_from_file(self, file_path):
-        """Extract text and images from PDF, DOCX, CSV, or TXT files."""
+    def extract_pages_from_file(self, file_path):
+        """Yield (page number, text) for a PDF, or a single (None, text) for DOCX, CSV and TXT files."""
         ext = file_path.split('.')[-1].lower()
         text = ""
-        
-        try:
-            if ext == 'pdf':
-                with pdfplumber.open(file_path) as pdf:
-                    ocr_count = 0
-                    max_ocr_per_file = 10 
-                    # Process only first 10 pages for moderate depth
-                    for i, page in enumerate(pdf.pages[:10]):
-                        try:
-                            # 1. Extract words with position
-                            words = page.extract_words()
-                            
-                            # 2. Extract images
-                            images = page.images
-                            
-                            # Group words into lines (tolerance 5px)
-                            lines = []
-                            current_line = []
-                            last_top = 0
-                            
-                            # Sort words by top then x0
-                            sorted_words = sorted(words, key=lambda w: (w['top'], w['x0']))
-                            
-                            for word in sorted_words:
-                                if not current_line:
-                                    current_line.append(word)
-                                    last_top = word['top']
-                                else:
-                                    if abs(word['top'] - last_top) < 5:
-                                        current_line.append(word)
-                                    else:
-                                        # New line
-                                        lines.append({
-                                            'type': 'text',
-                                            'top': min(w['top'] for w in current_line),
-                                            'bottom': max(w['bottom'] for w in current_line),
-                                            'text': ' '.join(w['text'] for w in current_line)
-                                        })
-                                        current_line = [word]
-                                        last_top = word['top']
-                            
-                            # Append last line
-                            if current_line:
-                                lines.append({
-                                    'type': 'text',
-                                    'top': min(w['top'] for w in current_line),
-                                    'bottom': max(w['bottom'] for w in current_line),
-                                    'text': ' '.join(w['text'] for w in current_line)
-                                })
-
-                            # Combine lines and images
-                            content_items = lines
-                            for img in images:
-                                if img['width'] < 50 or img['height'] < 50:
-                                    continue
-                                content_items.append({
-                                    'type': 'image',
-                                    'top': img['top'],
-                                    'bottom': img['bottom'],
-                                    'obj': img
-                                })
-                            
-                            # Sort all items by vertical position
-                            content_items.sort(key=lambda x: x['top'])
-                            
-                            # Build merged text
-                            page_text = ""
-                            for item in content_items:
-                                 if item['type'] == 'text':
-                                     page_text += item['text'] + "\n"
-                                 elif item['type'] == 'image':
-                                    try:
-                                        # Validate bbox coordinates
-                                        x0 = max(0, item['obj']['x0'])
-                                        top = max(0, item['obj']['top'])
-                                        x1 = min(page.width, item['obj']['x1'])
-                                        bottom = min(page.height, item['obj']['bottom'])
-                                        
-                                        # Skip invalid dimensions
-                                        if x1 - x0 < 10 or bottom - top < 10:
-                                            continue
-                                            
-                                        bbox = (x0, top, x1, bottom)
-                                        cropped = page.crop(bbox)
-                                        img_obj = cropped.to_image(resolution=150)
-                                        
-                                        img_filename = f"diagram_{uuid.uuid4().hex[:8]}.png"
-                                        img_path = os.path.join("static/images", img_filename)
-                                        img_obj.save(img_path)
-                                        # Try OCR using cached path
-                                        ocr_text = ""
-                                        if pytesseract:
-                                            try:
-                                                if self.tesseract_cmd:
-                                                    pytesseract.pytesseract.tesseract_cmd = self.tesseract_cmd
-                                                
-                                                # Use the PIL image from PageImage for OCR
-                                                # pytesseract.image_to_string expects a PIL image or path
-                                                if ocr_count < max_ocr_per_file:
-                                                    pil_img = img_obj.original
-                                                    # Add timeout for OCR to prevent hanging
-                                                    ocr_text = pytesseract.image_to_string(pil_img, timeout=30).strip()
-                                                    ocr_count += 1
-                                                else:
-                                                    print(f"OCR skipped: Reached limit of {max_ocr_per_file} images per file.")
-                                            except Exception as e:
-                                                print(f"OCR execution failed: {e}")
-                                        else:
-                                            print("OCR skipped: pytesseract module not installed or could not be loaded.")
-                                        
-                                        img_url = f"http://localhost:8000/static/images/{img_filename}"
-                                        page_text += f"\n\n![Diagram]({img_url})\n"
-                                        
-                                        if ocr_text:
-                                            page_text += f"(Diagram Content: {ocr_text})\n\n"
-                                        else:
-                                            page_text += "\n\n"
-                                            
-                                    except Exception as e:
-                                        import traceback
-                                        error_details = traceback.format_exc()
-                                        print(f"Image extraction item failed: {e}\nDetails: {error_details}")
-                                        
-                            text += page_text + "\n"
-                        except Exception as e:
-                            print(f"Error processing page {i}: {e}")
-                        
-            elif ext == 'docx':
-                doc = docx.Document(file_path)
-                for para in doc.paragraphs:
-                    text += para.text + "\n"
-                    # TODO: DOCX image extraction is harder, skipping for now
-                    
-            elif ext == 'txt':
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    text = f.read()
-            elif ext == 'csv':
-                df = pd.read_csv(file_path)
-                possible_cols = [c for c in df.columns if 'question' in c.lower() or 'q' in c.lower()]
-                if not possible_cols:
-                    text = df.to_string(index=False)
-                else:
-                    target_col = possible_cols[0]
-                    text = "\n".join(df[target_col].astype(str).tolist())
+        if ext == 'pdf':
+            from pdf_extract import extract_pages
+            yield from enumerate(extract_pages(file_path, tesseract_cmd=self.tesseract_cmd), 1)
+            return
+        elif ext == 'docx':
+            import docx
+            doc = docx.Document(file_path)
+            # TODO: DOCX image extraction is harder, skipping for now
+            text = "".join(para.text + "\n" for para in doc.paragraphs)
+        elif ext == 'txt':
+            with open(file_path, 'r', encoding='utf-8') as f:
+                text = f.read()
+        elif ext == 'csv':
+            import pandas as pd
+            df = pd.read_csv(file_path)
+            possible_cols = [c for c in df.columns if 'question' in c.lower() or 'q' in c.lower()]
+            if not possible_cols:
+                text = df.to_string(index=False)
             else:
-                return None
+                target_col = possible_cols[0]
+                text = "\n".join(df[target_col].astype(str).tolist())
+        else:
+            raise ValueError(f"Unsupported file type: {ext}")
+        yield None, text
+
+    def extract_lines(self, file_path):
+        """Yield (file, page, line) records for a document, one line at a time.
+
+        PDF pages stream in from the page workers and TXT files are read line by
+        line, so only the current page is ever held in memory.
+        """
+        if file_path.split('.')[-1].lower() == 'txt':
+            with open(file_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    yield file_path, None, line.rstrip("\n")
+            return
+        for page, page_text in self.extract_pages_from_file(file_path):
+            for line in page_text.split("\n"):
+                yield file_path, page, line
+
+    def extract_text_from_file(self, file_path):
+        """Extract text and images from PDF, DOCX, CSV, or TXT files."""
+        if file_path.split('.')[-1].lower() not in ('pdf', 'docx', 'txt', 'csv'):
+            return None
+        try:
+            return "\n".join(text for _, text in self.extract_pages_from_file(file_path))
         except Exception as e:
             import traceback
             print(f"Major error extracting text from {file_path}: {e}")
             traceback.print_exc()
             return None
-        finally:
-            # Explicitly clear memory if possible
+
+    def load_document(self, file_path, source=None):
+        """Parsed questions, diagram references and a sample of lines for one file, cached by content.
+
+        The file's line records stream straight into segmentation; its full text is never held.
+        Questions carry provenance: source (display name), page and exam year.
+        """
+        source = source or os.path.basename(file_path)
+        try:
+            key = file_key(file_path)
+        except OSError as e:
+            print(f"Could not read {file_path}: {e}")
+            return None
+        entry = self.document_cache.get(key)
+        telemetry.cache_lookup("pyq_document", entry is not None)
+        if entry is None:
+            if file_path.split('.')[-1].lower() not in ('pdf', 'docx', 'txt', 'csv'):
+                return None
+            # One pass over the document's line records: segmentation, diagram references and a
+            # sample of lines (for papers without numbered questions) are collected as lines stream by
+            diagrams, sample_lines, has_text = set(), [], False
+
+            def lines():
+                nonlocal has_text
+                for _, page, line in self.extract_lines(file_path):
+                    stripped = line.strip()
+                    if stripped:
+                        has_text = True
+                        diagrams.update(DIAGRAM_RE.findall(line))
+                        if len(stripped) > 15 and len(sample_lines) < SAMPLE_LINES:
+                            sample_lines.append(stripped)
+                    yield page, line
+
             try:
-                import gc
-                gc.collect()
-            except:
-                pass
-            
-        return text
+                questions = [{"text": q["text"], "page": q["page"], "year": q["year"]} for q in segment(lines())]
+            except Exception as e:
+                import traceback
+                print(f"Major error extracting text from {file_path}: {e}")
+                traceback.print_exc()
+                return None  # failures are not cached, so a fixed extractor retries them
+            entry = {"has_text": has_text, "questions": questions, "sample_lines": sample_lines,
+                     "diagrams": sorted(diagrams)}
+            self.document_cache.put(key, entry)
+
+        # The cached entry is content-only; the name this copy was uploaded under is attached here
+        name_year = year_from_name(source)
+        for q in entry["questions"]:
+            q["document"] = key
+            q["source"] = source
+            if name_year is not None:
+                q["year"] = name_year
+        return entry
 
     def parse_questions(self, text):
         """
@@ -236,82 +188,15 @@ class PYQAnalyzer:
         """
         if not text:
             return []
-            
-        lines = text.split('\n')
-        questions = []
-        current_question_lines = []
-        
-        # optimized patterns for Start of Question
-        start_patterns = [
-            r'^\d+[\.)]\s+(.+)',
-            r'^Q\d+[:\.]\s+(.+)',
-            r'^Question\s+\d+[:\.]\s+(.+)',
-        ]
-        
-        question_starters = ['explain', 'define', 'what', 'why', 'how', 'describe', 
-                           'discuss', 'compare', 'analyze', 'evaluate', 'list', 
-                           'state', 'write', 'derive', 'prove', 'solve']
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-            
-            is_start = False
-            clean_line = line
-            
-            # Check explicit patterns (Numbering)
-            for pattern in start_patterns:
-                match = re.match(pattern, line, re.IGNORECASE)
-                if match:
-                    is_start = True
-                    clean_line = match.group(1) if match.lastindex else line
-                    break
-            
-            # Check explicit keywords if no pattern match
-            if not is_start:
-                line_lower = line.lower()
-                # Ensure it's not a diagram line being mistaken for text
-                if "![diagram]" not in line_lower:
-                    for starter in question_starters:
-                        # Keyword must be at start of line
-                        if line_lower.startswith(starter):
-                            is_start = True
-                            break
-
-            # Logic to handle accumulation
-            if is_start:
-                # Save previous question if exists and valid
-                if current_question_lines:
-                    full_q = " ".join(current_question_lines).strip()
-                    if len(full_q) > 10: 
-                       questions.append(full_q)
-                
-                # Start new question
-                # Clean numbering from start for cleaner text
-                clean_line = re.sub(r'^\d+[\.)]\s+', '', clean_line)
-                clean_line = re.sub(r'^Q\d+[:\.]\s+', '', clean_line)
-                clean_line = re.sub(r'^Question\s+\d+[:\.]\s+', '', clean_line, flags=re.IGNORECASE)
-                current_question_lines = [clean_line.strip()]
-            else:
-                # Continuation line (text wrap or diagram)
-                if current_question_lines:
-                    # Ignore very short noise lines, but keep diagram references
-                    if len(line) < 3 and "![Diagram]" not in line:
-                        continue
-                    current_question_lines.append(line)
-        
-        # Add last question
-        if current_question_lines:
-            full_q = " ".join(current_question_lines).strip()
-            if len(full_q) > 10:
-                questions.append(full_q)
-                
-        # Deduplicate while preserving order (using dict keys)
-        return list(dict.fromkeys(questions))[:200]
+        # Repeats are kept: they are what near-duplicate grouping counts
+        return [q["text"] for q in segment((None, line) for line in text.split('\n'))]
 
     def analyze_topics(self, questions, n_clusters=5):
         """Optimized topic modeling with robust fallback"""
+        import numpy as np
+        import pandas as pd
+        from sklearn.feature_extraction.text import TfidfVectorizer, CountVectorizer
+        from sklearn.decomposition import LatentDirichletAllocation
         # Fallback DataFrame
         default_df = pd.DataFrame({'Question': questions, 'Topic': [0]*len(questions), 'LDA_Topic': [0]*len(questions)})
         
@@ -350,32 +235,11 @@ class PYQAnalyzer:
             return default_df
 
     def get_topic_keywords(self, questions, topics, n_keywords=3):
-        """Generate full descriptive topic names using high-speed Groq LLM"""
-        df = pd.DataFrame({'Question': questions, 'Topic': topics})
-        keywords_map = {}
-        
-        for topic_id in sorted(df['Topic'].unique()):
-            topic_questions = df[df['Topic'] == topic_id]['Question'].tolist()
-            if not topic_questions:
-                continue
-                
-            prompt = (
-                "Given these exam questions, provide a single, short, descriptive topic name "
-                "(2-4 words maximum) that best groups them together. Only reply with the topic name format 'Topic Name', "
-                "nothing else. No markdown, no quotes.\n\nQuestions:\n" + "\n".join(topic_questions[:10])
-            )
-            
-            try:
-                if _llm:
-                    topic_name = _llm(prompt, max_tokens=15).strip().replace('"', '').replace("'", "")
-                    keywords_map[int(topic_id)] = topic_name
-                else:
-                    keywords_map[int(topic_id)] = f"Topic {topic_id + 1}"
-            except Exception as e:
-                print(f"Keyword extraction error: {e}")
-                keywords_map[int(topic_id)] = f"Topic {topic_id + 1}"
-                
-        return keywords_map
+        """Name every topic: cached by its keywords, else one batched Groq call, else local keywords"""
+        docs = {}
+        for question, topic_id in zip(questions, topics):
+            docs.setdefault(int(topic_id), []).append(question)
+        return self.topic_namer.name(docs, _llm)
 
     def rewrite_vague_question(self, question, topic_name):
         """
@@ -422,41 +286,18 @@ class PYQAnalyzer:
 
     def generate_answer(self, question):
         """Generate AI-powered answer instantly using Groq LLaMA-3"""
-        if not _llm:
-            return None
-        
-        try:
-            prompt = f"Answer this exam question directly and concisely in 2-3 sentences: {question}"
-            return _llm(prompt, max_tokens=300)
-        except Exception as e:
-            print(f"Answer generation error: {e}")
-            return None
+        return self.answer_questions([question]).get(question)
+
+    def answer_questions(self, questions, generate=True):
+        """Answers for many questions: stored ones, then batched parallel Groq calls (question -> answer).
+
+        With `generate=False` only stored answers are returned.
+        """
+        return self.answer_store.answer(questions, _llm if generate else None)
 
     def fetch_resources(self, query):
-        """Search YouTube for educational video resources (reduced to 2 results)"""
-        try:
-            # Try to search YouTube with error handling
-            videosSearch = VideosSearch(query + " lecture tutorial", limit=2)
-            results = videosSearch.result()
-            
-            resources = []
-            if results and 'result' in results:
-                for video in results['result']:
-                    resources.append({
-                        'type': 'video',
-                        'title': video.get('title', 'Video Tutorial'),
-                        'link': video.get('link', '#'),
-                        'thumbnail': video.get('thumbnails', [{}])[0].get('url', ''),
-                        'duration': video.get('duration', 'N/A')
-                    })
-            return resources
-        except TypeError as e:
-            # Handle the 'proxies' parameter error silently
-            # YouTube search temporarily unavailable, but article resources still work
-            return []
-        except Exception as e:
-            # Silent error handling - system continues with article resources
-            return []
+        """YouTube video resources for a topic: cached per topic, bounded by a deadline and a circuit breaker"""
+        return self.resource_lookup.lookup(query)
 
     def fetch_article_resources(self, query):
         """
@@ -555,65 +396,100 @@ class PYQAnalyzer:
                 {'title': 'TutorialsPoint Library', 'link': 'https://www.tutorialspoint.com/tutorialslibrary.htm', 'platform': 'TutorialsPoint'}
             ]
 
-    def perform_full_analysis(self, file_paths):
-        """Optimized analysis pipeline with parallel processing"""
-        
-        # 1. Parallel file extraction for speed
-        all_text = ""
-        with ThreadPoolExecutor(max_workers=4) as executor:
-            results = list(executor.map(self.extract_text_from_file, file_paths))
-            all_text = "\n".join([r for r in results if r])
-        
-        if not all_text.strip():
+    def perform_full_analysis(self, file_paths, sources=None, subject=None, answers="eager", job=None):
+        """Optimized analysis pipeline with parallel processing.
+
+        `sources` optionally gives a display name per file (e.g. the original upload name).
+        With a `subject`, questions are added to that subject's persistent topic
+        model and topic IDs stay stable across analyses.
+        With `answers="lazy"` only stored AI answers are attached; the rest are
+        left for answer_questions() to generate on demand, per topic.
+        A pyq_jobs.PYQJob passed as `job` receives stage progress and each topic
+        section as soon as it is built; cancelling it raises JobCancelled here.
+        """
+        def progress(stage, done=None, total=None, **info):
+            if job is not None:
+                job.advance(stage, done, total, **info)
+
+        # 1. Parallel extraction and parsing; documents seen before come from the cache
+        sources = sources or [None] * len(file_paths)
+        progress("extract", 0, len(file_paths))
+        documents = []
+        with telemetry.stage("pyq_extract"), ThreadPoolExecutor(max_workers=4) as executor:
+            for done, document in enumerate(executor.map(self.load_document, file_paths, sources), 1):
+                progress("extract", done, len(file_paths))
+                if document:
+                    documents.append(document)
+        if not any(d["has_text"] for d in documents):
             return {"error": "Could not extract text from any provided files."}
             
-        # 2. Fast parsing
-        questions = self.parse_questions(all_text)
-        if not questions:
-             lines = [l.strip() for l in all_text.split('\n') if len(l.strip()) > 15]
-             questions = lines[:200]
+        # 2. Group repeats and rewordings across papers; a group's size is how often it was asked
+        occurrences = [q for d in documents for q in d["questions"]]
+        if not occurrences:
+             lines = [l for d in documents for l in d["sample_lines"]]
+             occurrences = [{"text": l, "source": None, "page": None, "year": None} for l in lines[:SAMPLE_LINES]]
         
-        if not questions:
+        if not occurrences:
             return {"error": "No questions identified in the documents."}
 
+        from near_duplicates import group
+        progress("dedupe", total_question_occurrences=len(occurrences))
+        with telemetry.stage("pyq_dedupe"):
+            groups = group([q["text"] for q in occurrences])
+        questions = [g["text"] for g in groups]
+        frequency = {g["text"]: g["count"] for g in groups}
+        # Provenance of the first occurrence, plus every year the question was asked
+        provenance = {}
+        for g in groups:
+            first = occurrences[g["members"][0]]
+            years = sorted({occurrences[i]["year"] for i in g["members"]} - {None})
+            provenance[g["text"]] = {"source": first["source"], "page": first["page"],
+                                     "year": first["year"], "years": years}
+        # Occurrences from the unsegmented-lines fallback are not real questions, so are not indexed
+        segmented = any(d["questions"] for d in documents)
+
         # 3. Optimized clustering
+        progress("cluster", total_questions=len(questions))
         n_clusters = max(3, min(8, len(questions) // 5))
-        df = self.analyze_topics(questions, n_clusters)
+        with telemetry.stage("pyq_cluster"):
+            topics = self.topic_models.update(subject, questions) if subject else None
+            if topics is not None:
+                import pandas as pd
+                df = pd.DataFrame({'Question': questions, 'Topic': topics})
+            else:
+                df = self.analyze_topics(questions, n_clusters)
         
-        # 4. Fast importance scoring
-        importance_counts = df['Question'].value_counts()
-        df['Frequency'] = df['Question'].map(importance_counts)
+        # 4. Importance from repeat counts: asked once is Standard; repeats split at 2/3 of the maximum
+        df['Frequency'] = df['Question'].map(frequency).fillna(1).astype(int)
         
         results_df = df.drop_duplicates(subset=['Question']).copy()
         
-        # Simplified scoring
-        try:
-            max_freq = results_df['Frequency'].max()
-            if max_freq > 0:
-                results_df['ImportanceScore'] = results_df['Frequency'] / max_freq
-            else:
-                results_df['ImportanceScore'] = 0
-            
-            results_df['Importance'] = pd.qcut(
-                results_df['ImportanceScore'].rank(method='first'), 
-                3, 
-                labels=["Standard", "Important", "Critical"],
-                duplicates='drop'
-            )
-        except:
-            results_df['Importance'] = "Standard"
+        max_freq = results_df['Frequency'].max()
+        results_df['ImportanceScore'] = results_df['Frequency'] / max_freq if max_freq > 0 else 0
+        results_df['Importance'] = "Standard"
+        repeated = results_df['Frequency'] > 1
+        results_df.loc[repeated, 'Importance'] = "Important"
+        results_df.loc[repeated & (results_df['ImportanceScore'] >= 2 / 3), 'Importance'] = "Critical"
 
         # 5. Fast keyword extraction
-        topic_keywords = self.get_topic_keywords(results_df['Question'].tolist(), results_df['Topic'].tolist())
+        progress("topic_naming")
+        with telemetry.stage("pyq_topic_naming"):
+            topic_keywords = self.get_topic_keywords(results_df['Question'].tolist(), results_df['Topic'].tolist())
         
+        # Start every topic's video search now, so topic workers only wait for the slowest one
+        self.resource_lookup.prefetch(topic_keywords.values())
+
         # Helper for parallel topic processing
         def process_topic_group(args):
             topic_id, group = args
+            if job is not None:
+                job.check()
             topic_name = topic_keywords.get(topic_id, f"Topic {topic_id+1}")
             
             # Fetch resources in parallel (network efficient)
-            video_resources = self.fetch_resources(topic_name)
-            article_resources = self.fetch_article_resources(topic_name)
+            with telemetry.stage("pyq_resources"):
+                video_resources = self.fetch_resources(topic_name)
+                article_resources = self.fetch_article_resources(topic_name)
             
             all_resources = video_resources + article_resources
             
@@ -628,6 +504,9 @@ class PYQAnalyzer:
                         "importance": str(row.get('Importance', 'Standard')),
                         "frequency": int(row.get('Frequency', 1))
                     }
+                    origin = provenance.get(original_question)
+                    if origin:
+                        question_data.update(origin)
                     questions_list.append(question_data)
                 except Exception as e:
                     continue
@@ -635,15 +514,11 @@ class PYQAnalyzer:
             questions_list.sort(key=lambda x: x['frequency'], reverse=True)
             top_questions = questions_list[:10]
             
-            # Generate instant AI answers only for the top questions to save time
-            for q in top_questions:
-                ans = self.generate_answer(q['text'])
-                if ans:
-                    q['ai_answer'] = ans
-            
             topic_output = {
+                "topic_id": int(topic_id),
                 "topic": topic_name,
                 "questions": top_questions,
+                "answers_pending": len(top_questions),
                 "resources": {
                     "videos": video_resources if video_resources else [],
                     "articles": article_resources if article_resources else [],
@@ -656,37 +531,85 @@ class PYQAnalyzer:
                 
             return topic_output
 
-        # Process topics in parallel
-        # Higher threads for I/O bound tasks
-        # Process topics in parallel with fallback
+        # Process topics in parallel; each section is published as soon as it is built
+        topic_groups = list(results_df.groupby('Topic'))
+        progress("topics", 0, len(topic_groups), topics_found=len(topic_groups))
         final_output = []
         try:
             # Try parallel processing first
             with ThreadPoolExecutor(max_workers=4) as executor:
-                final_output = list(executor.map(process_topic_group, results_df.groupby('Topic')))
+                futures = [executor.submit(process_topic_group, topic_data) for topic_data in topic_groups]
+                for future in as_completed(futures):
+                    topic_output = future.result()
+                    final_output.append(topic_output)
+                    if job is not None:
+                        job.publish(topic_output)
+        except JobCancelled:
+            # Topics still queued see the cancellation on start, so the pool drains quickly
+            raise
         except Exception as e:
             print(f"Parallel processing failed: {e}. Falling back to sequential.")
             # Fallback to sequential processing
             final_output = []
-            for topic_data in results_df.groupby('Topic'):
+            for topic_data in topic_groups:
                 try:
                     res = process_topic_group(topic_data)
                     final_output.append(res)
+                    if job is not None:
+                        job.publish(res)
+                except JobCancelled:
+                    raise
                 except Exception as ex:
                     print(f"Error processing topic in fallback: {ex}")
                     continue
+        final_output.sort(key=lambda topic: topic["topic_id"])
 
+        # 6. AI answers for every topic's top questions at once: stored answers are reused and
+        # the rest are batched into a few parallel, rate-limited calls instead of one call each
+        progress("answers")
+        try:
+            with telemetry.stage("pyq_answers"):
+                replies = self.answer_questions([q['text'] for topic in final_output for q in topic['questions']],
+                                                generate=answers != "lazy")
+        except Exception as e:
+            print(f"Answer generation error: {e}")
+            replies = {}
+        for topic in final_output:
+            for q in topic['questions']:
+                if replies.get(q['text']):
+                    q['ai_answer'] = replies[q['text']]
+            answered = sum(1 for q in topic['questions'] if 'ai_answer' in q)
+            topic['answers_pending'] = len(topic['questions']) - answered
+            if answered and job is not None:
+                job.publish(topic)
+
+        # 7. Keep the questions searchable after the uploads are deleted
+        progress("index")
+        if segmented:
+            topic_of = dict(zip(results_df['Question'], results_df['Topic']))
+            try:
+                with telemetry.stage("pyq_index"):
+                    self.question_index.add(subject, [{
+                        "text": g["text"],
+                        "topic_id": int(topic_of[g["text"]]),
+                        "topic": topic_keywords.get(topic_of[g["text"]], f"Topic {topic_of[g['text']] + 1}"),
+                        "occurrences": [occurrences[i] for i in g["members"]],
+                    } for g in groups if g["text"] in topic_of])
+            except Exception as e:
+                print(f"Could not index PYQ questions: {e}")
             
         # Calculate summary statistics
         total_resources = int(sum(topic.get('resources', {}).get('total_count', 0) for topic in final_output))
         avg_questions_per_topic = float(len(questions) / len(final_output)) if final_output else 0.0
         
         return {
+            "subject": subject,
             "total_questions": int(len(questions)),
             "topics_found": int(len(final_output)),
             "analysis": final_output,
             "summary": {
                 "total_questions_analyzed": int(len(questions)),
+                "total_question_occurrences": int(len(occurrences)),
                 "number_of_topics": int(len(final_output)),
                 "analysis_status": "Complete" if final_output else "Incomplete",
                 "total_resources_found": total_resources,
@@ -705,7 +628,9 @@ class PYQAnalyzer:
             if 'drive.google.com' not in url:
                 return []
                 
+            import gdown
             output_path = os.path.join(output_folder, f"drive_download_{uuid.uuid4().hex}")
+            scratch.track(output_path)
             downloaded_files = []
             
             if 'folder' in url:
@@ -0,0 +1,261 @@
+"""
+pyq_index.py — Persistent, searchable index of analyzed PYQ questions.
+
+Every analysis adds its questions to a local SQLite database with an FTS5
+full-text index (porter stemming, BM25 ranking), so the corpus can be queried
+later without re-uploading papers.
+
+Each distinct wording is one row in `questions`; rewordings that near-duplicate
+grouping put together share a `group_key`. A group from a later analysis joins
+the indexed group holding one of its wordings, or else the most similar
+indexed question sharing an LSH bucket with it (`buckets` persists the
+MinHash band keys of near_duplicates.py, and the same similarity test applies;
+they are rebuilt when near_duplicates.FEATURES_VERSION changes). `occurrences` records which document
+(by content hash), page and year a wording appeared in, so frequency is the
+number of distinct papers a group appeared in and re-uploading a paper does
+not inflate it.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+
+
+INDEX_DB = os.path.join("data", "pyq_index.db")
+MAX_RESULTS = 200
+MATCH_CANDIDATES = 50  # indexed wordings checked when matching a new question to existing groups
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS questions ("
+    "id INTEGER PRIMARY KEY, subject TEXT NOT NULL, key TEXT NOT NULL, group_key TEXT NOT NULL,"
+    "text TEXT NOT NULL, topic_id INTEGER, topic TEXT, UNIQUE (subject, key))",
+    "CREATE INDEX IF NOT EXISTS questions_group ON questions (subject, group_key)",
+    "CREATE TABLE IF NOT EXISTS occurrences ("
+    "question_id INTEGER NOT NULL REFERENCES questions (id), document TEXT NOT NULL,"
+    "source TEXT, page INTEGER, year INTEGER, PRIMARY KEY (question_id, document))",
+    "CREATE TABLE IF NOT EXISTS buckets (subject TEXT NOT NULL, bucket BLOB NOT NULL, question_id INTEGER NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS buckets_lookup ON buckets (subject, bucket)",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts USING fts5("
+    "text, content='questions', content_rowid='id', tokenize='porter unicode61')",
+)
+
+
+# near_duplicates and topic_model are imported where used: this module loads with the API
+
+def _wording_key(text: str) -> str:
+    from near_duplicates import normalize
+    return hashlib.sha1((normalize(text) or text.strip()).encode()).hexdigest()[:20]
+
+
+def _buckets(text: str) -> list[bytes]:
+    from near_duplicates import band_keys, features, normalize
+    return band_keys(features(normalize(text)))
+
+
+def fts_query(text: str) -> str | None:
+    """User text as an FTS5 query: every word must match (quoted, so syntax characters are literal)."""
+    from near_duplicates import normalize
+    terms = [t for t in normalize(text).split() if t]
+    return " ".join(f'"{t}"' for t in terms) or None
+
+
+class QuestionIndex:
+    def __init__(self, db_path: str = INDEX_DB):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        # Opened on first use, so constructing the analyzer never touches disk
+        if self._conn is None:
+            from near_duplicates import FEATURES_VERSION
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            for statement in _SCHEMA:
+                conn.execute(statement)
+            conn.commit()
+            if conn.execute("PRAGMA user_version").fetchone()[0] != FEATURES_VERSION:
+                self._rebuild_keys(conn)
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _rebuild_keys(conn: sqlite3.Connection):
+        """Recompute wording keys and LSH buckets after normalization or features changed."""
+        from near_duplicates import FEATURES_VERSION
+        with conn:
+            conn.execute("DELETE FROM buckets")
+            for question_id, subject, text in conn.execute("SELECT id, subject, text FROM questions").fetchall():
+                conn.execute("UPDATE questions SET key = ? WHERE id = ?", (_wording_key(text), question_id))
+                conn.executemany("INSERT INTO buckets (subject, bucket, question_id) VALUES (?, ?, ?)",
+                                 [(subject, bucket, question_id) for bucket in _buckets(text)])
+            conn.execute(f"PRAGMA user_version = {FEATURES_VERSION}")
+
+    def add(self, subject: str, groups: list[dict]) -> int:
+        """Index one analysis.
+
+        `groups` holds {"text", "topic_id", "topic", "occurrences": [{"text",
+        "document", "source", "page", "year"}]} per near-duplicate group.
+        Returns the number of new occurrences recorded.
+        """
+        from topic_model import subject_slug
+        subject = subject_slug(subject) or ""
+        added = 0
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                for group in groups:
+                    wordings = {}
+                    for occurrence in group["occurrences"]:
+                        wordings.setdefault(_wording_key(occurrence["text"]), occurrence["text"].strip())
+                    # Join the group an earlier analysis already put any of these wordings in
+                    placeholders = ",".join("?" * len(wordings))
+                    row = conn.execute(
+                        f"SELECT group_key FROM questions WHERE subject = ? AND key IN ({placeholders}) "
+                        "ORDER BY id LIMIT 1", (subject, *wordings)).fetchone()
+                    group_key = row[0] if row else (self._similar_group(conn, subject, group["text"])
+                                                     or _wording_key(group["text"]))
+
+                    ids = {}
+                    for key, text in wordings.items():
+                        cursor = conn.execute(
+                            "INSERT OR IGNORE INTO questions (subject, key, group_key, text) VALUES (?, ?, ?, ?)",
+                            (subject, key, group_key, text))
+                        if cursor.rowcount:
+                            conn.execute("INSERT INTO questions_fts (rowid, text) VALUES (?, ?)",
+                                         (cursor.lastrowid, text))
+                            conn.executemany("INSERT INTO buckets (subject, bucket, question_id) VALUES (?, ?, ?)",
+                                             [(subject, bucket, cursor.lastrowid)
+                                              for bucket in _buckets(text)])
+                    for key, question_id in conn.execute(
+                            f"SELECT key, id FROM questions WHERE subject = ? AND key IN ({placeholders})",
+                            (subject, *wordings)):
+                        ids[key] = question_id
+                    conn.execute(
+                        f"UPDATE questions SET group_key = ?, topic_id = ?, topic = ? "
+                        f"WHERE subject = ? AND key IN ({placeholders})",
+                        (group_key, group.get("topic_id"), group.get("topic"), subject, *wordings))
+
+                    cursor = conn.executemany(
+                        "INSERT OR IGNORE INTO occurrences (question_id, document, source, page, year) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        [(ids[_wording_key(o["text"])], o.get("document") or "", o.get("source"),
+                          o.get("page"), o.get("year")) for o in group["occurrences"]])
+                    added += max(cursor.rowcount, 0)
+        return added
+
+    def _similar_group(self, conn, subject: str, text: str) -> str | None:
+        """Group key of the indexed wording most similar to `text`, if it is a near duplicate."""
+        from near_duplicates import SIMILARITY_THRESHOLD, band_keys, fingerprint, normalize, score
+        question = fingerprint(normalize(text))
+        if not question[0]:
+            return None
+        buckets = band_keys(question[1])
+        best, best_similarity = None, SIMILARITY_THRESHOLD
+        for group_key, candidate in conn.execute(
+                "SELECT q.group_key, q.text FROM questions q WHERE q.id IN ("
+                f"SELECT question_id FROM buckets WHERE subject = ? AND bucket IN ({','.join('?' * len(buckets))})"
+                ") LIMIT ?", (subject, *buckets, MATCH_CANDIDATES)):
+            similarity = score(question, fingerprint(normalize(candidate)))
+            if similarity >= best_similarity and (best is None or similarity > best_similarity):
+                best, best_similarity = group_key, similarity
+        return best
+
+    def _groups(self, conn, query: str | None, where: list[str], params: list, order: str,
+                limit: int) -> list[dict]:
+        joins = "questions q JOIN occurrences o ON o.question_id = q.id"
+        if query:
+            joins = ("(SELECT rowid, rank FROM questions_fts WHERE questions_fts MATCH ?) f "
+                     "JOIN questions q ON q.id = f.rowid JOIN occurrences o ON o.question_id = q.id")
+            params = [query, *params]
+        rows = conn.execute(
+            f"SELECT q.subject, q.group_key FROM {joins} WHERE {' AND '.join(where) or '1'} "
+            f"GROUP BY q.subject, q.group_key ORDER BY {order} LIMIT ?",
+            (*params, min(limit, MAX_RESULTS))).fetchall()
+        if not rows:
+            return []
+        # Wordings and papers of all returned groups, in one query each
+        wanted = ("WITH wanted (subject, group_key) AS (VALUES " + ", ".join(["(?, ?)"] * len(rows)) + ") ")
+        pairs = [value for row in rows for value in row]
+        wordings, seen = {}, {}
+        for subject, group_key, text, topic in conn.execute(
+                wanted + "SELECT q.subject, q.group_key, q.text, q.topic FROM wanted w "
+                "JOIN questions q ON q.subject = w.subject AND q.group_key = w.group_key "
+                "JOIN occurrences o ON o.question_id = q.id GROUP BY q.id ORDER BY COUNT(o.document) DESC, q.id",
+                pairs):
+            wordings.setdefault((subject, group_key), []).append((text, topic))
+        for subject, group_key, document, year, source in conn.execute(
+                wanted + "SELECT DISTINCT q.subject, q.group_key, o.document, o.year, o.source FROM wanted w "
+                "JOIN questions q ON q.subject = w.subject AND q.group_key = w.group_key "
+                "JOIN occurrences o ON o.question_id = q.id", pairs):
+            seen.setdefault((subject, group_key), []).append((document, year, source))
+        results = []
+        for subject, group_key in rows:
+            group_wordings, group_seen = wordings[subject, group_key], seen[subject, group_key]
+            results.append({
+                "text": group_wordings[0][0],
+                "subject": subject or None,
+                "topic": group_wordings[0][1],
+                "frequency": len({document for document, _, _ in group_seen}),
+                "years": sorted({year for _, year, _ in group_seen if year is not None}),
+                "sources": sorted({source for _, _, source in group_seen if source}),
+                "variants": len(group_wordings),
+            })
+        return results
+
+    @staticmethod
+    def _filters(subject: str | None, topic: str | None, year: int | None) -> tuple[list[str], list]:
+        from topic_model import subject_slug
+        where, params = [], []
+        if subject_slug(subject):
+            where.append("q.subject = ?")
+            params.append(subject_slug(subject))
+        if topic:
+            where.append("q.topic = ? COLLATE NOCASE")
+            params.append(topic)
+        if year:
+            where.append("o.year = ?")
+            params.append(year)
+        return where, params
+
+    def search(self, text: str, subject: str | None = None, year: int | None = None,
+               limit: int = 50) -> list[dict]:
+        """Question groups with a wording matching every word of `text`, best BM25 match first."""
+        query = fts_query(text)
+        if not query:
+            return []
+        where, params = self._filters(subject, None, year)
+        with self._lock:
+            return self._groups(self._connect(), query, where, params, "MIN(f.rank), MIN(q.id)", limit)
+
+    def top(self, subject: str | None = None, text: str | None = None, topic: str | None = None,
+            year: int | None = None, limit: int = 20) -> list[dict]:
+        """Most-asked question groups (by number of papers), optionally limited to a subject, topic or search."""
+        query = fts_query(text) if text else None
+        if text and not query:
+            return []
+        where, params = self._filters(subject, topic, year)
+        with self._lock:
+            return self._groups(self._connect(), query, where, params,
+                                "COUNT(DISTINCT o.document) DESC, MIN(q.id)", limit)
+
+    def diagram_refs(self):
+        """Text of indexed questions that embed diagrams (a diagram GC root)."""
+        with self._lock:
+            rows = self._connect().execute("SELECT text FROM questions WHERE instr(text, 'diagram_') > 0").fetchall()
+        for text, in rows:
+            yield text
+
+    def topics(self, limit: int = 50) -> list[str]:
+        """Topic names across all subjects, most-asked first (by number of papers)."""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT q.topic FROM questions q JOIN occurrences o ON o.question_id = q.id "
+                "WHERE q.topic IS NOT NULL GROUP BY q.topic ORDER BY COUNT(DISTINCT o.document) DESC LIMIT ?",
+                (limit,)).fetchall()
+        return [topic for topic, in rows]
+
+
+index = QuestionIndex()
@@ -0,0 +1,145 @@
+"""
+pyq_jobs.py — Background PYQ analysis jobs with progressive results.
+
+POST /analyze/pyq queues an analysis on the shared scheduler and returns a job
+ID straight away, so large uploads never hold an HTTP request open. While the
+job runs, the analyzer reports its current stage (with done/total counts where
+there are any) and publishes each topic section as soon as it is built; a
+section is published again when its AI answers arrive. Clients poll with the
+sequence number of the last section they have and only receive newer ones.
+
+Cancelling sets a flag the analyzer checks between stages and topics; a job
+still queued is also removed from the scheduler, freeing its slot and quota. Finished jobs are kept in memory
+for PYQ_JOB_TTL seconds.
+"""
+
+import copy
+import os
+import threading
+import time
+import uuid
+
+PYQ_JOB_TTL = float(os.getenv("PYQ_JOB_TTL", "3600"))  # seconds a finished job stays readable
+FINISHED_STATUSES = ("completed", "failed", "cancelled")
+
+
+class JobCancelled(Exception):
+    """Raised inside a job's analysis once the job has been cancelled."""
+
+
+class PYQJob:
+    def __init__(self, job_id: str, user: str):
+        self.id = job_id
+        self.user = user
+        self.status = "queued"
+        self.stage = None
+        self.done = None
+        self.total = None
+        self.info = {}        # counts known before the result, e.g. total_questions
+        self.sections = []    # published topic sections; a section's sequence number is its index + 1
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+
+    # ── Reported by the analysis ──────────────────────────────────────────────
+    def check(self):
+        if self._cancelled.is_set():
+            raise JobCancelled(self.id)
+
+    def advance(self, stage: str, done: int | None = None, total: int | None = None, **info):
+        """Enter (or update) a stage; raises JobCancelled if the job was cancelled."""
+        with self._lock:
+            # Checked under the lock cancel() takes, so a cancel is never overwritten with "running"
+            if self._cancelled.is_set():
+                raise JobCancelled(self.id)
+            self.status = "running"
+            self.stage, self.done, self.total = stage, done, total
+            self.info.update(info)
+
+    def publish(self, section: dict):
+        """Make a topic section visible to pollers (a copy, so later edits need a new publish)."""
+        with self._lock:
+            self.sections.append(copy.deepcopy(section))
+            if self.stage == "topics" and self.total is not None:
+                self.done = len({s.get("topic_id") for s in self.sections})
+
+    def finish(self, status: str, result: dict | None = None, error: str | None = None):
+        with self._lock:
+            if self.status == "cancelled":
+                return
+            self.status = status
+            self.result = result
+            self.error = error
+            self.stage = None
+            self.finished = time.time()
+
+    # ── Client side ───────────────────────────────────────────────────────────
+    def cancel(self) -> bool:
+        """Request cancellation; False if the job had already finished."""
+        with self._lock:
+            if self.status in FINISHED_STATUSES:
+                return False
+            self._cancelled.set()
+            if self.status == "queued":
+                # Never started: nothing to wait for (the worker skips it when its turn comes)
+                self.status, self.finished = "cancelled", time.time()
+            else:
+                self.status = "cancelling"
+            return True
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def snapshot(self, since: int = 0) -> dict:
+        """Job state plus the sections published after sequence number `since`."""
+        with self._lock:
+            since = max(0, min(since, len(self.sections)))
+            state = {
+                "job_id": self.id,
+                "status": self.status,
+                "stage": self.stage,
+                "progress": {"done": self.done, "total": self.total} if self.total is not None else None,
+                **self.info,
+                "sections": [{"seq": seq, "topic": section}
+                             for seq, section in enumerate(self.sections[since:], since + 1)],
+                "next": len(self.sections),
+            }
+            if self.status == "completed":
+                state["result"] = self.result
+            if self.error:
+                state["error"] = self.error
+            return state
+
+
+class PYQJobStore:
+    def __init__(self, ttl: float = PYQ_JOB_TTL):
+        self.ttl = ttl
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def create(self, user: str) -> PYQJob:
+        job = PYQJob(f"pyq_{uuid.uuid4().hex}", user)
+        with self._lock:
+            self._evict_locked()
+            self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str) -> PYQJob | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def discard(self, job_id: str):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def _evict_locked(self):
+        now = time.time()
+        for job_id in [j.id for j in self._jobs.values() if j.finished and now - j.finished > self.ttl]:
+            del self._jobs[job_id]
+
+
+jobs = PYQJobStore()
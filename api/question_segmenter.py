@@ -0,0 +1,111 @@
+"""
+question_segmenter.py — Streaming question segmentation with provenance.
+
+Consumes lines one at a time (with the page they came from) and emits each
+question as soon as the next one starts, so memory stays flat and work is
+linear in the number of lines. Every question keeps its source file, page and
+exam year for frequency and recency scoring downstream.
+"""
+
+import os
+import re
+
+# Numbered starts: "1. ...", "2) ...", "Q3: ...", "Question 4. ..."
+START_RE = re.compile(r'^(?:\d+[\.)]|Q\d+[:\.]|Question\s+\d+[:\.])\s+(.+)', re.IGNORECASE)
+QUESTION_STARTERS = ('explain', 'define', 'what', 'why', 'how', 'describe',
+                     'discuss', 'compare', 'analyze', 'evaluate', 'list',
+                     'state', 'write', 'derive', 'prove', 'solve')
+# Any numbering left over once the start pattern is removed ("1. Q2. ...")
+NUMBERING_RE = re.compile(r'^(?:\d+[\.)]\s+)?(?:Q\d+[:\.]\s+)?(?:(?i:question)\s+\d+[:\.]\s+)?')
+STARTER_RE = re.compile(r'^(?:%s)' % '|'.join(QUESTION_STARTERS), re.IGNORECASE)
+YEAR_RE = re.compile(r'(?<!\d)(19[5-9]\d|20\d\d)(?!\d)')
+# A year only counts as the paper's year on exam-header lines ("Semester Examination,
+# 2019", "Dec. 2019", "Session 2019-20"), and only in the header area: before the first
+# question, or among the first lines of a page. Question text that merely mentions a
+# year never sets it.
+HEADER_RE = re.compile(
+    r'\b(?:exam(?:ination)?s?|paper|semester|sem|session|(?:end|mid)[- ]?term)\b'
+    r'|\b(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\.?[\s,/\'-]*(?:19|20)\d\d\b',
+    re.IGNORECASE)
+HEADER_LINES = 3
+MIN_QUESTION_CHARS = 10
+
+
+def year_from_name(name: str | None) -> int | None:
+    match = YEAR_RE.search(os.path.basename(name)) if name else None
+    return int(match.group(1)) if match else None
+
+
+class QuestionSegmenter:
+    """Groups lines (wrapped text and diagram references) into complete questions."""
+
+    def __init__(self, source: str | None = None, year: int | None = None):
+        self.source = source
+        self.year = year if year is not None else year_from_name(source)
+        self._lines = []
+        self._page = None
+        self._year = self.year           # year of the paper being read
+        self._question_year = self.year  # year of the question being collected
+        self._line_page = None
+        self._page_line = 0              # non-empty lines seen so far on the current page
+        self._started = False
+
+    def _flush(self) -> dict | None:
+        if not self._lines:
+            return None
+        text = " ".join(self._lines).strip()
+        self._lines = []
+        if len(text) <= MIN_QUESTION_CHARS:
+            return None
+        return {"text": text, "source": self.source, "page": self._page, "year": self._question_year}
+
+    def _in_header(self) -> bool:
+        """Before the first question, or among the first lines of a page."""
+        return not self._started or self._page_line <= HEADER_LINES
+
+    def feed(self, line: str, page: int | None = None) -> dict | None:
+        """Consume one line; returns the previous question if this line starts a new one."""
+        line = line.strip()
+        if not line:
+            return None
+        if page != self._line_page:
+            self._line_page, self._page_line = page, 0
+        self._page_line += 1
+
+        match = START_RE.match(line)
+        if match:
+            text = match.group(1)
+        elif "![diagram]" not in line.lower() and STARTER_RE.match(line):
+            text = line
+        else:
+            if self.year is None and self._in_header() and HEADER_RE.search(line):
+                year = YEAR_RE.search(line)
+                if year:
+                    self._year = int(year.group(1))
+            # Continuation line (text wrap or diagram); skip very short noise
+            if self._lines and (len(line) >= 3 or "![Diagram]" in line):
+                self._lines.append(line)
+            return None
+
+        finished = self._flush()
+        self._lines = [NUMBERING_RE.sub('', text).strip()]
+        self._page = page
+        self._question_year = self._year
+        self._started = True
+        return finished
+
+    def close(self) -> dict | None:
+        """Flush the last question."""
+        return self._flush()
+
+
+def segment(lines, source: str | None = None, year: int | None = None):
+    """Yield questions from an iterable of (page, line) pairs."""
+    segmenter = QuestionSegmenter(source, year)
+    for page, line in lines:
+        question = segmenter.feed(line, page)
+        if question:
+            yield question
+    question = segmenter.close()
+    if question:
+        yield question
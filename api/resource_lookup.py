@@ -0,0 +1,197 @@
+"""
+resource_lookup.py — Cached, time-bounded video resource lookup for PYQ topics.
+
+Topic videos come from a live YouTube search, which can be slow or down.
+Results are cached per normalized topic for a TTL; every lookup waits at most
+a fixed deadline, and a search that misses it still fills the cache for the
+next request. After repeated failures (errors, or replies slower than the
+deadline) a circuit breaker stops calling the backend for a cooldown, so a
+dead backend costs nothing; lookups then serve expired entries if there are
+any, else no videos. Known syllabus topics can be prefetched at startup so
+first requests are already warm; this is opt-in, since every topic costs a
+live search on each worker start.
+
+The search backend is any callable `backend(query) -> list[dict]` that raises
+on failure, so tests and benchmarks can pass a local stand-in.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import telemetry
+
+RESOURCE_TTL = float(os.getenv("PYQ_RESOURCE_TTL", str(6 * 3600)))         # seconds a result stays fresh
+RESOURCE_TIMEOUT = float(os.getenv("PYQ_RESOURCE_TIMEOUT", "3"))            # seconds a lookup waits
+RESOURCE_CACHE_SIZE = int(os.getenv("PYQ_RESOURCE_CACHE_SIZE", "1024"))
+BREAKER_FAILURES = int(os.getenv("PYQ_RESOURCE_BREAKER_FAILURES", "3"))    # consecutive failures to open
+BREAKER_COOLDOWN = float(os.getenv("PYQ_RESOURCE_BREAKER_COOLDOWN", "60"))  # seconds before a trial call
+WARM_TOPICS = [t.strip() for t in os.getenv("PYQ_RESOURCE_WARM_TOPICS", "").split(",") if t.strip()]
+WARM_LIMIT = int(os.getenv("PYQ_RESOURCE_WARM_LIMIT", "0"))  # most-asked indexed topics prefetched at startup
+VIDEOS_PER_TOPIC = 2
+
+
+def youtube_search(query: str) -> list[dict]:
+    """Educational videos for a topic from YouTube search; raises if the search fails."""
+    from youtubesearchpython import VideosSearch
+    results = VideosSearch(query + " lecture tutorial", limit=VIDEOS_PER_TOPIC).result()
+    resources = []
+    for video in (results or {}).get('result', []):
+        resources.append({
+            'type': 'video',
+            'title': video.get('title', 'Video Tutorial'),
+            'link': video.get('link', '#'),
+            'thumbnail': (video.get('thumbnails') or [{}])[0].get('url', ''),
+            'duration': video.get('duration', 'N/A')
+        })
+    return resources
+
+
+def query_key(query: str) -> str:
+    return " ".join((query or "").lower().split())
+
+
+class CircuitBreaker:
+    """Opens after `failures` consecutive failures; after `cooldown` seconds one trial call is let through."""
+    def __init__(self, failures: int = BREAKER_FAILURES, cooldown: float = BREAKER_COOLDOWN):
+        self.failures = max(1, failures)
+        self.cooldown = cooldown
+        self._consecutive = 0
+        self._opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial or time.monotonic() - self._opened_at < self.cooldown:
+                return False
+            self._trial = True  # half-open: this caller probes the backend
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._consecutive = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self._consecutive += 1
+            if self._trial or self._consecutive >= self.failures:
+                if self._opened_at is None or self._trial:
+                    print(f"Resource search failing; skipping it for {self.cooldown}s")
+                self._opened_at = time.monotonic()
+            self._trial = False
+
+    def is_open(self) -> bool:
+        with self._lock:
+            return self._opened_at is not None
+
+
+class ResourceLookup:
+    def __init__(self, backend=youtube_search, ttl: float = RESOURCE_TTL, timeout: float = RESOURCE_TIMEOUT,
+                 cache_size: int = RESOURCE_CACHE_SIZE, breaker: CircuitBreaker | None = None,
+                 max_workers: int = 4):
+        self.backend = backend
+        self.ttl = ttl
+        self.timeout = timeout
+        self.cache_size = cache_size
+        self.breaker = breaker or CircuitBreaker()
+        self._cache = OrderedDict()  # query key -> (fetched at, resources)
+        self._inflight = {}          # query key -> future of the running search
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="resource-lookup")
+
+    def _get(self, key: str) -> tuple | None:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                self._cache.move_to_end(key)
+            return entry
+
+    def _put(self, key: str, resources: list):
+        with self._lock:
+            self._cache[key] = (time.monotonic(), resources)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _fresh(self, entry: tuple | None) -> bool:
+        return entry is not None and time.monotonic() - entry[0] < self.ttl
+
+    def _fetch(self, key: str, query: str) -> list:
+        started = time.monotonic()
+        try:
+            resources = list(self.backend(query) or [])
+        except Exception as e:
+            print(f"Resource search error for '{query}': {e}")
+            self.breaker.record_failure()
+            raise
+        else:
+            # A reply slower than the deadline still fills the cache, but counts against the backend
+            if time.monotonic() - started > self.timeout:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            self._put(key, resources)
+            return resources
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _start(self, key: str, query: str):
+        """Future of the search for `key`, joining one already running; None if the breaker is open."""
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future
+        if not self.breaker.allow():
+            return None
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None:
+                future = self._executor.submit(self._fetch, key, query)
+                self._inflight[key] = future
+            return future
+
+    def lookup(self, query: str) -> list:
+        """Resources for a topic: cached if fresh, else searched within the deadline; never raises."""
+        key = query_key(query)
+        if not key:
+            return []
+        entry = self._get(key)
+        telemetry.cache_lookup("pyq_resources", self._fresh(entry))
+        if self._fresh(entry):
+            return list(entry[1])
+        stale = list(entry[1]) if entry else []
+        future = self._start(key, query)
+        if future is None:
+            return stale
+        try:
+            return list(future.result(timeout=self.timeout))
+        except FutureTimeout:
+            print(f"Resource search for '{query}' exceeded {self.timeout}s")
+            return stale
+        except Exception:
+            return stale
+
+    def prefetch(self, queries) -> int:
+        """Start searches for topics not freshly cached, without waiting; returns how many were started."""
+        started = 0
+        for query in dict.fromkeys(queries):
+            key = query_key(query)
+            if not key or self._fresh(self._get(key)):
+                continue
+            if self._start(key, query) is None:
+                break  # backend is failing; do not queue more
+            started += 1
+        return started
+
+
+lookup = ResourceLookup()
+telemetry.REGISTRY.gauge("lecgen_resource_breaker_open", "1 while resource search is skipped after repeated failures.",
+                         callback=lambda: lookup.breaker.is_open())
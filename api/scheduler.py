@@ -0,0 +1,175 @@
+"""
+scheduler.py — Admission control and per-user fair queuing for processing jobs.
+
+Jobs run on a fixed pool of worker threads. Pending jobs are ordered by
+weighted fair queuing: each job gets a virtual finish tag of
+max(virtual_time, user's last finish) + cost / weight, and the smallest tag
+runs next. Cheap jobs (text) therefore overtake expensive ones (long videos),
+and one user's burst cannot starve everyone else.
+"""
+
+import heapq
+import itertools
+import math
+import threading
+import time
+
+
+class AdmissionError(Exception):
+    """Raised when the scheduler is saturated; carries a Retry-After hint in seconds."""
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def parse_weights(spec: str) -> dict:
+    """Parse "alice@example.com=2,anon:10.0.0.5=0.5" into {client key: weight}."""
+    weights = {}
+    for entry in (spec or "").split(","):
+        if not entry.strip():
+            continue
+        user, sep, weight = entry.rpartition("=")
+        if not sep or not user.strip() or float(weight) <= 0:
+            raise ValueError(f"Invalid scheduler weight {entry.strip()!r}; expected key=positive number")
+        weights[user.strip()] = float(weight)
+    return weights
+
+
+class FairScheduler:
+    def __init__(self, max_workers: int = 2, max_queue_depth: int = 50,
+                 max_jobs_per_user: int = 3, user_weights: dict | None = None):
+        self.max_workers = max_workers
+        self.max_queue_depth = max_queue_depth
+        self.max_jobs_per_user = max_jobs_per_user
+        self.user_weights = user_weights or {}
+
+        self._cond = threading.Condition()
+        self._heap = []             # (finish_tag, seq, job)
+        self._seq = itertools.count()
+        self._virtual_time = 0.0
+        self._last_finish = {}      # user -> last finish tag
+        self._user_jobs = {}        # user -> queued + running count
+        self._running = set()       # job_ids currently executing
+        self._avg_job_seconds = 30.0
+        self._workers = []
+
+    # ── Admission ──────────────────────────────────────────────────────────────
+    def _check_locked(self, user: str):
+        if len(self._heap) >= self.max_queue_depth:
+            raise AdmissionError("Server is busy, please retry shortly", self._retry_after_locked())
+        if self._user_jobs.get(user, 0) >= self.max_jobs_per_user:
+            raise AdmissionError(
+                f"You already have {self.max_jobs_per_user} jobs in progress",
+                self._retry_after_locked(),
+            )
+
+    def _retry_after_locked(self) -> int:
+        backlog = len(self._heap) + 1
+        estimate = self._avg_job_seconds * backlog / max(1, self.max_workers)
+        return int(min(600, max(1, math.ceil(estimate))))
+
+    def check_admission(self, user: str):
+        """Reject early (before an upload is written to disk) if the job would not be accepted."""
+        with self._cond:
+            self._check_locked(user)
+
+    # ── Submission ─────────────────────────────────────────────────────────────
+    def submit(self, job_id: str, user: str, cost: float, fn, *args):
+        """Queue fn(*args) for a user. Raises AdmissionError when saturated."""
+        with self._cond:
+            self._check_locked(user)
+            weight = self.user_weights.get(user, 1.0)
+            start = max(self._virtual_time, self._last_finish.get(user, 0.0))
+            finish = start + max(cost, 0.01) / weight
+            self._last_finish[user] = finish
+            self._user_jobs[user] = self._user_jobs.get(user, 0) + 1
+            job = {"id": job_id, "user": user, "fn": fn, "args": args, "start": start}
+            heapq.heappush(self._heap, (finish, next(self._seq), job))
+            self._ensure_workers()
+            self._cond.notify()
+
+    def _ensure_workers(self):
+        while len(self._workers) < self.max_workers:
+            worker = threading.Thread(target=self._worker_loop, daemon=True,
+                                      name=f"scheduler-{len(self._workers)}")
+            self._workers.append(worker)
+            worker.start()
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                _, _, job = heapq.heappop(self._heap)
+                if job["start"] > self._virtual_time:
+                    self._virtual_time = job["start"]
+                    self._forget_idle_locked()
+                self._running.add(job["id"])
+
+            started = time.monotonic()
+            try:
+                job["fn"](*job["args"])
+            except Exception as e:
+                print(f"Scheduled job {job['id']} failed: {e}")
+            finally:
+                elapsed = time.monotonic() - started
+                with self._cond:
+                    self._running.discard(job["id"])
+                    self._release_user_locked(job["user"])
+                    if not self._heap and not self._running and self._last_finish:
+                        # Busy period over: every backlog has been served, so no past tag matters
+                        self._virtual_time = max(self._virtual_time, *self._last_finish.values())
+                        self._forget_idle_locked()
+                    self._avg_job_seconds = 0.8 * self._avg_job_seconds + 0.2 * elapsed
+
+    def _release_user_locked(self, user: str):
+        remaining = self._user_jobs.get(user, 1) - 1
+        if remaining > 0:
+            self._user_jobs[user] = remaining
+        else:
+            self._user_jobs.pop(user, None)
+            if self._last_finish.get(user, 0.0) <= self._virtual_time:
+                self._last_finish.pop(user, None)
+
+    def _forget_idle_locked(self):
+        """Drop finish tags the virtual clock has passed for users with nothing queued or running.
+
+        Such a tag no longer affects scheduling (a new job starts at the virtual
+        time anyway), so _last_finish stays bounded by the recently active users.
+        """
+        for user in [u for u, tag in self._last_finish.items()
+                     if tag <= self._virtual_time and u not in self._user_jobs]:
+            del self._last_finish[user]
+
+    def cancel(self, job_id: str) -> bool:
+        """Drop a job that has not started, freeing its queue slot and its user's quota.
+
+        Returns False if the job is not queued (already running, finished or unknown).
+        """
+        with self._cond:
+            for index, (_, _, job) in enumerate(self._heap):
+                if job["id"] == job_id:
+                    self._heap[index] = self._heap[-1]
+                    self._heap.pop()
+                    heapq.heapify(self._heap)
+                    self._release_user_locked(job["user"])
+                    return True
+        return False
+
+    # ── Introspection ──────────────────────────────────────────────────────────
+    def position(self, job_id: str) -> int | None:
+        """1-based position of a pending job in dispatch order, or None if not queued."""
+        with self._cond:
+            for index, (_, _, job) in enumerate(sorted(self._heap, key=lambda e: (e[0], e[1]))):
+                if job["id"] == job_id:
+                    return index + 1
+        return None
+
+    def queue_depth(self) -> int:
+        with self._cond:
+            return len(self._heap)
+
+    def active(self) -> int:
+        with self._cond:
+            return len(self._running)
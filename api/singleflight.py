@@ -0,0 +1,60 @@
+"""
+singleflight.py — Coalescing of identical in-flight processing requests.
+
+The first submission for a source key becomes the leader and runs the pipeline.
+Later submissions with the same key attach to the leader as followers and
+receive the leader's result when it finishes, under their own task IDs.
+"""
+
+import hashlib
+import threading
+
+
+def text_key(text: str) -> str:
+    """Source key for raw text submissions."""
+    return "text:" + hashlib.sha256(text.strip().encode("utf-8")).hexdigest()
+
+
+def upload_key(digest: str) -> str:
+    """Source key for uploads, from the SHA-256 hex digest of the file bytes."""
+    return "upload:" + digest
+
+
+def youtube_key(url: str, video_id: str | None) -> str:
+    """Source key for YouTube links; falls back to the raw URL if no video ID is found."""
+    if video_id:
+        return "youtube:" + video_id
+    return "youtube-url:" + url.strip()
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._leaders = {}    # source key -> leader task_id
+        self._followers = {}  # leader task_id -> [follower task_ids]
+
+    def join(self, key: str, task_id: str) -> str | None:
+        """
+        Register a task for a source key.
+        Returns the leader's task_id if the key is already in flight (the task
+        is now a follower), or None if the task became the leader.
+        """
+        with self._lock:
+            leader = self._leaders.get(key)
+            if leader is None:
+                self._leaders[key] = task_id
+                self._followers[task_id] = []
+                return None
+            self._followers[leader].append(task_id)
+            return leader
+
+    def finish(self, key: str, leader_id: str) -> list[str]:
+        """Release a key and return the followers that attached to its leader."""
+        with self._lock:
+            if self._leaders.get(key) == leader_id:
+                del self._leaders[key]
+            return self._followers.pop(leader_id, [])
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._leaders)
@@ -0,0 +1,39 @@
+"""
+token_cache.py — Small LRU of verified JWTs so hot requests skip re-decoding.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenCache:
+    def __init__(self, max_size: int = 1024, ttl: float = 300.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # token -> (subject, expires_at)
+
+    def get(self, token: str) -> str | None:
+        """Return the cached subject for a token, or None if absent or expired."""
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            subject, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return subject
+
+    def put(self, token: str, subject: str, token_exp: float | None = None):
+        """Cache a verified token; never beyond its own `exp` claim."""
+        expires_at = time.time() + self.ttl
+        if token_exp is not None:
+            expires_at = min(expires_at, token_exp)
+        with self._lock:
+            self._entries[token] = (subject, expires_at)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
@@ -0,0 +1,142 @@
+"""
+topic_model.py — Persistent, incrementally trained topic models per subject.
+
+Each subject keeps one MiniBatchKMeans model over hashed word features
+(HashingVectorizer needs no fitted vocabulary, so new papers never force a
+refit). Only questions the subject has not seen before are passed to
+partial_fit, so adding a paper costs milliseconds; the model is pickled under
+data/pyq_models after every update.
+
+Cluster indices are the topic IDs. Centers are only ever nudged by new
+batches (reassignment of small clusters is disabled), so a topic keeps its ID
+across analyses.
+"""
+
+import hashlib
+import os
+import pickle
+import re
+import threading
+import uuid
+
+import telemetry
+
+MODEL_VERSION = 1
+MODEL_DIR = os.path.join("data", "pyq_models")
+N_TOPICS = int(os.getenv("PYQ_SUBJECT_TOPICS", "8"))
+N_FEATURES = 2 ** 14  # hashed unigram space; keeps a pickled model around 1 MB
+
+
+def subject_slug(subject: str | None) -> str | None:
+    slug = re.sub(r'[^a-z0-9]+', '-', (subject or "").lower()).strip('-')[:64]
+    return slug or None
+
+
+def _question_key(question: str) -> str:
+    return hashlib.sha1(" ".join(question.lower().split()).encode()).hexdigest()[:16]
+
+
+class SubjectTopicModel:
+    def __init__(self, subject: str, n_topics: int = N_TOPICS):
+        from sklearn.cluster import MiniBatchKMeans
+        self.version = MODEL_VERSION
+        self.subject = subject
+        self.n_topics = n_topics
+        self.kmeans = MiniBatchKMeans(n_clusters=n_topics, random_state=42, reassignment_ratio=0.0)
+        self.fitted = False
+        self.pending = []   # questions held back until there are enough to seed every topic
+        self.seen = set()   # keys of questions already learned, so re-uploads do not skew centers
+        self.n_questions = 0
+
+    @staticmethod
+    def _vectorize(questions: list[str]):
+        from sklearn.feature_extraction.text import HashingVectorizer
+        vectorizer = HashingVectorizer(n_features=N_FEATURES, stop_words='english', alternate_sign=False)
+        return vectorizer.transform(questions)
+
+    def learn(self, questions: list[str]) -> int:
+        """partial_fit on questions not seen before; returns how many were new."""
+        new = []
+        for question in questions:
+            key = _question_key(question)
+            if key not in self.seen:
+                self.seen.add(key)
+                new.append(question)
+        if not new:
+            return 0
+        batch = self.pending + new
+        if not self.fitted and len(batch) < self.n_topics:
+            self.pending = batch
+            return len(new)
+        self.kmeans.partial_fit(self._vectorize(batch))
+        self.fitted = True
+        self.pending = []
+        self.n_questions += len(batch)
+        return len(new)
+
+    def assign(self, questions: list[str]) -> list[int] | None:
+        """Topic ID per question, or None while the model has too few questions to be fitted."""
+        if not self.fitted or not questions:
+            return None
+        return [int(topic) for topic in self.kmeans.predict(self._vectorize(questions))]
+
+
+class TopicModelStore:
+    def __init__(self, directory: str = MODEL_DIR):
+        self.directory = directory
+        self._models = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _path(self, slug: str) -> str:
+        return os.path.join(self.directory, f"{slug}.pkl")
+
+    def _subject_lock(self, slug: str) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(slug, threading.Lock())
+
+    def _load(self, slug: str) -> SubjectTopicModel:
+        model = self._models.get(slug)
+        if model is None:
+            try:
+                with open(self._path(slug), "rb") as f:
+                    model = pickle.load(f)
+                if getattr(model, "version", None) != MODEL_VERSION:
+                    model = None  # written by an older layout; start fresh
+            except FileNotFoundError:
+                model = None
+            except Exception as e:
+                # Unreadable, or pickled under another numpy/scikit-learn: relearn rather than fail every analysis
+                print(f"Topic model for {slug} could not be loaded, starting fresh: {e!r}")
+                model = None
+            if model is None:
+                model = SubjectTopicModel(slug)
+            self._models[slug] = model
+        return model
+
+    def _save(self, slug: str, model: SubjectTopicModel):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(slug)
+        tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def update(self, subject: str, questions: list[str]) -> list[int] | None:
+        """Learn the subject's new questions, then return a stable topic ID for every question.
+
+        Returns None (callers fall back to per-request clustering) until the
+        subject has at least N_TOPICS distinct questions.
+        """
+        slug = subject_slug(subject)
+        if slug is None:
+            return None
+        with self._subject_lock(slug):
+            model = self._load(slug)
+            with telemetry.stage("pyq_topic_update"):
+                if model.learn(questions):
+                    self._save(slug, model)
+            return model.assign(questions)
+
+
+models = TopicModelStore()
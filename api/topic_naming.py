@@ -0,0 +1,207 @@
+"""
+topic_naming.py — Batched, cached topic names for PYQ clusters.
+
+Each cluster is summarized by its class-based TF-IDF keywords (all of a
+cluster's questions treated as one document, weighted against the other
+clusters). The sorted top keywords are the cluster's signature: names are
+cached by it, so a cluster that comes back with the same vocabulary is never
+named twice.
+
+Clusters missing from the cache are named together in one LLM call with a
+deadline. If the call is slow, fails or skips a cluster, the cluster gets a
+local name built from its keywords; a late LLM reply still fills the cache
+for next time.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import telemetry
+
+NAMING_TIMEOUT = float(os.getenv("PYQ_TOPIC_NAMING_TIMEOUT", "8"))  # seconds to wait for the batched LLM call
+NAME_CACHE_SIZE = int(os.getenv("PYQ_TOPIC_NAME_CACHE_SIZE", "2048"))
+SIGNATURE_TERMS = 5
+QUESTIONS_PER_TOPIC = 6  # sample sent to the LLM for each cluster
+MAX_NAME_CHARS = 60
+# Frequent in exam questions of every topic, so never what a topic is about
+GENERIC_WORDS = {'advantages', 'disadvantages', 'merits', 'demerits', 'role', 'important', 'importance',
+                 'modern', 'various', 'different', 'difference', 'differences', 'applications', 'types',
+                 'features', 'required', 'occur', 'conditions', 'characteristics'}
+
+
+TOKEN_RE = re.compile(r"\b[a-z][a-z0-9+#]+\b")
+
+
+def _terms(question: str) -> list[str]:
+    """Content words, plus bigrams of content words that are adjacent in the question itself."""
+    from near_duplicates import ignored_words
+    ignored = ignored_words()
+    tokens = TOKEN_RE.findall(question.lower())
+    terms = []
+    for i, token in enumerate(tokens):
+        if token in ignored or token in GENERIC_WORDS:
+            continue
+        terms.append(token)
+        following = tokens[i + 1] if i + 1 < len(tokens) else None
+        if following and following not in ignored and following not in GENERIC_WORDS:
+            terms.append(f"{token} {following}")
+    return terms
+
+
+def class_keywords(docs: dict, n_terms: int = SIGNATURE_TERMS) -> dict:
+    """Top class-based TF-IDF terms for each cluster; `docs` maps topic ID -> list of questions."""
+    import numpy as np
+    from sklearn.feature_extraction.text import CountVectorizer
+    topic_ids = [topic_id for topic_id, questions in docs.items() if questions]
+    if not topic_ids:
+        return {}
+    try:
+        vectorizer = CountVectorizer(analyzer=_terms)
+        per_question = vectorizer.fit_transform([q for t in topic_ids for q in docs[t]])
+    except ValueError:
+        return {t: [] for t in topic_ids}  # nothing but stop words
+    bounds = np.cumsum([0] + [len(docs[t]) for t in topic_ids])
+    counts = np.vstack([np.asarray(per_question[start:stop].sum(axis=0)).ravel()
+                        for start, stop in zip(bounds[:-1], bounds[1:])]).astype(float)
+    terms = vectorizer.get_feature_names_out()
+    # c-TF-IDF: term frequency within the cluster x log(1 + average cluster size / term frequency overall)
+    tf = counts / np.maximum(counts.sum(axis=1, keepdims=True), 1)
+    idf = np.log(1 + counts.sum(axis=1).mean() / np.maximum(counts.sum(axis=0), 1))
+    scores = tf * idf
+    # A phrase names a topic better than either of its words, whose counts it shares
+    scores[:, [" " in term for term in terms]] *= 2
+    keywords = {}
+    for row, topic_id in enumerate(topic_ids):
+        ranked = [terms[i] for i in scores[row].argsort()[::-1] if scores[row, i] > 0]
+        chosen = []
+        for term in ranked:
+            # Skip words already covered by a chosen phrase ("tcp" after "tcp congestion")
+            if any(set(term.split()) & set(kept.split()) for kept in chosen):
+                continue
+            chosen.append(term)
+            if len(chosen) == n_terms:
+                break
+        keywords[topic_id] = chosen
+    return keywords
+
+
+def local_name(keywords: list[str], topic_id, taken: set = frozenset()) -> str:
+    """Readable fallback name from a cluster's top keywords, e.g. "Tcp Congestion & Routing".
+
+    Tries further keywords, then numbers the name, to avoid a name in `taken`.
+    """
+    if not keywords:
+        return f"Topic {topic_id + 1}"
+    candidates = [keywords[:1]] if len(keywords) == 1 else [[keywords[0], other] for other in keywords[1:]]
+    for terms in candidates:
+        name = " & ".join(term.title() for term in terms)
+        if name not in taken:
+            return name
+    return f"{' & '.join(term.title() for term in candidates[0])} ({topic_id + 1})"
+
+
+def signature(keywords: list[str]) -> str:
+    return hashlib.sha1("|".join(sorted(keywords)).encode()).hexdigest()[:16]
+
+
+def _clean(name) -> str | None:
+    if not isinstance(name, str):
+        return None
+    name = name.strip().strip('"\'`*').strip()
+    return name[:MAX_NAME_CHARS] or None
+
+
+class TopicNamer:
+    def __init__(self, cache_size: int = NAME_CACHE_SIZE, timeout: float = NAMING_TIMEOUT):
+        self.cache_size = cache_size
+        self.timeout = timeout
+        self._cache = OrderedDict()  # signature -> name
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="topic-naming")
+
+    def _get(self, key: str) -> str | None:
+        with self._lock:
+            name = self._cache.get(key)
+            if name is not None:
+                self._cache.move_to_end(key)
+            return name
+
+    def _put(self, key: str, name: str):
+        with self._lock:
+            self._cache[key] = name
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    @staticmethod
+    def _ask(llm, batch: list[tuple]) -> dict:
+        """One LLM call naming every cluster in `batch` ((number, keywords, questions) tuples)."""
+        sections = []
+        for number, keywords, questions in batch:
+            sample = "\n".join(f"- {q[:200]}" for q in questions[:QUESTIONS_PER_TOPIC])
+            sections.append(f"Group {number} (key terms: {', '.join(keywords) or 'n/a'}):\n{sample}")
+        prompt = (
+            "Give each group of exam questions a single, short, descriptive topic name (2-4 words maximum). "
+            "Return exactly a JSON object mapping each group number to its name, no markdown fences, e.g. "
+            '{"1": "Process Scheduling", "2": "Normalization"}\n\n' + "\n\n".join(sections)
+        )
+        raw = llm(prompt, max_tokens=20 * len(batch) + 50, task="pyq_topic_name")
+        match = re.search(r'\{.*\}', raw or "", re.DOTALL)
+        if not match:
+            return {}
+        try:
+            names = json.loads(match.group())
+        except ValueError:
+            return {}
+        return {str(k): _clean(v) for k, v in names.items()} if isinstance(names, dict) else {}
+
+    def name(self, docs: dict, llm=None) -> dict:
+        """Name every cluster; `docs` maps topic ID -> list of questions. Returns topic ID -> name."""
+        keywords = class_keywords(docs)
+        names, misses = {}, []
+        for topic_id, terms in keywords.items():
+            key = signature(terms) if terms else None
+            cached = self._get(key) if key else None
+            telemetry.cache_lookup("topic_name", cached is not None)
+            if cached:
+                names[topic_id] = cached
+            else:
+                misses.append((topic_id, key))
+
+        if misses and llm:
+            batch = [(number, keywords[topic_id], docs[topic_id]) for number, (topic_id, _) in enumerate(misses, 1)]
+            future = self._executor.submit(self._ask, llm, batch)
+
+            def remember(f):
+                # Runs even after the deadline passed, so a slow reply still warms the cache
+                if f.cancelled() or f.exception() is not None:
+                    return
+                for number, (topic_id, key) in enumerate(misses, 1):
+                    name = f.result().get(str(number))
+                    if name and key:
+                        self._put(key, name)
+            future.add_done_callback(remember)
+            try:
+                replies = future.result(timeout=self.timeout)
+            except FutureTimeout:
+                print(f"Topic naming exceeded {self.timeout}s; using keyword names")
+                replies = {}
+            except Exception as e:
+                print(f"Topic naming error: {e}")
+                replies = {}
+            for number, (topic_id, _) in enumerate(misses, 1):
+                if replies.get(str(number)):
+                    names[topic_id] = replies[str(number)]
+
+        for topic_id, terms in keywords.items():
+            if topic_id not in names:
+                names[topic_id] = local_name(terms, topic_id, set(names.values()))
+        return names
+
+
+namer = TopicNamer()
@@ -0,0 +1,69 @@
+"""
+user_store.py — Indexed user accounts backed by SQLite.
+
+Replaces rewriting the whole users.json on every signup with single-row
+inserts. Existing users.json accounts are imported once on first start.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+
+
+class UserStore:
+    def __init__(self, db_path: str, legacy_json: str | None = None):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS users ("
+            "email TEXT PRIMARY KEY, password TEXT NOT NULL, name TEXT NOT NULL)"
+        )
+        self._conn.commit()
+        if legacy_json:
+            self._import_legacy(legacy_json)
+
+    def _import_legacy(self, path: str):
+        """One-time import of accounts from the old users.json file."""
+        if not os.path.exists(path):
+            return
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM users LIMIT 1").fetchone():
+                return
+            try:
+                with open(path, "r") as f:
+                    legacy = json.load(f)
+            except Exception as e:
+                print(f"Could not import legacy users file: {e}")
+                return
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO users (email, password, name) VALUES (?, ?, ?)",
+                [(email, u["password"], u.get("name", "User")) for email, u in legacy.items()],
+            )
+            self._conn.commit()
+
+    def get(self, email: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT password, name FROM users WHERE email = ?", (email,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"password": row[0], "name": row[1]}
+
+    def add(self, email: str, password_hash: str, name: str) -> bool:
+        """Insert a single user row. Returns False if the email is already registered."""
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT INTO users (email, password, name) VALUES (?, ?, ?)",
+                    (email, password_hash, name),
+                )
+                self._conn.commit()
+                return True
+            except sqlite3.IntegrityError:
+                return False
+
+    def __contains__(self, email: str) -> bool:
+        return self.get(email) is not None
@@ -0,0 +1,447 @@
+"""
+bench_pyq.py — Micro-benchmarks for the PYQAnalyzer pipeline stages.
+
+Builds synthetic corpora (PDF papers and question banks), then times each
+CPU-bound stage separately with tracemalloc peak memory:
+
+  extract          PYQAnalyzer.extract_text_from_file over N generated PDFs
+  extract_layout   the same corpus with the fast text-layer path disabled, i.e.
+                   every page through the positional word/image merge
+  extract_figures  N PDFs with --figures-per-page diagrams on every page
+                   (rendering, cropping, PNG output and OCR if installed)
+  parse            PYQAnalyzer.parse_questions over text holding N questions
+  dedupe           near-duplicate grouping of those N questions
+  analyze_topics   PYQAnalyzer.analyze_topics over N questions
+  topic_update     adding one 50-question paper to a subject topic model that
+                   already holds the N questions (the incremental alternative)
+  load_rss         PYQAnalyzer.load_document on one --rss-pages-page PDF in a
+                   fresh process: peak RSS of the API process (page workers
+                   excluded) above its baseline after imports
+  full_analysis    perform_full_analysis on a TXT bank, broken down by the
+                   telemetry stages it records (build_results = the remainder:
+                   scoring, groupby/iterrows and summary building)
+  full_analysis_cached
+                   the same bank again, served from the per-document cache
+  resources        video lookups for 8 topics against a local stand-in search
+                   backend with --search-latency per call: cold, cached,
+                   prefetched together, and with a failing backend (circuit
+                   breaker open)
+  answers          AI answers for 80 top questions against a simulated LLM
+                   with --llm-latency per call: one call per question (the old
+                   path), batched parallel calls, and again from the store
+
+The LLM and YouTube search are disabled (or simulated) so runs are offline and repeatable.
+Results are JSON; pass --baseline to fail (exit 1) on regressions.
+
+    python benchmarks/bench_pyq.py --pdfs 10,100 --questions 1000,10000 --output bench.json
+    python benchmarks/bench_pyq.py --baseline bench.json --tolerance 0.25
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "api"))
+
+SUBJECTS = {
+    "Operating Systems": ["deadlock", "paging", "segmentation", "semaphores", "process scheduling",
+                          "thrashing", "virtual memory", "context switching"],
+    "Database Systems": ["normalization", "functional dependency", "SQL joins", "transactions",
+                         "B+ tree indexing", "relational algebra", "ER model", "concurrency control"],
+    "Computer Networks": ["TCP congestion control", "routing algorithms", "subnetting", "sliding window",
+                          "DNS resolution", "CSMA/CD", "IPv6 addressing", "error detection"],
+}
+TEMPLATES = [
+    "Explain {c} with a suitable example.",
+    "Define {c}. Why is it important in {s}?",
+    "Compare {c} and {d} in {s}.",
+    "Describe the working of {c} with a neat diagram.",
+    "What is {c}? Discuss its advantages and disadvantages.",
+    "Write short notes on {c}.",
+    "Derive the conditions required for {c} to occur.",
+    "Discuss the role of {c} in modern {s}.",
+]
+
+
+# ── Synthetic corpus generation ─────────────────────────────────────────────────
+def synthetic_questions(n: int, seed: int = 7) -> list[str]:
+    """Exam-style questions drawn from a fixed vocabulary, with natural repeats."""
+    rng = random.Random(seed)
+    questions = []
+    for _ in range(n):
+        subject = rng.choice(list(SUBJECTS))
+        concepts = SUBJECTS[subject]
+        questions.append(rng.choice(TEMPLATES).format(c=rng.choice(concepts), d=rng.choice(concepts), s=subject))
+    return questions
+
+
+def numbered_text(questions: list[str]) -> str:
+    lines = []
+    for i, q in enumerate(questions, 1):
+        lines.append(f"{i}. {q}")
+        if i % 7 == 0:
+            lines.append("[5 Marks]")
+    return "\n".join(lines)
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _figure_stream(width: int = 240, height: int = 160) -> bytes:
+    """A grayscale 'diagram' image XObject: grid lines on white, Flate-compressed."""
+    import zlib
+    rows = bytearray()
+    for y in range(height):
+        for x in range(width):
+            rows.append(0 if x % 40 == 0 or y % 40 == 0 else 255)
+    data = zlib.compress(bytes(rows))
+    header = (f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} /ColorSpace /DeviceGray "
+              f"/BitsPerComponent 8 /Filter /FlateDecode /Length {len(data)} >>\nstream\n")
+    return header.encode() + data + b"\nendstream"
+
+
+def write_pdf(path: str, pages: list[list[str]], figures_per_page: int = 0):
+    """Write a minimal PDF (Helvetica, one line per entry, optional figures) without extra dependencies."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    if figures_per_page:
+        objects.append(_figure_stream())
+    figure_id = len(objects)
+    page_ids = []
+    for lines in pages:
+        ops = ["BT", "/F1 10 Tf", "14 TL", "50 800 Td"]
+        ops.extend(f"({_pdf_escape(line)}) '" for line in lines)
+        ops.append("ET")
+        # Figures side by side along the bottom of the page, 120x80 pt each
+        for i in range(figures_per_page):
+            x, y = 50 + (i % 4) * 130, 60 + (i // 4) * 90
+            ops.append(f"q 120 0 0 80 {x} {y} cm /Im1 Do Q")
+        stream = "\n".join(ops).encode("latin-1", "replace")
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n".encode() + stream + b"\nendstream")
+        content_id = len(objects)
+        xobjects = f" /XObject << /Im1 {figure_id} 0 R >>" if figures_per_page else ""
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       f"/Resources << /Font << /F1 3 0 R >>{xobjects} >> /Contents {content_id} 0 R >>")
+        page_ids.append(len(objects))
+    kids = " ".join(f"{pid} 0 R" for pid in page_ids)
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        body = obj if isinstance(obj, bytes) else obj.encode()
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def build_pdf_corpus(directory: str, n_files: int, pages_per_file: int, questions_per_page: int,
+                     figures_per_page: int = 0) -> list[str]:
+    questions = synthetic_questions(n_files * pages_per_file * questions_per_page, seed=n_files)
+    paths, cursor = [], 0
+    for f in range(n_files):
+        pages = []
+        for p in range(pages_per_file):
+            lines = [f"University Examination {2015 + f % 10} - Paper {f + 1}", ""]
+            for q in questions[cursor:cursor + questions_per_page]:
+                cursor += 1
+                lines.append(f"Q{cursor}. {q}")
+            pages.append(lines)
+        path = os.path.join(directory, f"paper_{f:04d}.pdf")
+        write_pdf(path, pages, figures_per_page)
+        paths.append(path)
+    return paths
+
+
+# ── Measurement ──────────────────────────────────────────────────────────────────
+def measure(fn, *args, memory: bool = True):
+    """Run fn once for wall time, and once more under tracemalloc for peak memory."""
+    gc.collect()
+    started = time.perf_counter()
+    result = fn(*args)
+    seconds = time.perf_counter() - started
+    peak = None
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        fn(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, {"seconds": round(seconds, 4), "peak_bytes": peak}
+
+
+def _max_rss_bytes() -> int:
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # bytes on macOS, KiB on Linux
+
+
+def rss_probe(path: str) -> dict:
+    """Peak RSS of this (fresh) process while load_document extracts and segments one PDF."""
+    import pdfplumber  # noqa: F401  heavy imports count towards the baseline, not the document
+    import pypdfium2  # noqa: F401
+    import pyq_analyzer as pyq_module
+    from document_cache import DocumentCache
+    from pyq_analyzer import PYQAnalyzer
+    pyq_module._llm = None
+    analyzer = PYQAnalyzer()
+    analyzer.document_cache = DocumentCache(tempfile.mkdtemp(prefix="bench_pyq_rss_"))
+    baseline = _max_rss_bytes()
+    started = time.perf_counter()
+    entry = analyzer.load_document(path)
+    seconds = time.perf_counter() - started
+    peak = _max_rss_bytes()
+    shutil.rmtree(analyzer.document_cache.directory, ignore_errors=True)
+    return {"seconds": round(seconds, 4), "questions": len(entry["questions"]) if entry else 0,
+            "baseline_rss_bytes": baseline, "peak_rss_bytes": peak, "rss_growth_bytes": peak - baseline}
+
+
+def measure_rss(path: str, n_pages: int) -> dict:
+    """Run rss_probe in a child process, so earlier stages do not set the high-water mark."""
+    env = dict(os.environ, PYQ_MAX_PAGES=str(n_pages))
+    completed = subprocess.run([sys.executable, os.path.abspath(__file__), "--rss-probe", path],
+                               env=env, capture_output=True, text=True, check=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def stage_totals(telemetry) -> dict:
+    return {dict(key).get("stage"): total for key, (total, _) in telemetry.STAGE_SECONDS.totals().items()}
+
+
+def run(args) -> dict:
+    import near_duplicates
+    import pdf_extract
+    import pyq_analyzer as pyq_module
+    import telemetry
+    from document_cache import DocumentCache
+    from answer_store import AnswerStore, RateLimiter
+    from pyq_analyzer import PYQAnalyzer
+    from pyq_index import QuestionIndex
+    from resource_lookup import CircuitBreaker, ResourceLookup
+    from topic_model import TopicModelStore
+
+    pyq_module._llm = None  # offline: topic names and answers use local fallbacks
+    # numpy and scikit-learn load on first use; load them now so stages time work, not imports
+    near_duplicates.band_keys(near_duplicates.features("warm up"))
+    analyzer = PYQAnalyzer()
+    analyzer.resource_lookup = ResourceLookup(backend=lambda query: [])
+
+    results = {"meta": {"python": platform.python_version(), "machine": platform.machine(),
+                        "cpus": os.cpu_count(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")},
+               "stages": {}}
+    workdir = tempfile.mkdtemp(prefix="bench_pyq_")
+    cwd = os.getcwd()
+    os.chdir(workdir)  # diagram output goes to ./static/images
+    os.makedirs("static/images", exist_ok=True)
+    analyzer.document_cache = DocumentCache(os.path.join(workdir, "pyq_cache"))
+    analyzer.question_index = QuestionIndex(os.path.join(workdir, "pyq_index.db"))
+    analyzer.answer_store = AnswerStore(os.path.join(workdir, "pyq_answers.db"))
+    try:
+        for n_files in args.pdfs:
+            corpus_dir = os.path.join(workdir, f"pdfs_{n_files}")
+            os.makedirs(corpus_dir)
+            paths = build_pdf_corpus(corpus_dir, n_files, args.pages_per_pdf, args.questions_per_page)
+            _, stats = measure(lambda: [analyzer.extract_text_from_file(p) for p in paths], memory=args.memory)
+            stats["per_file_ms"] = round(stats["seconds"] * 1000 / n_files, 3)
+            results["stages"][f"extract/pdfs={n_files}"] = stats
+            print(f"extract        pdfs={n_files:<7} {stats['seconds']:.3f}s")
+
+            pdf_extract.FAST_TEXT_PATH = False
+            try:
+                _, layout = measure(lambda: [analyzer.extract_text_from_file(p) for p in paths], memory=args.memory)
+            finally:
+                pdf_extract.FAST_TEXT_PATH = True
+            layout["per_file_ms"] = round(layout["seconds"] * 1000 / n_files, 3)
+            layout["fast_path_speedup"] = round(layout["seconds"] / stats["seconds"], 2) if stats["seconds"] else None
+            results["stages"][f"extract_layout/pdfs={n_files}"] = layout
+            print(f"extract_layout pdfs={n_files:<7} {layout['seconds']:.3f}s  "
+                  f"(fast path {layout['fast_path_speedup']}x faster)")
+            shutil.rmtree(corpus_dir)
+
+            if not args.figures_per_page:
+                continue
+            os.makedirs(corpus_dir)
+            paths = build_pdf_corpus(corpus_dir, n_files, args.pages_per_pdf, args.questions_per_page,
+                                     figures_per_page=args.figures_per_page)
+            _, stats = measure(lambda: [analyzer.extract_text_from_file(p) for p in paths], memory=args.memory)
+            stats["per_file_ms"] = round(stats["seconds"] * 1000 / n_files, 3)
+            results["stages"][f"extract_figures/pdfs={n_files}"] = stats
+            print(f"extract_figures pdfs={n_files:<6} {stats['seconds']:.3f}s")
+            shutil.rmtree(corpus_dir)
+
+        for n_pages in args.rss_pages:
+            corpus_dir = os.path.join(workdir, f"rss_{n_pages}")
+            os.makedirs(corpus_dir)
+            path = build_pdf_corpus(corpus_dir, 1, n_pages, args.questions_per_page,
+                                    figures_per_page=args.rss_figures_per_page)[0]
+            stats = measure_rss(path, n_pages)
+            results["stages"][f"load_rss/pages={n_pages}"] = stats
+            print(f"load_rss       pages={n_pages:<6} {stats['seconds']:.3f}s  "
+                  f"rss +{stats['rss_growth_bytes'] / 2 ** 20:.1f} MiB (peak {stats['peak_rss_bytes'] / 2 ** 20:.1f} MiB)")
+            shutil.rmtree(corpus_dir)
+
+        for n_questions in args.questions:
+            questions = synthetic_questions(n_questions)
+            text = numbered_text(questions)
+
+            _, stats = measure(analyzer.parse_questions, text, memory=args.memory)
+            results["stages"][f"parse/questions={n_questions}"] = stats
+            print(f"parse          questions={n_questions:<7} {stats['seconds']:.3f}s")
+
+            groups, stats = measure(near_duplicates.group, questions, memory=args.memory)
+            results["stages"][f"dedupe/questions={n_questions}"] = stats
+            print(f"dedupe         questions={n_questions:<7} {stats['seconds']:.3f}s  groups={len(groups)}")
+
+            n_clusters = max(3, min(8, n_questions // 5))
+            _, stats = measure(analyzer.analyze_topics, questions, n_clusters, memory=args.memory)
+            results["stages"][f"analyze_topics/questions={n_questions}"] = stats
+            print(f"analyze_topics questions={n_questions:<7} {stats['seconds']:.3f}s")
+
+            store = TopicModelStore(os.path.join(workdir, "pyq_models"))
+            store.update(f"bench-{n_questions}", questions)
+            paper = synthetic_questions(50, seed=n_questions + 1)
+            _, stats = measure(store.update, f"bench-{n_questions}", paper, memory=False)
+            results["stages"][f"topic_update/questions={n_questions}"] = stats
+            print(f"topic_update   questions={n_questions:<7} {stats['seconds']:.3f}s")
+
+            bank = os.path.join(workdir, f"bank_{n_questions}.txt")
+            with open(bank, "w", encoding="utf-8") as f:
+                f.write(text)
+            before = stage_totals(telemetry)
+            _, stats = measure(analyzer.perform_full_analysis, [bank], memory=False)
+            after = stage_totals(telemetry)
+            breakdown = {name: round(after[name] - before.get(name, 0.0), 4)
+                         for name in after if name.startswith("pyq_") and after[name] != before.get(name, 0.0)}
+            # Topic workers run in parallel, so only the serial stages are subtracted
+            # (documents are extracted and segmented in one streaming pass inside pyq_extract)
+            serial = sum(v for k, v in breakdown.items() if k in ("pyq_extract", "pyq_dedupe", "pyq_cluster", "pyq_topic_naming", "pyq_answers", "pyq_index"))
+            breakdown["build_results"] = round(max(0.0, stats["seconds"] - serial), 4)
+            stats["breakdown"] = breakdown
+            results["stages"][f"full_analysis/questions={n_questions}"] = stats
+            print(f"full_analysis  questions={n_questions:<7} {stats['seconds']:.3f}s  {breakdown}")
+
+            _, stats = measure(analyzer.perform_full_analysis, [bank], memory=False)
+            results["stages"][f"full_analysis_cached/questions={n_questions}"] = stats
+            print(f"full_analysis_cached questions={n_questions:<7} {stats['seconds']:.3f}s")
+
+        topics = [concept for concepts in SUBJECTS.values() for concept in concepts][:8]
+
+        def stand_in_search(query):
+            time.sleep(args.search_latency)
+            return [{"type": "video", "title": f"{query} lecture", "link": "#", "thumbnail": "", "duration": "N/A"}]
+
+        def failing_search(query):
+            time.sleep(args.search_latency)
+            raise ConnectionError("search backend unavailable")
+
+        resources = ResourceLookup(backend=stand_in_search, timeout=max(1.0, 4 * args.search_latency))
+        for label in ("cold", "cached"):
+            found, stats = measure(lambda: [resources.lookup(t) for t in topics], memory=False)
+            results["stages"][f"resources_{label}/topics=8"] = stats
+            print(f"resources      {label:<18} {stats['seconds']:.3f}s  videos={sum(map(len, found))}")
+        resources = ResourceLookup(backend=stand_in_search, timeout=max(1.0, 4 * args.search_latency))
+        found, stats = measure(lambda: resources.prefetch(topics) and [resources.lookup(t) for t in topics],
+                               memory=False)
+        results["stages"]["resources_prefetched/topics=8"] = stats
+        print(f"resources      prefetched         {stats['seconds']:.3f}s  videos={sum(map(len, found))}")
+        resources = ResourceLookup(backend=failing_search, timeout=max(1.0, 4 * args.search_latency),
+                                   breaker=CircuitBreaker(failures=3, cooldown=600))
+        found, stats = measure(lambda: [resources.lookup(t) for t in topics], memory=False)
+        results["stages"]["resources_failing/topics=8"] = stats
+        print(f"resources      failing backend    {stats['seconds']:.3f}s  breaker_open={resources.breaker.is_open()}")
+
+        questions = list(dict.fromkeys(synthetic_questions(200, seed=7)))[:80]
+
+        def simulated_llm(prompt, max_tokens=None, task=None):
+            time.sleep(args.llm_latency)
+            numbers = [line.split(".", 1)[0] for line in prompt.splitlines() if line[:1].isdigit()]
+            return json.dumps({n: f"Answer {n}." for n in numbers})
+
+        _, stats = measure(lambda: [simulated_llm(f"1. {q}") for q in questions], memory=False)
+        results["stages"]["answers_per_question/questions=80"] = stats
+        print(f"answers        per-question calls {stats['seconds']:.3f}s")
+        store = AnswerStore(os.path.join(workdir, "pyq_answers_bench.db"), limiter=RateLimiter(per_minute=0))
+        replies, stats = measure(store.answer, questions, simulated_llm, memory=False)
+        results["stages"]["answers_batched/questions=80"] = stats
+        print(f"answers        batched            {stats['seconds']:.3f}s  answered={len(replies)}")
+        replies, stats = measure(store.answer, questions, simulated_llm, memory=False)
+        results["stages"]["answers_stored/questions=80"] = stats
+        print(f"answers        stored             {stats['seconds']:.3f}s  answered={len(replies)}")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Stages whose time grew by more than `tolerance` (fractional) over the baseline."""
+    regressions = []
+    for name, stats in results["stages"].items():
+        base = baseline.get("stages", {}).get(name)
+        if not base or not base.get("seconds"):
+            continue
+        ratio = stats["seconds"] / base["seconds"]
+        if ratio > 1 + tolerance:
+            regressions.append(f"{name}: {base['seconds']:.3f}s -> {stats['seconds']:.3f}s ({ratio:.2f}x)")
+    return regressions
+
+
+def _int_list(value: str) -> list[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PYQAnalyzer stage micro-benchmarks")
+    parser.add_argument("--pdfs", type=_int_list, default=[10, 100, 1000], help="Corpus sizes in PDF files")
+    parser.add_argument("--questions", type=_int_list, default=[1000, 10000, 100000], help="Question bank sizes")
+    parser.add_argument("--pages-per-pdf", type=int, default=3)
+    parser.add_argument("--questions-per-page", type=int, default=12)
+    parser.add_argument("--figures-per-page", type=int, default=4, help="Diagrams per page in the figure corpus (0 skips it)")
+    parser.add_argument("--llm-latency", type=float, default=0.1, help="Seconds per simulated LLM call in the answers stage")
+    parser.add_argument("--search-latency", type=float, default=0.1, help="Seconds per stand-in video search in the resources stage")
+    parser.add_argument("--rss-pages", type=_int_list, default=[100, 500], help="Page counts for the peak RSS stage")
+    parser.add_argument("--rss-figures-per-page", type=int, default=1, help="Diagrams per page in the RSS corpus")
+    parser.add_argument("--rss-probe", help=argparse.SUPPRESS)
+    parser.add_argument("--no-memory", dest="memory", action="store_false", help="Skip the tracemalloc pass")
+    parser.add_argument("--output", help="Write JSON results to this file")
+    parser.add_argument("--baseline", help="Previous JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown before flagging (0.2 = 20%%)")
+    args = parser.parse_args()
+    if args.rss_probe:
+        print(json.dumps(rss_probe(args.rss_probe)))
+        return
+
+    results = run(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+fake_groq.py — Local stand-in for the Groq transcription and chat endpoints.
+
+Serves the two OpenAI-compatible routes the processor uses, with configurable
+log-normal latency, error rate and 429 (rate limit) behaviour, so load tests
+run offline without burning API quota. Point the app at it with:
+
+    GROQ_BASE_URL=http://127.0.0.1:<port> GROQ_API_KEY=fake
+
+Run standalone:  python benchmarks/fake_groq.py --port 8765 --chat-latency-ms 800
+"""
+
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+NOTES = "## 📌 Key Notes\n" + "\n".join(f"  • Key point {i} of the lecture." for i in range(1, 9))
+QUIZ = json.dumps([
+    {"id": i, "type": "short", "question": f"Question {i}?", "correct": f"Answer {i}",
+     "explanation": f"AI verified answer: Answer {i}"}
+    for i in range(1, 6)
+])
+FLASHCARDS = json.dumps([{"front": f"Term {i}", "back": f"Definition {i}"} for i in range(1, 11)])
+TRANSCRIPT = " ".join(["This lecture covers operating systems, scheduling and deadlock."] * 40)
+
+
+class FakeGroqConfig:
+    def __init__(self, chat_latency_ms=800.0, transcribe_latency_ms=3000.0, jitter=0.5,
+                 error_rate=0.0, rate_limit_rate=0.0, retry_after=1):
+        self.chat_latency_ms = chat_latency_ms
+        self.transcribe_latency_ms = transcribe_latency_ms
+        self.jitter = jitter              # sigma of the log-normal latency distribution
+        self.error_rate = error_rate      # fraction of requests answered with HTTP 500
+        self.rate_limit_rate = rate_limit_rate  # fraction answered with HTTP 429
+        self.retry_after = retry_after
+        self.lock = threading.Lock()
+        self.counts = {"chat": 0, "transcribe": 0, "errors": 0, "rate_limited": 0}
+
+    def sample_latency(self, median_ms: float) -> float:
+        if median_ms <= 0:
+            return 0.0
+        return random.lognormvariate(math.log(median_ms / 1000.0), self.jitter)
+
+    def bump(self, key: str):
+        with self.lock:
+            self.counts[key] += 1
+
+
+def _chat_reply(prompt: str) -> str:
+    lowered = prompt.lower()
+    if "quiz" in lowered:
+        return QUIZ
+    if "flashcard" in lowered:
+        return FLASHCARDS
+    if "topic name" in lowered:
+        return "Process Scheduling"
+    return NOTES
+
+
+def make_handler(config: FakeGroqConfig):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status: int, body: bytes, content_type="application/json", headers=None):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _fault(self) -> bool:
+            """Inject 429 / 500 responses according to the configured rates."""
+            roll = random.random()
+            if roll < config.rate_limit_rate:
+                config.bump("rate_limited")
+                error = {"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}}
+                self._send(429, json.dumps(error).encode(), headers={"Retry-After": str(config.retry_after)})
+                return True
+            if roll < config.rate_limit_rate + config.error_rate:
+                config.bump("errors")
+                self._send(500, json.dumps({"error": {"message": "Injected failure"}}).encode())
+                return True
+            return False
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            raw = self.rfile.read(length) if length else b""
+
+            if self.path.endswith("/chat/completions"):
+                config.bump("chat")
+                if self._fault():
+                    return
+                try:
+                    payload = json.loads(raw or b"{}")
+                except ValueError:
+                    payload = {}
+                prompt = " ".join(m.get("content", "") for m in payload.get("messages", []))
+                time.sleep(config.sample_latency(config.chat_latency_ms))
+                content = _chat_reply(prompt)
+                body = {
+                    "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": payload.get("model", "fake"),
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": content}}],
+                    "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4,
+                              "total_tokens": len(prompt) // 4 + len(content) // 4},
+                }
+                self._send(200, json.dumps(body).encode())
+            elif self.path.endswith("/audio/transcriptions"):
+                config.bump("transcribe")
+                if self._fault():
+                    return
+                time.sleep(config.sample_latency(config.transcribe_latency_ms))
+                self._send(200, TRANSCRIPT.encode(), content_type="text/plain")
+            else:
+                self._send(404, b'{"error": {"message": "Not found"}}')
+
+    return Handler
+
+
+def start_fake_groq(config: FakeGroqConfig, host="127.0.0.1", port=0) -> ThreadingHTTPServer:
+    """Start the fake server on a background thread; port 0 picks a free port."""
+    server = ThreadingHTTPServer((host, port), make_handler(config))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name="fake-groq").start()
+    return server
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--chat-latency-ms", type=float, default=800.0, help="Median chat completion latency")
+    parser.add_argument("--transcribe-latency-ms", type=float, default=3000.0, help="Median transcription latency")
+    parser.add_argument("--jitter", type=float, default=0.5, help="Log-normal sigma for latencies")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests failing with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with 429s")
+
+
+def config_from_args(args) -> FakeGroqConfig:
+    return FakeGroqConfig(
+        chat_latency_ms=args.chat_latency_ms,
+        transcribe_latency_ms=args.transcribe_latency_ms,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the Groq API")
+    parser.add_argument("--port", type=int, default=8765)
+    add_arguments(parser)
+    args = parser.parse_args()
+    server = start_fake_groq(config_from_args(args), port=args.port)
+    print(f"Fake Groq listening on http://127.0.0.1:{server.server_address[1]}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
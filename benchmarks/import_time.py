@@ -0,0 +1,85 @@
+"""
+import_time.py — Import-time report for API worker cold start.
+
+Runs `python -X importtime -c "import api.main"` in a fresh interpreter and
+lists the slowest top-level imports by cumulative time. The heavy PYQ and
+Groq stacks are expected to load lazily on first use; --forbid fails the run
+(exit 1) if any of them are imported at boot.
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --top 30 --json import_report.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAZY_MODULES = "pandas,sklearn,pdfplumber,docx,gdown,youtubesearchpython,pytesseract,groq"
+
+
+def profile_import(module: str) -> tuple[float, list[dict]]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = PROJECT_ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    started = time.perf_counter()
+    # Scratch cwd: the API creates data/, uploads/ and static/ relative to it
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=tempfile.mkdtemp(prefix="lecgen_import_"), env=env,
+        capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{proc.stderr[-2000:]}")
+
+    entries = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, raw_name = line[len("import time:"):].split("|", 2)
+        # Names are indented by one space plus two per nesting level
+        depth = (len(raw_name) - len(raw_name.lstrip()) - 1) // 2
+        name = raw_name.strip()
+        entries.append({"module": name, "self_us": int(self_us), "cumulative_us": int(cumulative_us), "depth": depth})
+    return wall, entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time report for the API")
+    parser.add_argument("--module", default="api.main")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--forbid", default=LAZY_MODULES,
+                        help="Comma-separated top-level packages that must not load at import ('' to disable)")
+    parser.add_argument("--json", help="Write the report to this file as JSON")
+    args = parser.parse_args()
+
+    wall, entries = profile_import(args.module)
+    target = next((e for e in entries if e["module"] == args.module and e["depth"] == 0), None)
+    total_us = target["cumulative_us"] if target else sum(e["cumulative_us"] for e in entries if e["depth"] == 0)
+    # Direct imports of the target module carry the cost of everything beneath them
+    direct = sorted((e for e in entries if e["depth"] == 1), key=lambda e: e["cumulative_us"], reverse=True)
+
+    print(f"import {args.module}: {total_us / 1e6:.3f}s in imports, {wall:.3f}s interpreter wall time")
+    print(f"{'cumulative':>12} {'self':>10}  module")
+    for e in direct[:args.top]:
+        print(f"{e['cumulative_us'] / 1000:>10.1f}ms {e['self_us'] / 1000:>8.1f}ms  {e['module']}")
+
+    forbidden = [m for m in args.forbid.split(",") if m]
+    loaded = sorted({e["module"].split(".")[0] for e in entries} & set(forbidden))
+    if loaded:
+        print(f"Eagerly imported (should be lazy): {', '.join(loaded)}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"module": args.module, "import_seconds": total_us / 1e6, "wall_seconds": wall,
+                       "top": direct[:args.top], "eager_forbidden": loaded}, f, indent=2)
+    if loaded:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
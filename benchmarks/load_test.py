@@ -0,0 +1,270 @@
+"""
+load_test.py — Offline end-to-end load test for api.main:app.
+
+Starts a local fake Groq server (see fake_groq.py), boots the API under
+uvicorn in a scratch working directory pointed at it, then drives concurrent
+/process/* submissions while polling /tasks/{id} until each job finishes.
+Needs no network access.
+
+Reports jobs/sec, p50/p95/p99 end-to-end latency, submit/poll latency,
+429 rejections and the API process's peak RSS.
+
+    python benchmarks/load_test.py --jobs 200 --concurrency 32 --mix text=3,file=1
+    python benchmarks/load_test.py --jobs 100 --rate-limit-rate 0.05 --json results.json
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_groq import add_arguments, config_from_args, start_fake_groq
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile; None for an empty sample."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, int(round(pct / 100.0 * len(ordered))))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(values):
+    return {
+        "count": len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values) if values else None,
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def peak_rss_kb(pid: int) -> int | None:
+    """High-water RSS of a live process (Linux /proc)."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def make_wav(seconds: float) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(16000)
+        w.writeframes(b"\x00\x00" * int(16000 * seconds))
+    return buffer.getvalue()
+
+
+def multipart(fields: dict, files: dict) -> tuple[bytes, str]:
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (filename, content, ctype) in files.items():
+        header = (f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                  f'Content-Type: {ctype}\r\n\r\n')
+        parts.append(header.encode() + content + b"\r\n")
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+class LoadTest:
+    def __init__(self, base_url: str, args):
+        self.base_url = base_url
+        self.args = args
+        self.lock = threading.Lock()
+        self.e2e = []
+        self.submit_latency = []
+        self.poll_latency = []
+        self.outcomes = {"completed": 0, "failed": 0, "timeout": 0, "error": 0}
+        self.rejections = 0
+        self.coalesced = 0
+        self.wav = make_wav(args.audio_seconds)
+        kinds = []
+        for item in args.mix.split(","):
+            kind, _, weight = item.partition("=")
+            kinds.extend([kind.strip()] * int(weight or 1))
+        self.kinds = kinds
+
+    def _request(self, method, path, body=None, content_type=None):
+        request = urllib.request.Request(self.base_url + path, data=body, method=method)
+        if content_type:
+            request.add_header("Content-Type", content_type)
+        with urllib.request.urlopen(request, timeout=60) as resp:
+            return resp.status, json.loads(resp.read() or b"null")
+
+    def _submit(self, job_index: int):
+        kind = random.choice(self.kinds)
+        unique = random.random() >= self.args.duplicate_ratio
+        marker = uuid.uuid4().hex if unique else "shared"
+        if kind == "file":
+            # Unique uploads differ by a trailing byte so content hashes differ
+            content = self.wav + (marker.encode() if unique else b"")
+            body, ctype = multipart({}, {"file": (f"lecture_{job_index}.wav", content, "audio/wav")})
+            path = "/process/file"
+        else:
+            text = f"Lecture {marker}: " + "Operating systems manage processes and memory. " * self.args.text_repeat
+            body, ctype = multipart({"text": text}, {})
+            path = "/process/text"
+
+        while True:
+            started = time.perf_counter()
+            try:
+                _, data = self._request("POST", path, body, ctype)
+                with self.lock:
+                    self.submit_latency.append(time.perf_counter() - started)
+                    if data.get("coalesced"):
+                        self.coalesced += 1
+                return data["task_id"]
+            except urllib.error.HTTPError as e:
+                if e.code != 429:
+                    raise
+                with self.lock:
+                    self.rejections += 1
+                time.sleep(float(e.headers.get("Retry-After", "1")))
+
+    def run_job(self, job_index: int):
+        started = time.perf_counter()
+        try:
+            task_id = self._submit(job_index)
+            deadline = started + self.args.job_timeout
+            while time.perf_counter() < deadline:
+                time.sleep(self.args.poll_interval)
+                poll_started = time.perf_counter()
+                _, data = self._request("GET", f"/tasks/{task_id}")
+                with self.lock:
+                    self.poll_latency.append(time.perf_counter() - poll_started)
+                if data.get("status") in ("completed", "failed"):
+                    with self.lock:
+                        self.outcomes[data["status"]] += 1
+                        if data["status"] == "completed":
+                            self.e2e.append(time.perf_counter() - started)
+                    return
+            with self.lock:
+                self.outcomes["timeout"] += 1
+        except Exception as e:
+            print(f"Job {job_index} error: {e}")
+            with self.lock:
+                self.outcomes["error"] += 1
+
+    def run(self) -> dict:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.args.concurrency) as executor:
+            list(executor.map(self.run_job, range(self.args.jobs)))
+        elapsed = time.perf_counter() - started
+        return {
+            "jobs": self.args.jobs,
+            "concurrency": self.args.concurrency,
+            "elapsed_seconds": round(elapsed, 3),
+            "jobs_per_second": round(self.outcomes["completed"] / elapsed, 3) if elapsed else None,
+            "outcomes": self.outcomes,
+            "rejections_429": self.rejections,
+            "coalesced": self.coalesced,
+            "latency_seconds": summarize(self.e2e),
+            "submit_latency_seconds": summarize(self.submit_latency),
+            "poll_latency_seconds": summarize(self.poll_latency),
+        }
+
+
+def wait_for_server(base_url: str, proc: subprocess.Popen, timeout: float = 60.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("API server exited during startup")
+        try:
+            with urllib.request.urlopen(base_url + "/ping", timeout=2):
+                return
+        except Exception:
+            time.sleep(0.2)
+    raise RuntimeError("API server did not become ready in time")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test for the LecGen API")
+    parser.add_argument("--jobs", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--mix", default="text=3,file=1", help="Weighted job kinds, e.g. text=3,file=1")
+    parser.add_argument("--duplicate-ratio", type=float, default=0.0,
+                        help="Fraction of submissions that repeat a shared source (exercises coalescing)")
+    parser.add_argument("--text-repeat", type=int, default=200, help="Sentence repetitions per text job")
+    parser.add_argument("--audio-seconds", type=float, default=5.0, help="Length of generated WAV uploads")
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    parser.add_argument("--job-timeout", type=float, default=600.0)
+    parser.add_argument("--api-env", action="append", default=[],
+                        help="Extra KEY=VALUE for the API process, e.g. MAX_CONCURRENT_JOBS=8")
+    parser.add_argument("--json", help="Write the report to this file as JSON")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    fake_config = config_from_args(args)
+    fake = start_fake_groq(fake_config)
+    fake_url = f"http://127.0.0.1:{fake.server_address[1]}"
+
+    port = free_port()
+    workdir = tempfile.mkdtemp(prefix="lecgen_load_")
+    env = dict(os.environ)
+    env.update({
+        "GROQ_BASE_URL": fake_url,
+        "GROQ_API_KEY": "fake-key",
+        "PYTHONPATH": PROJECT_ROOT + os.pathsep + env.get("PYTHONPATH", ""),
+    })
+    for item in args.api_env:
+        key, _, value = item.partition("=")
+        env[key] = value
+
+    # Run from a scratch directory so uploads/ and data/ stay out of the repo
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=workdir, env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_for_server(base_url, proc)
+        report = LoadTest(base_url, args).run()
+        report["peak_rss_kb"] = peak_rss_kb(proc.pid)
+        report["fake_groq_requests"] = dict(fake_config.counts)
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        fake.shutdown()
+
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
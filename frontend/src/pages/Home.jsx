@@ -29,6 +29,7 @@ const Home = () => {
   const [file, setFile] = useState(null);
   const [isProcessing, setIsProcessing] = useState(false);
   const [processingStatus, setProcessingStatus] = useState('processing');
+  const [queuePosition, setQueuePosition] = useState(null);
   const [error, setError] = useState(null);
   
   const { language } = useSettings();
@@ -42,9 +43,10 @@ const Home = () => {
     pollIntervalRef.current = setInterval(async () => {
       try {
         const response = await axios.get(`${API_BASE_URL}/tasks/${taskId}`);
-        const { status, result, error: taskError } = response.data;
+        const { status, result, error: taskError, queue_position } = response.data;
         
         setProcessingStatus(status);
+        setQueuePosition(queue_position ?? null);
         
         if (status === 'completed') {
           clearInterval(pollIntervalRef.current);
@@ -310,12 +312,15 @@ const Home = () => {
               </div>
             </div>
             <h2 className="text-2xl font-bold mb-2 text-main">
-              {processingStatus === 'compressing' ? 'Compressing File...' : 
+              {processingStatus === 'queued' ? 'Waiting in Queue...' :
+               processingStatus === 'compressing' ? 'Compressing File...' : 
                processingStatus === 'optimizing' ? 'Optimizing Content...' :
                'Creating Study Guides'}
             </h2>
             <p className="text-muted text-xs mb-8 font-bold uppercase tracking-widest text-center max-w-sm">
-               {processingStatus === 'compressing' ? 
+               {processingStatus === 'queued' ?
+                 (queuePosition ? `Position ${queuePosition} in line • Starting soon` : 'Starting soon') :
+                processingStatus === 'compressing' ? 
                  'Your file is being compressed, this may take some time before generation begins.' : 
                 (processingStatus === 'processing' || processingStatus === 'optimizing') && file && file.size < 5 * 1024 * 1024 ?
                  'File size compressed for faster processing • Max 1 Minute' :
@@ -323,7 +328,7 @@ const Home = () => {
             </p>
             <div className="flex flex-col gap-3 max-w-xs w-full">
               {[
-                { label: 'Reading Audio Data', status: !['compressing', 'optimizing'].includes(processingStatus) },
+                { label: 'Reading Audio Data', status: !['queued', 'compressing', 'optimizing'].includes(processingStatus) },
                 { label: 'Creating Study Materials', status: processingStatus === 'processing' },
                 { label: 'Finalizing Materials', status: false }
               ].map((step, i) => (
@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import axios from 'axios';
 import { 
   Upload, 
@@ -18,12 +18,30 @@ import Navbar from '../components/Navbar';
 import Footer from '../components/Footer';
 import { API_BASE_URL } from '../config';
 
+const STAGE_LABELS = {
+  download: 'Downloading',
+  extract: 'Extracting',
+  dedupe: 'Grouping Repeats',
+  cluster: 'Clustering',
+  topic_naming: 'Naming Topics',
+  topics: 'Building Topics',
+  answers: 'Generating Answers',
+  index: 'Indexing'
+};
+const POLL_INTERVAL_MS = 1000;
+
 const PYQAnalytics = () => {
   const [files, setFiles] = useState([]);
   const [driveLink, setDriveLink] = useState('');
+  const [subject, setSubject] = useState('');
   const [isAnalyzing, setIsAnalyzing] = useState(false);
   const [result, setResult] = useState(null);
   const [error, setError] = useState(null);
+  const [answering, setAnswering] = useState({});
+  const [job, setJob] = useState(null);
+  const pollRef = useRef(null);
+
+  useEffect(() => () => clearTimeout(pollRef.current), []);
 
   const handleFileChange = (e) => {
     if (e.target.files) {
@@ -32,11 +50,54 @@ const PYQAnalytics = () => {
     }
   };
 
+  // Poll the job, rendering topic sections as they are published, until it finishes
+  const pollJob = async (jobId, since = 0, sections = {}) => {
+    try {
+      const { data } = await axios.get(`${API_BASE_URL}/analyze/pyq/${jobId}`, { params: { since } });
+      data.sections.forEach(({ topic }) => { sections[topic.topic_id] = topic; });
+      setJob(data);
+      if (data.status === 'completed') {
+        setResult(data.result);
+      } else {
+        const analysis = Object.values(sections).sort((a, b) => a.topic_id - b.topic_id);
+        if (analysis.length > 0) {
+          setResult({
+            total_questions: data.total_questions,
+            topics_found: data.topics_found ?? analysis.length,
+            analysis,
+            summary: { analysis_status: data.status === 'cancelled' ? 'Cancelled' : 'In Progress' }
+          });
+        }
+        if (data.status === 'failed') {
+          setError(data.error || 'Analysis failed. Please check your files or link.');
+        } else if (data.status !== 'cancelled') {
+          pollRef.current = setTimeout(() => pollJob(jobId, data.next, sections), POLL_INTERVAL_MS);
+          return;
+        }
+      }
+    } catch (err) {
+      setError(err.response?.data?.detail || 'Lost track of the analysis. Please try again.');
+    }
+    setIsAnalyzing(false);
+  };
+
+  const handleCancel = async () => {
+    if (!job) return;
+    try {
+      await axios.delete(`${API_BASE_URL}/analyze/pyq/${job.job_id}`);
+    } catch (err) {
+      // Already finished; the next poll shows the outcome
+    }
+  };
+
   const handleAnalyze = async () => {
     if (files.length === 0 && !driveLink) return;
 
+    clearTimeout(pollRef.current);
     setIsAnalyzing(true);
     setError(null);
+    setResult(null);
+    setJob(null);
 
     const formData = new FormData();
     files.forEach(file => {
@@ -47,16 +108,58 @@ const PYQAnalytics = () => {
       formData.append('drive_link', driveLink);
     }
 
+    if (subject.trim()) {
+      formData.append('subject', subject.trim());
+    }
+
+    // Stored answers come back with the analysis; the rest are generated per topic on demand
+    formData.append('answers', 'lazy');
+
     try {
       const response = await axios.post(`${API_BASE_URL}/analyze/pyq`, formData);
-      setResult(response.data);
+      setJob(response.data);
+      pollJob(response.data.job_id);
     } catch (err) {
       setError(err.response?.data?.detail || 'Analysis failed. Please check your files or link.');
-    } finally {
       setIsAnalyzing(false);
     }
   };
 
+  const progressLabel = () => {
+    if (!job || job.status === 'queued') {
+      return job?.queue_position ? `Queued (#${job.queue_position})` : 'Analyzing Pattern...';
+    }
+    if (job.status === 'cancelling') return 'Cancelling...';
+    const label = STAGE_LABELS[job.stage] || 'Analyzing Pattern';
+    return job.progress ? `${label} ${job.progress.done}/${job.progress.total}` : `${label}...`;
+  };
+
+  const handleAnswers = async (topicIdx) => {
+    const topic = result.analysis[topicIdx];
+    const pending = topic.questions.filter(q => !q.ai_answer).map(q => q.text);
+    if (pending.length === 0) return;
+
+    setAnswering(prev => ({ ...prev, [topicIdx]: true }));
+    try {
+      const response = await axios.post(`${API_BASE_URL}/analyze/pyq/answers`, { questions: pending });
+      const answers = Object.fromEntries(
+        response.data.answers.filter(a => a.ai_answer).map(a => [a.text, a.ai_answer])
+      );
+      setResult(prev => ({
+        ...prev,
+        analysis: prev.analysis.map((t, i) => {
+          if (i !== topicIdx) return t;
+          const questions = t.questions.map(q => (answers[q.text] ? { ...q, ai_answer: answers[q.text] } : q));
+          return { ...t, questions, answers_pending: questions.filter(q => !q.ai_answer).length };
+        })
+      }));
+    } catch (err) {
+      setError(err.response?.data?.detail || 'Could not generate answers. Please try again.');
+    } finally {
+      setAnswering(prev => ({ ...prev, [topicIdx]: false }));
+    }
+  };
+
   return (
     <div className="min-h-screen relative overflow-hidden transition-colors duration-500">
       <div className="mesh-bg">
@@ -131,6 +234,16 @@ const PYQAnalytics = () => {
               </div>
             </div>
 
+            <div className="mt-4">
+              <input 
+                type="text" 
+                placeholder="Subject (optional, e.g. Operating Systems)"
+                className="w-full bg-black/20 border border-white/10 rounded-xl px-4 py-3 text-sm focus:outline-none focus:border-primary/50 transition-all text-secondary"
+                value={subject}
+                onChange={(e) => setSubject(e.target.value)}
+              />
+            </div>
+
             {error && (
               <Motion.div 
                 initial={{ opacity: 0, y: 10 }}
@@ -148,7 +261,7 @@ const PYQAnalytics = () => {
             >
               {isAnalyzing ? (
                 <>
-                  <Loader2 size={18} className="animate-spin" /> Analyzing Pattern...
+                  <Loader2 size={18} className="animate-spin" /> {progressLabel()}
                 </>
               ) : (
                 <>
@@ -156,6 +269,16 @@ const PYQAnalytics = () => {
                 </>
               )}
             </button>
+
+            {isAnalyzing && job && (
+              <button
+                onClick={handleCancel}
+                disabled={job.status === 'cancelling'}
+                className="mt-3 w-full py-3 rounded-xl text-xs font-bold uppercase tracking-widest text-muted border border-white/10 hover:bg-white/5 transition-all disabled:opacity-50"
+              >
+                Cancel Analysis
+              </button>
+            )}
           </div>
         </div>
 
@@ -250,9 +373,21 @@ const PYQAnalytics = () => {
 
                   <div className="grid grid-cols-1 lg:grid-cols-3 gap-8">
                     <div className="lg:col-span-2 space-y-4">
-                      <h3 className="text-xs font-bold uppercase tracking-widest text-secondary mb-4 flex items-center gap-2">
-                        <FileText size={14} /> Key Questions
-                      </h3>
+                      <div className="flex items-center justify-between mb-4">
+                        <h3 className="text-xs font-bold uppercase tracking-widest text-secondary flex items-center gap-2">
+                          <FileText size={14} /> Key Questions
+                        </h3>
+                        {!isAnalyzing && topic.answers_pending > 0 && (
+                          <button
+                            onClick={() => handleAnswers(idx)}
+                            disabled={answering[idx]}
+                            className="flex items-center gap-2 text-[10px] font-bold uppercase tracking-widest text-primary px-3 py-1.5 rounded-lg bg-primary/10 hover:bg-primary/20 border border-primary/20 transition-all disabled:opacity-50"
+                          >
+                            {answering[idx] && <Loader2 size={12} className="animate-spin" />}
+                            {answering[idx] ? 'Generating...' : `Generate AI Answers (${topic.answers_pending})`}
+                          </button>
+                        )}
+                      </div>
                       {topic.questions.map((q, i) => (
                         <div key={i} className="p-4 rounded-xl bg-white/5 hover:bg-white/10 transition-colors border border-white/5">
                           <div className="flex gap-4">
@@ -5,6 +5,7 @@ LLM Tasks:     Groq LLaMA 3 (llama-3.1-8b-instant) for notes, quiz, flashcards
 """
 
 import os
+import re
 import uuid
 import subprocess
 import sys
@@ -18,10 +19,23 @@ if sys.platform == "win32":
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
 
-from groq import Groq
+import threading
+import scratch
+import telemetry
 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-client = Groq(api_key=GROQ_API_KEY)
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """Create the Groq client on first use, so importing this module stays cheap."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from groq import Groq
+                _client = Groq(api_key=GROQ_API_KEY)
+    return _client
 
 # ── Model Config ────────────────────────────────────────────────────────────────
 TRANSCRIPTION_MODEL = "whisper-large-v3-turbo"   # Fastest Groq Whisper
@@ -34,18 +48,23 @@ os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 
 
 # ── Helpers ─────────────────────────────────────────────────────────────────────
-def _llm(prompt: str, system: str = "You are an expert AI educational assistant.", max_tokens: int = 4096) -> str:
-    """Single LLM call to Groq with error handling."""
+def _llm(prompt: str, system: str = "You are an expert AI educational assistant.", max_tokens: int = 4096,
+         task: str = "generic") -> str:
+    """Single LLM call to Groq with error handling. `task` labels the call in metrics."""
     try:
-        resp = client.chat.completions.create(
-            model=LLM_MODEL,
-            messages=[
-                {"role": "system", "content": system},
-                {"role": "user",   "content": prompt},
-            ],
-            temperature=0.3,
-            max_tokens=max_tokens,
-        )
+        with telemetry.stage("llm", task=task):
+            resp = get_client().chat.completions.create(
+                model=LLM_MODEL,
+                messages=[
+                    {"role": "system", "content": system},
+                    {"role": "user",   "content": prompt},
+                ],
+                temperature=0.3,
+                max_tokens=max_tokens,
+            )
+            usage = getattr(resp, "usage", None)
+            if usage is not None:
+                telemetry.record_tokens(task, usage.prompt_tokens or 0, usage.completion_tokens or 0)
         return resp.choices[0].message.content.strip()
     except Exception as e:
         print(f"Groq LLM error: {e}")
@@ -77,11 +96,13 @@ def transcribe_audio(audio_path: str) -> str:
             audio_bytes = f.read()
 
         filename = os.path.basename(audio_path)
-        resp = client.audio.transcriptions.create(
-            model=TRANSCRIPTION_MODEL,
-            file=(filename, audio_bytes),
-            response_format="text",
-        )
+        with telemetry.stage("transcribe"):
+            telemetry.annotate(bytes=len(audio_bytes))
+            resp = get_client().audio.transcriptions.create(
+                model=TRANSCRIPTION_MODEL,
+                file=(filename, audio_bytes),
+                response_format="text",
+            )
         return resp if isinstance(resp, str) else resp.text
     except Exception as e:
         print(f"Groq transcription error: {e}")
@@ -89,7 +110,22 @@ def transcribe_audio(audio_path: str) -> str:
 
 
 # ── YouTube Download ─────────────────────────────────────────────────────────────
+_YT_ID_RE = re.compile(r'(?:[?&]v=|youtu\.be/|/shorts/|/embed/|/live/)([A-Za-z0-9_-]{11})')
+
+def youtube_video_id(url: str) -> str | None:
+    """Extract the 11-character video ID from any common YouTube URL form."""
+    match = _YT_ID_RE.search(url.strip())
+    return match.group(1) if match else None
+
+
 def handle_youtube(url: str) -> str | None:
+    # Downloaded audio is kept in the scratch cache, keyed by video ID
+    video_id = youtube_video_id(url)
+    if video_id:
+        cached = scratch.cache_get(f"yt_{video_id}.mp3")
+        if cached:
+            return cached
+
     import yt_dlp
     uid = str(uuid.uuid4())[:8]
     out_tmpl = os.path.join(UPLOAD_FOLDER, f"yt_{uid}.%(ext)s")
@@ -107,10 +143,17 @@ def handle_youtube(url: str) -> str | None:
     if FFMPEG_PATH:
         ydl_opts["ffmpeg_location"] = FFMPEG_PATH
     try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        with telemetry.stage("youtube_download"), yt_dlp.YoutubeDL(ydl_opts) as ydl:
             ydl.download([url])
-        expected = os.path.join(UPLOAD_FOLDER, f"yt_{uid}.mp3")
-        return expected if os.path.exists(expected) else None
+            expected = os.path.join(UPLOAD_FOLDER, f"yt_{uid}.mp3")
+            if os.path.exists(expected):
+                telemetry.annotate(bytes=os.path.getsize(expected))
+        if not os.path.exists(expected):
+            return None
+        if video_id:
+            return scratch.cache_put(f"yt_{video_id}.mp3", expected)
+        scratch.track(expected)
+        return expected
     except Exception as e:
         print(f"yt-dlp error: {e}")
         return None
@@ -119,7 +162,9 @@ def handle_youtube(url: str) -> str | None:
 def extract_audio(video_path: str, out_audio: str = "lecture.mp3") -> str:
     dest = os.path.join(UPLOAD_FOLDER, out_audio)
     cmd = ["ffmpeg", "-y", "-i", video_path, "-vn", "-acodec", "libmp3lame", "-ab", "96k", "-ar", "22050", dest]
-    subprocess.run(cmd, capture_output=True, check=False)
+    with telemetry.stage("extract_audio"):
+        subprocess.run(cmd, capture_output=True, check=False)
+    scratch.track(dest)
     return dest
 
 
@@ -135,7 +180,7 @@ Do not include conversational filler.
 
 **Transcript:**
 {transcript[:8000]}"""
-    return _llm(prompt, max_tokens=1000)
+    return _llm(prompt, max_tokens=1000, task="notes")
 
 
 def generate_quiz(transcript: str) -> list[dict]:
@@ -155,7 +200,7 @@ Return exactly as a JSON array, no markdown fences:
 
 Transcript:
 {transcript[:6000]}"""
-    raw = _llm(prompt, max_tokens=1500)
+    raw = _llm(prompt, max_tokens=1500, task="quiz")
     try:
         import json, re
         match = re.search(r'\[.*\]', raw, re.DOTALL)
@@ -185,7 +230,7 @@ Return exactly as a JSON array, no markdown fences:
 
 Transcript:
 {transcript[:6000]}"""
-    raw = _llm(prompt, max_tokens=1500)
+    raw = _llm(prompt, max_tokens=1500, task="flashcards")
     try:
         import json, re
         match = re.search(r'\[.*\]', raw, re.DOTALL)
@@ -196,6 +241,153 @@ Transcript:
     return []
 
 
+# ── Translation ──────────────────────────────────────────────────────────────────
+LANGUAGE_NAMES = {
+    "en": "English", "es": "Spanish", "fr": "French", "de": "German", "hi": "Hindi",
+    "bn": "Bengali", "ta": "Tamil", "te": "Telugu", "mr": "Marathi", "gu": "Gujarati",
+    "kn": "Kannada", "ml": "Malayalam", "pa": "Punjabi", "ur": "Urdu", "zh": "Chinese",
+    "ja": "Japanese", "ko": "Korean", "ar": "Arabic", "pt": "Portuguese", "ru": "Russian",
+    "it": "Italian",
+}
+TRANSLATION_BATCH_CHARS = 5000   # Most source characters packed into one LLM call
+TRANSLATION_MAX_TOKENS = 4096
+TRANSLATION_OUTPUT_BUDGET = 3000  # Output tokens a batch is sized for, leaving headroom under the cap
+TRANSLATION_MAX_SPLITS = 3        # Times a truncated or unparseable batch is halved and retried
+# Estimated output tokens per English source character, by target language. Non-Latin
+# scripts take several times the tokens of the English they translate.
+OUTPUT_TOKENS_PER_CHAR = {
+    "en": 0.35, "es": 0.35, "fr": 0.35, "de": 0.35, "pt": 0.35, "it": 0.35,
+    "ru": 0.6, "zh": 0.8, "ja": 0.8, "ko": 0.8,
+    "hi": 1.5, "mr": 1.5, "bn": 1.5, "gu": 1.5, "pa": 1.5, "ur": 1.5, "ar": 1.5,
+    "ta": 2.0, "te": 2.0, "kn": 2.0, "ml": 2.0,
+}
+DEFAULT_OUTPUT_TOKENS_PER_CHAR = 2.0  # Unknown languages are sized for the worst case
+
+
+def _translatable_fields(result: dict) -> list[tuple]:
+    """(container, key) pairs for every user-facing string except the transcript."""
+    def strings(container, keys):
+        return [(container, k) for k in keys if isinstance(container.get(k), str)]
+
+    fields = strings(result, ["notes"])
+    for item in result.get("quiz", []):
+        fields += strings(item, ["question", "correct", "explanation"])
+        options = item.get("options")
+        if isinstance(options, list):
+            fields += [(options, i) for i, o in enumerate(options) if isinstance(o, str)]
+    for item in result.get("qa", []):
+        fields += strings(item, ["question", "answer"])
+    for card in result.get("flashcards", []):
+        fields += strings(card, ["front", "back"])
+    return fields
+
+
+def translation_batch_chars(target_lang: str) -> int:
+    """Source characters per batch whose translation fits the output budget."""
+    per_char = OUTPUT_TOKENS_PER_CHAR.get(target_lang, DEFAULT_OUTPUT_TOKENS_PER_CHAR)
+    return min(TRANSLATION_BATCH_CHARS, int(TRANSLATION_OUTPUT_BUDGET / per_char))
+
+
+def _pieces(text: str, limit: int) -> list[str]:
+    """A string split at line breaks into pieces of about `limit` characters; joined with "\n" they give it back."""
+    if len(text) <= limit:
+        return [text]
+    pieces, lines, size = [], [], 0
+    for line in text.split("\n"):
+        if lines and size + len(line) > limit:
+            pieces.append("\n".join(lines))
+            lines, size = [], 0
+        lines.append(line)
+        size += len(line) + 1
+    pieces.append("\n".join(lines))
+    return pieces
+
+
+def _translate_batch(strings: list[str], language: str) -> list[str] | None:
+    """Translate a batch of strings in one call; None if the reply cannot be matched up."""
+    import json
+    prompt = f"""Translate every string in this JSON array into {language}.
+Keep markdown, bullet characters, line breaks and technical terms intact.
+Return exactly a JSON array of {len(strings)} translated strings in the same order, no markdown fences.
+
+{json.dumps(strings, ensure_ascii=False)}"""
+    raw = _llm(prompt, system="You are a precise educational translator.", max_tokens=TRANSLATION_MAX_TOKENS,
+               task="translate")
+    try:
+        match = re.search(r'\[.*\]', raw, re.DOTALL)
+        translated = json.loads(match.group()) if match else None
+    except Exception as e:
+        print(f"Translation parse error: {e}")
+        return None
+    if not isinstance(translated, list) or len(translated) != len(strings):
+        return None
+    return [t if isinstance(t, str) and t.strip() else s for s, t in zip(strings, translated)]
+
+
+def _translate_strings(strings: list[str], language: str, splits: int = TRANSLATION_MAX_SPLITS) -> dict:
+    """
+    Translate a batch; a reply that was cut off or cannot be parsed is retried
+    as two half batches, up to `splits` times. Returns source -> translation
+    for the strings that were translated.
+    """
+    out = _translate_batch(strings, language)
+    if out is not None:
+        return dict(zip(strings, out))
+    if len(strings) == 1 or splits <= 0:
+        return {}
+    middle = len(strings) // 2
+    return {**_translate_strings(strings[:middle], language, splits - 1),
+            **_translate_strings(strings[middle:], language, splits - 1)}
+
+
+def translate_result(result: dict, target_lang: str) -> dict:
+    """
+    Translate notes, Q&A, quiz and flashcards into target_lang.
+    Unique strings are packed into a few batched LLM calls run in parallel,
+    each sized so its translation fits the output token limit for the target
+    script; long fields such as notes are split at line breaks. Returns a new
+    result; the original is left untouched. If some strings cannot be
+    translated they stay in the original and `translation_incomplete` is set.
+    """
+    import copy
+    import concurrent.futures
+    translated = copy.deepcopy(result)
+    fields = _translatable_fields(translated)
+    language = LANGUAGE_NAMES.get(target_lang, target_lang)
+    limit = translation_batch_chars(target_lang)
+
+    # Identical strings (e.g. quiz answers repeated in Q&A) are translated once
+    unique = list(dict.fromkeys(c[k] for c, k in fields if c[k].strip()))
+    pieces = {text: _pieces(text, limit) for text in unique}
+    units = list(dict.fromkeys(p for text in unique for p in pieces[text] if p.strip()))
+    batches, current, size = [], [], 0
+    for text in units:
+        if current and size + len(text) > limit:
+            batches.append(current)
+            current, size = [], 0
+        current.append(text)
+        size += len(text)
+    if current:
+        batches.append(current)
+
+    mapping = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=3) as ex:
+        for out in ex.map(lambda b: _translate_strings(b, language), batches):
+            mapping.update(out)
+
+    missing = sum(1 for text in units if text not in mapping)
+    if units and missing == len(units):
+        raise RuntimeError("Translation service returned no usable output")
+    for container, key in fields:
+        text = container[key]
+        if text in pieces:
+            container[key] = "\n".join(mapping.get(p, p) for p in pieces[text])
+    translated["language"] = target_lang
+    if missing:
+        translated["translation_incomplete"] = True
+    return translated
+
+
 # ── Main Pipeline ────────────────────────────────────────────────────────────────
 def process_lecture(source_type: str, data: str, target_lang: str = "en") -> dict | None:
     audio_path = None
@@ -226,11 +418,13 @@ def process_lecture(source_type: str, data: str, target_lang: str = "en") -> dic
     print(f"Transcript ready ({len(transcript.split())} words). Running Groq LLM tasks in parallel...")
 
     # 3. Run all LLM tasks in parallel via threads
+    # Each submit carries a copy of the current context so LLM spans nest under this stage
     import concurrent.futures
-    with concurrent.futures.ThreadPoolExecutor(max_workers=3) as ex:
-        f_notes      = ex.submit(generate_notes, transcript)
-        f_quiz       = ex.submit(generate_quiz, transcript)
-        f_flashcards = ex.submit(generate_flashcards, transcript)
+    import contextvars
+    with telemetry.stage("llm_parallel"), concurrent.futures.ThreadPoolExecutor(max_workers=3) as ex:
+        f_notes      = ex.submit(contextvars.copy_context().run, generate_notes, transcript)
+        f_quiz       = ex.submit(contextvars.copy_context().run, generate_quiz, transcript)
+        f_flashcards = ex.submit(contextvars.copy_context().run, generate_flashcards, transcript)
 
         notes      = f_notes.result(timeout=60)      or "• Notes unavailable."
         quiz_data  = f_quiz.result(timeout=60)       or []
@@ -0,0 +1,237 @@
+"""
+scratch.py — Managed scratch space for uploads/ and outputs/.
+
+- Ownership: files created for a task are tracked against it (explicitly, or
+  through the owner active in the current context) and deleted when the task
+  releases them.
+- Cache: files worth keeping (e.g. downloaded YouTube audio) move into a
+  size-bounded LRU directory and are pinned while a task is using them.
+- Sweeper: a background thread removes stale, unowned leftovers and enforces
+  the cache bound, counting reclaimed bytes in telemetry.
+"""
+
+import contextvars
+import os
+import re
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+
+import telemetry
+
+UPLOAD_FOLDER = "uploads"
+OUTPUT_FOLDER = "outputs"
+CACHE_DIR = os.path.join(UPLOAD_FOLDER, "cache")
+CACHE_MAX_BYTES = int(os.getenv("SCRATCH_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+MAX_AGE_SECONDS = float(os.getenv("SCRATCH_MAX_AGE_SECONDS", str(6 * 3600)))
+SWEEP_INTERVAL_SECONDS = float(os.getenv("SCRATCH_SWEEP_INTERVAL_SECONDS", "600"))
+
+RECLAIMED_BYTES = telemetry.REGISTRY.counter(
+    "lecgen_scratch_reclaimed_bytes_total", "Bytes deleted from scratch space, by reason.")
+RECLAIMED_FILES = telemetry.REGISTRY.counter(
+    "lecgen_scratch_reclaimed_files_total", "Files or folders deleted from scratch space, by reason.")
+
+_current_owner = contextvars.ContextVar("scratch_owner", default=None)
+
+
+def _size_of(path: str) -> int:
+    if os.path.isdir(path):
+        total = 0
+        for root, _, files in os.walk(path):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        return total
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _delete(path: str, reason: str) -> int:
+    size = _size_of(path)
+    try:
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+        else:
+            return 0
+    except OSError as e:
+        print(f"Scratch cleanup failed for {path}: {e}")
+        return 0
+    RECLAIMED_BYTES.inc(size, reason=reason)
+    RECLAIMED_FILES.inc(reason=reason)
+    return size
+
+
+class ScratchSpace:
+    def __init__(self, roots: list[str], cache_dir: str, cache_max_bytes: int, max_age_seconds: float):
+        self.roots = roots
+        self.cache_dir = cache_dir
+        self.cache_max_bytes = cache_max_bytes
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        self._owned = {}    # owner -> set of absolute paths
+        self._pinned = {}   # owner -> set of cache paths in use
+        self._sweep_hooks = []
+        self._sweeper = None
+
+    # ── Ownership ──────────────────────────────────────────────────────────────
+    @contextmanager
+    def owned_by(self, owner: str):
+        """Files tracked in this context without an explicit owner belong to `owner`."""
+        token = _current_owner.set(owner)
+        try:
+            yield
+        finally:
+            _current_owner.reset(token)
+
+    def track(self, path: str, owner: str | None = None):
+        """Record that `owner` (default: the current context's owner) owns a scratch path."""
+        owner = owner or _current_owner.get()
+        if owner is None or not path:
+            return
+        with self._lock:
+            self._owned.setdefault(owner, set()).add(os.path.abspath(path))
+
+    def release(self, owner: str) -> int:
+        """Delete everything an owner created and unpin its cache entries. Returns bytes reclaimed."""
+        with self._lock:
+            paths = self._owned.pop(owner, set())
+            self._pinned.pop(owner, None)
+        return sum(_delete(path, "release") for path in paths)
+
+    def _in_use(self) -> set:
+        with self._lock:
+            used = set()
+            for paths in list(self._owned.values()) + list(self._pinned.values()):
+                used |= paths
+            return used
+
+    # ── Cache ──────────────────────────────────────────────────────────────────
+    def _cache_path(self, key: str) -> str:
+        return os.path.abspath(os.path.join(self.cache_dir, re.sub(r'[^A-Za-z0-9_.-]', '_', key)))
+
+    def cache_get(self, key: str) -> str | None:
+        """Return the cached file for a key (pinned for the current owner), or None."""
+        path = self._cache_path(key)
+        hit = os.path.exists(path)
+        telemetry.cache_lookup("scratch", hit)
+        if not hit:
+            return None
+        os.utime(path)  # mtime doubles as LRU recency
+        owner = _current_owner.get()
+        if owner is not None:
+            with self._lock:
+                self._pinned.setdefault(owner, set()).add(path)
+        return path
+
+    def cache_put(self, key: str, path: str) -> str:
+        """Move a scratch file into the cache under `key`; returns its new path."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        target = self._cache_path(key)
+        source = os.path.abspath(path)
+        os.replace(source, target)
+        with self._lock:
+            for paths in self._owned.values():
+                paths.discard(source)
+        owner = _current_owner.get()
+        if owner is not None:
+            with self._lock:
+                self._pinned.setdefault(owner, set()).add(target)
+        self._enforce_cache_bound()
+        return target
+
+    def _enforce_cache_bound(self) -> int:
+        if not os.path.isdir(self.cache_dir):
+            return 0
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.abspath(os.path.join(self.cache_dir, name))
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        if total <= self.cache_max_bytes:
+            return 0
+        in_use = self._in_use()
+        reclaimed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.cache_max_bytes:
+                break
+            if path in in_use:
+                continue
+            reclaimed += _delete(path, "evict")
+            total -= size
+        return reclaimed
+
+    # ── Sweeper ────────────────────────────────────────────────────────────────
+    def add_sweep_hook(self, hook):
+        """Run `hook()` (returning bytes reclaimed) on every sweep, e.g. another store's GC."""
+        self._sweep_hooks.append(hook)
+
+    def add_root(self, path: str):
+        if os.path.abspath(path) not in {os.path.abspath(r) for r in self.roots}:
+            self.roots.append(path)
+
+    def sweep(self) -> int:
+        """Delete unowned scratch entries older than max age, then enforce the cache bound."""
+        cutoff = time.time() - self.max_age_seconds
+        in_use = self._in_use()
+        cache_dir = os.path.abspath(self.cache_dir)
+        reclaimed = 0
+        for root in {os.path.abspath(r) for r in self.roots}:
+            if not os.path.isdir(root):
+                continue
+            for name in os.listdir(root):
+                path = os.path.join(root, name)
+                if path == cache_dir or path in in_use:
+                    continue
+                if any(p.startswith(path + os.sep) for p in in_use):
+                    continue
+                try:
+                    if os.path.getmtime(path) > cutoff:
+                        continue
+                except OSError:
+                    continue
+                reclaimed += _delete(path, "sweep")
+        for hook in self._sweep_hooks:
+            try:
+                reclaimed += hook()
+            except Exception as e:
+                print(f"Sweep hook {getattr(hook, '__qualname__', hook)} failed: {e}")
+        return reclaimed + self._enforce_cache_bound()
+
+    def start_sweeper(self, interval: float = SWEEP_INTERVAL_SECONDS):
+        if self._sweeper is not None:
+            return
+
+        def loop():
+            while True:
+                try:
+                    reclaimed = self.sweep()
+                    if reclaimed:
+                        print(f"Scratch sweeper reclaimed {reclaimed / (1024 * 1024):.1f} MB")
+                except Exception as e:
+                    print(f"Scratch sweep failed: {e}")
+                time.sleep(interval)
+
+        self._sweeper = threading.Thread(target=loop, daemon=True, name="scratch-sweeper")
+        self._sweeper.start()
+
+
+space = ScratchSpace([UPLOAD_FOLDER, OUTPUT_FOLDER], CACHE_DIR, CACHE_MAX_BYTES, MAX_AGE_SECONDS)
+telemetry.REGISTRY.gauge("lecgen_scratch_cache_bytes", "Bytes held in the scratch file cache.",
+                         callback=lambda: _size_of(space.cache_dir))
+
+owned_by = space.owned_by
+track = space.track
+release = space.release
+cache_get = space.cache_get
+cache_put = space.cache_put
@@ -0,0 +1,310 @@
+"""
+telemetry.py — Lightweight, always-on metrics for the lecture and PYQ pipelines.
+
+Counters, gauges and fixed-bucket histograms rendered in the Prometheus text
+exposition format. Each observation is a dict lookup plus a short locked
+update, so instrumentation can stay enabled in production.
+
+Stages timed with `stage()` are also recorded as spans on the active
+per-task `Timeline`, if there is one (see `Timeline.activate`).
+"""
+
+import bisect
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: tuple, extra: tuple = ()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(_label_key(labels), 0)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Gauge:
+    """Gauge whose value is either set directly or read from a callback at scrape time."""
+    def __init__(self, name: str, help_text: str, callback=None):
+        self.name = name
+        self.help = help_text
+        self.callback = callback
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        if self.callback is not None:
+            try:
+                lines.append(f"{self.name} {float(self.callback())}")
+            except Exception as e:
+                print(f"Gauge {self.name} callback failed: {e}")
+            return lines
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}  # label key -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def totals(self) -> dict:
+        """{label dict as sorted tuple: (sum, count)} for every series."""
+        with self._lock:
+            return {key: (series[-2], series[-1]) for key, series in self._series.items()}
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {key: list(series) for key, series in self._series.items()}
+        for key, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(key, (('le', bound),))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, (('le', '+Inf'),))} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {series[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {series[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _get_or_create(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._get_or_create(Counter, name, help_text)
+
+    def gauge(self, name: str, help_text: str, callback=None) -> Gauge:
+        gauge = self._get_or_create(Gauge, name, help_text)
+        if callback is not None:
+            gauge.callback = callback
+        return gauge
+
+    def histogram(self, name: str, help_text: str, buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, buckets)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# ── Shared pipeline metrics ──────────────────────────────────────────────────────
+STAGE_SECONDS = REGISTRY.histogram(
+    "lecgen_stage_duration_seconds", "Wall-clock time spent in each pipeline stage.")
+STAGE_ERRORS = REGISTRY.counter(
+    "lecgen_stage_errors_total", "Pipeline stages that raised an exception.")
+LLM_TOKENS = REGISTRY.counter(
+    "lecgen_llm_tokens_total", "LLM tokens consumed, by task and direction (in/out).")
+UPLOAD_BYTES = REGISTRY.counter(
+    "lecgen_uploaded_bytes_total", "Bytes received through upload endpoints.")
+CACHE_REQUESTS = REGISTRY.counter(
+    "lecgen_cache_requests_total", "Cache lookups by cache name and result (hit/miss).")
+
+
+# ── Per-task timelines ───────────────────────────────────────────────────────────
+# Optional JSON-lines trace exporter: one finished timeline per line
+TRACE_FILE = os.getenv("LECGEN_TRACE_FILE")
+_trace_file_lock = threading.Lock()
+
+# Innermost open span (or the Timeline itself) for the current thread/context.
+# Worker threads inherit it only when submitted via contextvars.copy_context().run.
+_current_span = contextvars.ContextVar("lecgen_current_span", default=None)
+
+
+class Span:
+    def __init__(self, name: str, timeline: "Timeline", attrs: dict):
+        self.name = name
+        self.timeline = timeline
+        self.attrs = dict(attrs)
+        self.start = time.perf_counter()
+        self.end = None
+        self.error = None
+        self.children = []
+
+    def add(self, **counts):
+        """Accumulate numeric attributes such as bytes or tokens on this span."""
+        for key, value in counts.items():
+            self.attrs[key] = self.attrs.get(key, 0) + value
+
+    def to_dict(self) -> dict:
+        end = self.end if self.end is not None else time.perf_counter()
+        data = {
+            "stage": self.name,
+            "start": round(self.start - self.timeline.start, 4),
+            "duration": round(end - self.start, 4),
+            **self.attrs,
+        }
+        if self.end is None:
+            data["running"] = True
+        if self.error:
+            data["error"] = self.error
+        if self.children:
+            data["spans"] = [child.to_dict() for child in list(self.children)]
+        return data
+
+
+class Timeline:
+    """Span tree for one task: stage name, start offset, duration, bytes and tokens."""
+    def __init__(self, **attrs):
+        self.attrs = attrs
+        self.started_at = datetime.now().isoformat()
+        self.start = time.perf_counter()
+        self.end = None
+        self.children = []
+
+    @contextmanager
+    def activate(self):
+        """Make this the active timeline so stages in this context record spans on it."""
+        token = _current_span.set(self)
+        try:
+            yield self
+        finally:
+            _current_span.reset(token)
+            self.end = time.perf_counter()
+            export_timeline(self)
+
+    def to_dict(self) -> dict:
+        end = self.end if self.end is not None else time.perf_counter()
+        return {
+            **self.attrs,
+            "started_at": self.started_at,
+            "duration": round(end - self.start, 4),
+            "spans": [child.to_dict() for child in list(self.children)],
+        }
+
+
+def current_span() -> Span | None:
+    span = _current_span.get()
+    return span if isinstance(span, Span) else None
+
+
+def annotate(**counts):
+    """Add bytes/tokens counts to the innermost open span, if any."""
+    span = current_span()
+    if span is not None:
+        span.add(**counts)
+
+
+def export_timeline(timeline: Timeline):
+    if not TRACE_FILE:
+        return
+    try:
+        line = json.dumps(timeline.to_dict(), default=str)
+        with _trace_file_lock, open(TRACE_FILE, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    except Exception as e:
+        print(f"Trace export failed: {e}")
+
+
+@contextmanager
+def stage(name: str, **labels):
+    """
+    Time a pipeline stage into lecgen_stage_duration_seconds{stage=name}, and
+    record it as a span (nested under any open span) on the active timeline.
+    """
+    parent = _current_span.get()
+    span = token = None
+    if parent is not None:
+        timeline = parent if isinstance(parent, Timeline) else parent.timeline
+        span = Span(name, timeline, labels)
+        parent.children.append(span)
+        token = _current_span.set(span)
+    started = time.perf_counter()
+    try:
+        yield span
+    except Exception as e:
+        STAGE_ERRORS.inc(stage=name, **labels)
+        if span is not None:
+            span.error = str(e)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage=name, **labels)
+        if span is not None:
+            span.end = time.perf_counter()
+            _current_span.reset(token)
+
+
+def cache_lookup(cache: str, hit: bool):
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def record_tokens(task: str, tokens_in: int, tokens_out: int):
+    if tokens_in:
+        LLM_TOKENS.inc(tokens_in, task=task, direction="in")
+    if tokens_out:
+        LLM_TOKENS.inc(tokens_out, task=task, direction="out")
+    annotate(tokens_in=tokens_in, tokens_out=tokens_out)
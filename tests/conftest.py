@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+# The API modules import each other as top-level names, as when run from api/
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "api"))
+
+
+@pytest.fixture(scope="session")
+def main(tmp_path_factory):
+    """The FastAPI app module, with its data/ directory in a scratch folder."""
+    os.chdir(tmp_path_factory.mktemp("app"))
+    import main as app_module
+    return app_module
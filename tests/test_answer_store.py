@@ -0,0 +1,107 @@
+import json
+import re
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+from answer_store import AnswerStore, RateLimiter, answer_key
+
+FIGURE_A = "![Diagram](/static/images/diagram_00000000000000aa.png)"
+FIGURE_B = "![Diagram](/static/images/diagram_00000000000000bb.png)"
+
+
+def fake_llm(calls):
+    def llm(prompt, max_tokens=0, task=""):
+        numbered = re.findall(r"^(\d+)\. (.*)$", prompt, re.MULTILINE)
+        calls.append(len(numbered))
+        return json.dumps({number: f"Answer to: {question}" for number, question in numbered})
+    return llm
+
+
+def store(tmp_path, **kwargs):
+    return AnswerStore(str(tmp_path / "answers.db"), limiter=RateLimiter(per_minute=0), **kwargs)
+
+
+def test_key_ignores_wording_noise_but_not_diagrams():
+    assert answer_key("Explain deadlock. (5 marks)") == answer_key("explain DEADLOCK")
+    assert answer_key(f"Explain the circuit. {FIGURE_A}") != answer_key(f"Explain the circuit. {FIGURE_B}")
+    assert answer_key(f"Compare {FIGURE_A} and {FIGURE_B}") == answer_key(f"compare {FIGURE_B} and {FIGURE_A}")
+    assert answer_key(f"Explain the circuit. {FIGURE_A}") != answer_key("Explain the circuit.")
+
+
+def test_answers_are_generated_once_in_batches(tmp_path):
+    calls = []
+    answers = store(tmp_path, batch_size=4)
+    questions = [f"Explain concept number {i}." for i in range(10)]
+    assert set(answers.answer(questions, fake_llm(calls))) == set(questions)
+    assert sorted(calls) == [2, 4, 4]
+    # Stored: a rewording is answered without calling the LLM again
+    assert answers.answer(["explain concept number 3"], fake_llm(calls)) == {
+        "explain concept number 3": "Answer to: Explain concept number 3."}
+    assert len(calls) == 3
+    assert answers.answer(["Explain something new."]) == {}  # no llm: stored answers only
+
+
+def test_same_text_with_another_figure_gets_its_own_answer(tmp_path):
+    calls = []
+    answers = store(tmp_path)
+    answers.answer([f"Explain the circuit. {FIGURE_A}"], fake_llm(calls))
+    replies = answers.answer([f"Explain the circuit. {FIGURE_B}"], fake_llm(calls))
+    assert replies == {f"Explain the circuit. {FIGURE_B}": f"Answer to: Explain the circuit. {FIGURE_B}"}
+    assert calls == [1, 1]
+
+
+def test_answer_endpoint_has_its_own_limit(main, monkeypatch, tmp_path):
+    import pyq_analyzer
+    calls = []
+    monkeypatch.setattr(main.get_pyq_analyzer(), "answer_store", store(tmp_path))
+    monkeypatch.setattr(pyq_analyzer, "_llm", fake_llm(calls))
+    client = TestClient(main.app)
+
+    # A client whose job quota is full (e.g. a running PYQ analysis) can still open topics
+    release = threading.Event()
+    for i in range(main.scheduler.max_jobs_per_user):
+        main.scheduler.submit(f"blocker-{i}", "anon:testclient", 1.0, release.wait, 10)
+    try:
+        response = client.post("/analyze/pyq/answers", json={"questions": ["Explain paging."]})
+        assert response.json() == {"answers": [{"text": "Explain paging.", "ai_answer": "Answer to: Explain paging."}],
+                                   "pending": 0}
+    finally:
+        release.set()
+
+    # Answer batches still generating count against the client's own answer limit
+    monkeypatch.setitem(main.answer_batches, "anon:testclient", main.PYQ_ANSWER_BATCHES_PER_USER)
+    busy = client.post("/analyze/pyq/answers", json={"questions": ["Explain segmentation."]})
+    assert busy.status_code == 429
+    assert int(busy.headers["Retry-After"]) >= 1
+    # Stored answers need no LLM call, so they are served even at the limit
+    stored = client.post("/analyze/pyq/answers", json={"questions": ["Explain paging."]})
+    assert stored.status_code == 200 and stored.json()["pending"] == 0
+    assert calls == [1]
+
+
+def test_slow_answers_are_stored_after_the_request_gives_up(main, monkeypatch, tmp_path, capsys):
+    import pyq_analyzer
+    calls, release = [], threading.Event()
+    llm = fake_llm(calls)
+
+    def slow_llm(prompt, max_tokens=0, task=""):
+        release.wait(10)
+        return llm(prompt, max_tokens, task)
+    answers = store(tmp_path)
+    monkeypatch.setattr(main.get_pyq_analyzer(), "answer_store", answers)
+    monkeypatch.setattr(pyq_analyzer, "_llm", slow_llm)
+    monkeypatch.setattr(main, "PYQ_ANSWER_WAIT", 0.05)
+    client = TestClient(main.app)
+
+    response = client.post("/analyze/pyq/answers", json={"questions": ["Explain thrashing."]})
+    assert response.json()["pending"] == 1
+    release.set()
+    deadline = time.monotonic() + 5
+    while not answers.answer(["Explain thrashing."]) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.1)  # the batch resolves its future just after storing
+    assert answers.answer(["Explain thrashing."]) == {"Explain thrashing.": "Answer to: Explain thrashing."}
+    assert "error" not in capsys.readouterr().out
+    assert "anon:testclient" not in main.answer_batches
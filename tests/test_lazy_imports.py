@@ -0,0 +1,16 @@
+import os
+import subprocess
+import sys
+
+from conftest import ROOT
+
+HEAVY = ("numpy", "pandas", "sklearn", "pdfplumber", "docx", "gdown", "youtubesearchpython", "pytesseract", "groq")
+
+
+def test_api_import_does_not_load_the_pyq_stack(tmp_path):
+    # Fresh interpreter: other tests may already have imported these
+    code = f"import sys, main; print(' '.join(m for m in {HEAVY!r} if m in sys.modules))"
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([os.path.join(ROOT, "api"), ROOT]))
+    proc = subprocess.run([sys.executable, "-c", code], cwd=tmp_path, env=env, capture_output=True, text=True)
+    assert proc.returncode == 0, proc.stderr[-2000:]
+    assert proc.stdout.split() == []
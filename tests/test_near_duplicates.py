@@ -0,0 +1,55 @@
+import pytest
+
+from near_duplicates import group, normalize, similarity, SIMILARITY_THRESHOLD
+
+
+DISTINCT = [
+    ("Explain 1NF.", "Explain 2NF."),
+    ("What is 1NF in database normalization?", "What is 2NF in database normalization?"),
+    ("Explain the TCP header format.", "Explain the UDP header format."),
+    ("Explain IPv4 addressing.", "Explain IPv6 addressing."),
+    ("Explain B tree.", "Explain B+ tree."),
+    ("What is C++?", "What is C#?"),
+    ("Explain deadlock.", "Explain deadlock prevention."),
+    ("What is it?", "Why is this so?"),
+]
+
+SAME = [
+    ("Explain TCP congestion control.", "Explain congestion control in TCP."),
+    ("Explain deadlock.", "Define deadlocks in detail. (5 marks)"),
+    ("Explain the working of TCP congestion control with slow start.",
+     "Explain TCP congestion control and slow start algorithm."),
+    ("Explain virtual memory and demand paging.", "Explain demand paging in virtual memory with a neat diagram."),
+]
+
+
+@pytest.mark.parametrize("a, b", DISTINCT)
+def test_distinct_questions_are_not_near_duplicates(a, b):
+    assert similarity(a, b) < SIMILARITY_THRESHOLD
+    assert len(group([a, b])) == 2
+
+
+@pytest.mark.parametrize("a, b", SAME)
+def test_rewordings_are_near_duplicates(a, b):
+    assert similarity(a, b) >= SIMILARITY_THRESHOLD
+    assert len(group([a, b])) == 1
+
+
+def test_normalize_keeps_language_symbols_and_drops_marks():
+    assert normalize("Q. Explain C++ & C# [10 Marks]") == "q explain c++ c#"
+    assert normalize("Compare B-tree and B+ tree.") == "compare b tree and b+ tree"
+
+
+def test_questions_without_words_are_never_merged():
+    texts = ["![Diagram](/static/images/a.png)", "![Diagram](/static/images/b.png)",
+             "![Diagram](/static/images/a.png)", "(5 marks)"]
+    assert [g["members"] for g in group(texts)] == [[0, 2], [1], [3]]
+
+
+def test_group_counts_and_canonical_wording():
+    texts = ["Explain paging.", "Explain deadlock.", "explain PAGING", "Explain paging!", "Define deadlocks."]
+    groups = group(texts)
+    assert [(g["text"], g["count"], g["members"]) for g in groups] == [
+        ("Explain paging.", 3, [0, 2, 3]),
+        ("Explain deadlock.", 2, [1, 4]),
+    ]
@@ -0,0 +1,108 @@
+import sqlite3
+
+import pytest
+
+from diagram_store import DiagramCollector
+from pyq_index import QuestionIndex
+
+
+def occurrence(text, document, year=None, source=None):
+    return {"text": text, "document": document, "source": source or f"{document}.pdf", "page": 1, "year": year}
+
+
+def group(text, *occurrences, topic="Networking", topic_id=0):
+    return {"text": text, "topic_id": topic_id, "topic": topic, "occurrences": list(occurrences)}
+
+
+@pytest.fixture
+def index(tmp_path):
+    return QuestionIndex(str(tmp_path / "pyq_index.db"))
+
+
+def test_add_counts_each_paper_once(index):
+    tcp = "Explain TCP congestion control."
+    assert index.add("Computer Networks", [group(tcp, occurrence(tcp, "a", 2019), occurrence(tcp, "b", 2020))]) == 2
+    # Re-analyzing the same papers adds nothing
+    assert index.add("Computer Networks", [group(tcp, occurrence(tcp, "a", 2019))]) == 0
+    [result] = index.search("congestion")
+    assert result["frequency"] == 2
+    assert result["years"] == [2019, 2020]
+    assert result["subject"] == "computer-networks"
+
+
+def test_rewording_joins_the_indexed_group(index):
+    index.add("cn", [group("Explain TCP congestion control.", occurrence("Explain TCP congestion control.", "a"))])
+    reworded = "Explain congestion control in TCP with a neat diagram."
+    index.add("cn", [group(reworded, occurrence(reworded, "b"))])
+    [result] = index.top(subject="cn")
+    assert (result["text"], result["frequency"], result["variants"]) == ("Explain TCP congestion control.", 2, 2)
+
+
+def test_distinct_short_questions_stay_apart(index):
+    for document, text in (("a", "Explain the TCP header format."), ("b", "Explain the UDP header format.")):
+        index.add("cn", [group(text, occurrence(text, document))])
+    assert sorted(r["text"] for r in index.top(subject="cn")) == [
+        "Explain the TCP header format.", "Explain the UDP header format."]
+
+
+def test_search_matches_every_word_with_stemming(index):
+    texts = ["Explain deadlock avoidance.", "Explain deadlock detection and recovery.", "Explain paging."]
+    index.add("os", [group(t, occurrence(t, str(i))) for i, t in enumerate(texts)])
+    assert [r["text"] for r in index.search("deadlocks recovery")] == ["Explain deadlock detection and recovery."]
+    assert len(index.search("deadlock")) == 2
+    assert index.search("deadlock", subject="dbms") == []
+    assert index.search('"') == []
+
+
+def test_top_orders_by_number_of_papers(index):
+    often, once = "Explain paging in memory management.", "Explain segmentation in memory management."
+    index.add("os", [group(often, occurrence(often, "a", 2018), occurrence(often, "b", 2019)),
+                     group(once, occurrence(once, "a", 2018), topic="Memory")])
+    assert [r["text"] for r in index.top(subject="os")] == [often, once]
+    assert [r["text"] for r in index.top(topic="memory")] == [once]
+    assert [r["text"] for r in index.top(year=2019)] == [often]
+    assert index.topics() == ["Networking", "Memory"]
+
+
+def test_indexed_diagrams_survive_garbage_collection(index, tmp_path):
+    text = "Explain the circuit shown. ![Diagram](/static/images/diagram_0123456789abcdef.png)"
+    index.add("ee", [group(text, occurrence(text, "a")), group("Explain Ohm's law.", occurrence("Explain Ohm's law.", "b"))])
+    assert list(index.diagram_refs()) == [text]
+
+    images = tmp_path / "images"
+    images.mkdir()
+    for name in ("diagram_0123456789abcdef.png", "diagram_fedcba9876543210.png"):
+        (images / name).write_bytes(b"png")
+    collector = DiagramCollector(str(images), grace_seconds=0)
+    collector.add_root(index.diagram_refs)
+    collector.collect()
+    assert sorted(p.name for p in images.iterdir()) == ["diagram_0123456789abcdef.png"]
+
+
+def test_keys_are_rebuilt_when_features_change(tmp_path):
+    path = str(tmp_path / "pyq_index.db")
+    text = "Explain B+ tree indexing."
+    QuestionIndex(path).add("dbms", [group(text, occurrence(text, "a"))])
+    conn = sqlite3.connect(path)
+    conn.execute("UPDATE questions SET key = 'stale'")
+    conn.execute("DELETE FROM buckets")
+    conn.execute("PRAGMA user_version = 1")
+    conn.commit()
+    conn.close()
+
+    index = QuestionIndex(path)
+    index.add("dbms", [group(text, occurrence(text, "b"))])
+    [result] = index.top(subject="dbms")
+    assert (result["frequency"], result["variants"]) == (2, 1)
+
+
+def test_results_are_assembled_in_a_fixed_number_of_queries(index):
+    texts = [f"Explain scheduling algorithm number {i} with an example." for i in range(30)]
+    index.add("os", [group(t, occurrence(t, f"paper-{i}", 2000 + i), topic=f"Topic {i}")
+                     for i, t in enumerate(texts)])
+    statements = []
+    index._connect().set_trace_callback(statements.append)
+    results = index.top(subject="os", limit=30)
+    assert len(results) == 30 and len(statements) == 3
+    assert {(r["text"], r["topic"], r["years"][0]) for r in results} == {
+        (t, f"Topic {i}", 2000 + i) for i, t in enumerate(texts)}
@@ -0,0 +1,123 @@
+import os
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from pyq_jobs import JobCancelled, PYQJob, PYQJobStore
+from scheduler import AdmissionError, FairScheduler
+
+
+def test_cancel_queued_job_is_final():
+    job = PYQJob("j", "u")
+    assert job.cancel()
+    assert job.status == "cancelled"
+    with pytest.raises(JobCancelled):
+        job.advance("extract")
+    job.finish("completed", {"analysis": []})
+    assert job.status == "cancelled" and job.result is None
+    assert not job.cancel()
+
+
+def test_cancel_running_job_stops_at_next_stage():
+    job = PYQJob("j", "u")
+    job.advance("extract", 1, 4)
+    assert job.cancel()
+    assert job.status == "cancelling"
+    with pytest.raises(JobCancelled):
+        job.advance("dedupe")
+    assert job.status == "cancelling"
+    job.finish("cancelled")
+    assert job.status == "cancelled"
+
+
+def test_cancel_is_never_overwritten_by_advance():
+    job = PYQJob("j", "u")
+    job.advance("extract")
+    cancelled = []
+
+    class CancelRightAfterCheck(threading.Event):
+        """Lands a cancel() right after advance() has read the flag, like an unlucky request would."""
+        def is_set(self):
+            flag = super().is_set()
+            if not cancelled:
+                canceller = threading.Thread(target=lambda: cancelled.append(job.cancel()))
+                canceller.start()
+                canceller.join(0.2)  # blocks only if advance() holds the lock while deciding
+            return flag
+
+    job._cancelled = CancelRightAfterCheck()
+    job.advance("topics", 0, 3)
+    for _ in range(100):
+        if cancelled:
+            break
+        threading.Event().wait(0.02)
+    assert cancelled == [True]
+    assert job.status == "cancelling"
+
+
+def test_snapshot_returns_sections_after_since():
+    job = PYQJob("j", "u")
+    job.advance("topics", 0, 2)
+    section = {"topic_id": 0, "questions": []}
+    job.publish(section)
+    section["questions"].append("edited after publishing")
+    job.publish({"topic_id": 1, "questions": []})
+    state = job.snapshot(since=0)
+    assert [s["seq"] for s in state["sections"]] == [1, 2]
+    assert state["sections"][0]["topic"]["questions"] == []
+    assert state["progress"] == {"done": 2, "total": 2}
+    assert [s["seq"] for s in job.snapshot(since=1)["sections"]] == [2]
+    assert job.snapshot(since=5)["sections"] == [] and job.snapshot(since=5)["next"] == 2
+
+
+def test_finished_jobs_expire():
+    store = PYQJobStore(ttl=0)
+    job = store.create("u")
+    assert store.get(job.id) is job
+    job.finish("completed", {})
+    store.create("u")
+    assert store.get(job.id) is None
+
+
+def test_scheduler_cancel_frees_queue_slot_and_quota():
+    scheduler = FairScheduler(max_workers=1, max_queue_depth=10, max_jobs_per_user=2)
+    running, release = threading.Event(), threading.Event()
+    scheduler.submit("a", "u", 1.0, lambda: (running.set(), release.wait(10)))
+    assert running.wait(10)
+    ran = []
+    scheduler.submit("b", "u", 1.0, ran.append, "b")
+    with pytest.raises(AdmissionError):
+        scheduler.submit("c", "u", 1.0, ran.append, "c")
+    assert scheduler.cancel("b")
+    assert not scheduler.cancel("a")  # running jobs are not dropped
+    scheduler.submit("c", "u", 1.0, ran.append, "c")
+    release.set()
+    for _ in range(200):
+        if ran:
+            break
+        threading.Event().wait(0.02)
+    assert ran == ["c"] and scheduler.queue_depth() == 0
+
+
+def test_delete_queued_pyq_job_releases_slot_and_uploads(main):
+    client = TestClient(main.app)
+    release = threading.Event()
+    # Keep every worker busy so the PYQ job stays queued
+    for i in range(main.scheduler.max_workers):
+        main.scheduler.submit(f"busy-{i}", f"other-{i}", 0.01, release.wait, 10)
+    try:
+        response = client.post("/analyze/pyq", files={"files": ("p.txt", b"1. Explain paging in detail.", "text/plain")},
+                               data={"answers": "lazy"}).json()
+        job_id = response["job_id"]
+        assert response["status"] == "queued" and main.scheduler.position(job_id) == 1
+        uploads = [n for n in os.listdir(main.UPLOAD_FOLDER) if n.startswith("pyq_")]
+        assert uploads
+
+        assert client.delete(f"/analyze/pyq/{job_id}").json() == {"job_id": job_id, "status": "cancelled"}
+        assert main.scheduler.position(job_id) is None
+        assert not any(os.path.exists(os.path.join(main.UPLOAD_FOLDER, n)) for n in uploads)
+        assert client.delete(f"/analyze/pyq/{job_id}").status_code == 409
+        assert client.get(f"/analyze/pyq/{job_id}").json()["status"] == "cancelled"
+    finally:
+        release.set()
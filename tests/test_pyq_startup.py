@@ -0,0 +1,37 @@
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+import resource_lookup
+
+
+def test_startup_builds_no_analyzer_and_searches_nothing(main, monkeypatch):
+    searches = []
+    monkeypatch.setattr(main, "_pyq_analyzer", None)
+    monkeypatch.setattr(resource_lookup.lookup, "backend", lambda query: searches.append(query) or [])
+    with TestClient(main.app):
+        pass
+    main.diagram_collector.referenced()  # every GC root, including the PYQ ones
+    assert main._pyq_analyzer is None
+    assert searches == []
+
+
+def test_analyzer_is_built_once_under_concurrency(main, monkeypatch):
+    built = []
+
+    class SlowAnalyzer:
+        def __init__(self):
+            time.sleep(0.05)
+            built.append(self)
+
+    monkeypatch.setattr(main, "_pyq_analyzer", None)
+    monkeypatch.setattr(main, "PYQAnalyzer", SlowAnalyzer)
+    seen = []
+    threads = [threading.Thread(target=lambda: seen.append(main.get_pyq_analyzer())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(built) == 1
+    assert all(analyzer is built[0] for analyzer in seen)
@@ -0,0 +1,61 @@
+from question_segmenter import QuestionSegmenter, segment, year_from_name
+
+
+def lines_of(text, page=1):
+    return [(page, line) for line in text.splitlines()]
+
+
+def test_numbered_and_starter_lines_start_questions():
+    questions = list(segment(lines_of(
+        "1. Explain the working of a two-phase commit\n"
+        "protocol with an example.\n"
+        "Q2: Define normalization and its forms.\n"
+        "Describe the ACID properties of transactions.")))
+    assert [q["text"] for q in questions] == [
+        "Explain the working of a two-phase commit protocol with an example.",
+        "Define normalization and its forms.",
+        "Describe the ACID properties of transactions.",
+    ]
+
+
+def test_questions_keep_source_and_page():
+    questions = list(segment([(1, "1. Explain paging in memory management."),
+                              (2, "2. What is thrashing in virtual memory?")], source="os.pdf"))
+    assert [(q["source"], q["page"]) for q in questions] == [("os.pdf", 1), ("os.pdf", 2)]
+
+
+def test_year_from_header_before_first_question():
+    questions = list(segment(lines_of(
+        "B.Tech 5th Semester Examination, December 2019\n"
+        "1. Explain the working of a unit test written\n"
+        "in the year 1998 for a legacy compiler.\n"
+        "2. What is a test oracle in software testing?")))
+    assert [q["year"] for q in questions] == [2019, 2019]
+
+
+def test_year_mentioned_inside_question_text_is_ignored():
+    questions = list(segment(lines_of(
+        "1. Explain the working of a unit test\n"
+        "written in the year 1998 for a legacy compiler.\n"
+        "2. Discuss the term test of a project started in May 2001\n"
+        "during the exam session 2003 of the team.")))
+    assert [q["year"] for q in questions] == [None, None]
+
+
+def test_page_header_starts_a_new_paper():
+    lines = lines_of("Mid-Term Exam 2018\n1. Explain the working of a semaphore.", page=1)
+    lines += lines_of("End-Term Examination 2020\n2. Explain deadlock avoidance with banker's algorithm.", page=2)
+    assert [q["year"] for q in segment(lines)] == [2018, 2020]
+
+
+def test_year_from_filename_wins():
+    assert year_from_name("papers/dbms_2017.pdf") == 2017
+    segmenter = QuestionSegmenter("dbms_2017.pdf")
+    segmenter.feed("Semester Examination 2019")
+    segmenter.feed("1. Define a candidate key in a relation.")
+    assert segmenter.close()["year"] == 2017
+
+
+def test_short_noise_is_dropped():
+    assert list(segment(lines_of("1. Why?\n2. Explain the role of an index."))) == [
+        {"text": "Explain the role of an index.", "source": None, "page": 1, "year": None}]
@@ -0,0 +1,119 @@
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from scheduler import AdmissionError, FairScheduler, parse_weights
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.fixture
+def blocked():
+    """A one-worker scheduler whose worker is busy until the test releases it."""
+    scheduler = FairScheduler(max_workers=1, max_queue_depth=10, max_jobs_per_user=3)
+    running, release = threading.Event(), threading.Event()
+    scheduler.submit("blocker", "blocker", 0.01, lambda: (running.set(), release.wait(10)))
+    assert running.wait(5)
+    yield scheduler, release
+    release.set()
+
+
+def run_order(scheduler, release, submissions):
+    ran = []
+    for job_id, user, cost in submissions:
+        scheduler.submit(job_id, user, cost, ran.append, job_id)
+    release.set()
+    assert wait_until(lambda: len(ran) == len(submissions))
+    return ran
+
+
+def test_one_users_burst_does_not_starve_another(blocked):
+    scheduler, release = blocked
+    ran = run_order(scheduler, release, [("a1", "a", 1.0), ("a2", "a", 1.0), ("a3", "a", 1.0), ("b1", "b", 1.0)])
+    assert ran.index("b1") == 1
+
+
+def test_cheap_jobs_overtake_expensive_ones(blocked):
+    scheduler, release = blocked
+    assert run_order(scheduler, release, [("video", "a", 50.0), ("text", "b", 1.0)]) == ["text", "video"]
+
+
+def test_weights_give_a_larger_share(blocked):
+    scheduler, release = blocked
+    scheduler.user_weights = {"heavy": 2.0}
+    ran = run_order(scheduler, release, [("h1", "heavy", 1.0), ("h2", "heavy", 1.0),
+                                         ("l1", "light", 1.0), ("l2", "light", 1.0)])
+    # Unweighted this would alternate h1, l1, h2, l2
+    assert ran == ["h1", "h2", "l1", "l2"]
+
+
+def test_position_follows_dispatch_order(blocked):
+    scheduler, _ = blocked
+    scheduler.submit("slow", "a", 10.0, print)
+    scheduler.submit("fast", "b", 1.0, print)
+    assert [scheduler.position("fast"), scheduler.position("slow"), scheduler.position("blocker")] == [1, 2, None]
+
+
+def test_admission_limits_and_retry_after(blocked):
+    scheduler, _ = blocked
+    scheduler.max_queue_depth = 4
+    for i in range(3):
+        scheduler.submit(f"u{i}", "u", 1.0, print)
+    with pytest.raises(AdmissionError) as quota:
+        scheduler.check_admission("u")
+    assert "3 jobs" in quota.value.reason and quota.value.retry_after >= 1
+    scheduler.submit("v0", "v", 1.0, print)
+    with pytest.raises(AdmissionError) as full:
+        scheduler.submit("w0", "w", 1.0, print)
+    assert "busy" in full.value.reason
+    assert 1 <= full.value.retry_after <= 600
+
+
+def test_cancel_frees_the_users_quota(blocked):
+    scheduler, release = blocked
+    for i in range(3):
+        scheduler.submit(f"u{i}", "u", 1.0, print)
+    assert scheduler.cancel("u1") and not scheduler.cancel("u1")
+    assert not scheduler.cancel("blocker")
+    scheduler.check_admission("u")
+    assert scheduler.queue_depth() == 2 and scheduler.position("u2") == 2
+
+
+def test_finish_tags_of_idle_users_are_forgotten(blocked):
+    scheduler, release = blocked
+    scheduler.max_queue_depth = 100
+    for i in range(50):
+        scheduler.submit(f"j{i}", f"user-{i}", 1.0, print)
+    assert len(scheduler._last_finish) == 51
+    release.set()
+    assert wait_until(lambda: scheduler.queue_depth() == 0 and scheduler.active() == 0)
+    assert wait_until(lambda: not scheduler._last_finish)
+
+
+def test_parse_weights():
+    assert parse_weights("") == {}
+    assert parse_weights("teacher@example.com=2, anon:10.0.0.5=0.5") == {
+        "teacher@example.com": 2.0, "anon:10.0.0.5": 0.5}
+    for spec in ("teacher", "teacher=0", "=2", "teacher=fast"):
+        with pytest.raises(ValueError):
+            parse_weights(spec)
+
+
+def test_saturated_endpoint_returns_429_with_retry_after(main):
+    client = TestClient(main.app)
+    release = threading.Event()
+    for i in range(main.scheduler.max_jobs_per_user):
+        main.scheduler.submit(f"quota-{i}", "anon:testclient", 1.0, release.wait, 10)
+    try:
+        response = client.post("/process/text", data={"text": "Paging divides memory into frames."})
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) >= 1
+    finally:
+        release.set()
@@ -0,0 +1,67 @@
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+from singleflight import SingleFlight
+
+
+def test_followers_attach_to_leader_until_finish():
+    flight = SingleFlight()
+    assert flight.join("text:a", "t1") is None
+    assert flight.join("text:a", "t2") == "t1"
+    assert flight.join("text:b", "t3") is None
+    assert flight.in_flight() == 2
+    assert flight.finish("text:a", "t1") == ["t2"]
+    assert flight.join("text:a", "t4") is None  # key released: a new run starts
+
+
+def test_finish_by_stale_leader_keeps_new_leader():
+    flight = SingleFlight()
+    flight.join("k", "t1")
+    flight.finish("k", "t1")
+    flight.join("k", "t2")
+    assert flight.finish("k", "t1") == []
+    assert flight.join("k", "t3") == "t2"
+
+
+def _wait_for(predicate, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_delete_running_leader_then_resubmit(main, monkeypatch):
+    started, release = threading.Event(), threading.Event()
+
+    def process_lecture(source_type, data, target_lang="en"):
+        started.set()
+        release.wait(10)
+        return {"transcript": "a b c", "notes": "", "qa": [], "quiz": [], "flashcards": [], "language": "en"}
+
+    monkeypatch.setattr(main.processor, "process_lecture", process_lecture)
+    client = TestClient(main.app)
+    text = "Delete me while I am still being processed."
+
+    leader = client.post("/process/text", data={"text": text}).json()
+    assert not leader["coalesced"]
+    assert started.wait(10)
+    assert client.delete(f"/history/{leader['task_id']}").status_code == 200
+
+    follower = client.post("/process/text", data={"text": text}).json()
+    assert follower["coalesced"]
+    release.set()
+
+    status = lambda: client.get(f"/tasks/{follower['task_id']}").json()["status"]
+    assert _wait_for(lambda: status() == "completed")
+    assert _wait_for(lambda: main.inflight.in_flight() == 0)
+
+    # The source key was released, so the next submission runs again
+    started.clear()
+    again = client.post("/process/text", data={"text": text}).json()
+    assert not again["coalesced"]
+    assert started.wait(10)
+    assert _wait_for(lambda: client.get(f"/tasks/{again['task_id']}").json()["status"] == "completed")
@@ -0,0 +1,31 @@
+import os
+import pickle
+
+import pytest
+
+from topic_model import N_TOPICS, SubjectTopicModel, TopicModelStore
+
+QUESTIONS = [f"Explain {word} scheduling in operating systems." for word in
+             ("round robin", "priority", "lottery", "fair share", "multilevel", "real time",
+              "deadline", "gang", "rate monotonic", "earliest deadline")]
+
+
+@pytest.mark.parametrize("payload", [
+    b"cmoved_module\nSubjectTopicModel\n.",  # class moved or renamed since the pickle was written
+    b"not a pickle at all",
+    b"",
+])
+def test_unreadable_model_is_replaced(tmp_path, payload, capsys):
+    store = TopicModelStore(str(tmp_path))
+    with open(os.path.join(tmp_path, "os.pkl"), "wb") as f:
+        f.write(payload)
+    assert len(store.update("OS", QUESTIONS)) == len(QUESTIONS)
+    assert "starting fresh" in capsys.readouterr().out
+    with open(os.path.join(tmp_path, "os.pkl"), "rb") as f:
+        assert isinstance(pickle.load(f), SubjectTopicModel)
+
+
+def test_topics_survive_a_reload(tmp_path):
+    assert len(QUESTIONS) >= N_TOPICS
+    topics = TopicModelStore(str(tmp_path)).update("OS", QUESTIONS)
+    assert TopicModelStore(str(tmp_path)).update("OS", QUESTIONS) == topics
@@ -0,0 +1,58 @@
+import json
+import re
+
+import processor
+
+
+def fake_llm(max_chars):
+    """An LLM that 'translates' by upper-casing, cutting its reply off after `max_chars` like a token cap."""
+    calls = []
+
+    def llm(prompt, system="", max_tokens=4096, task="generic"):
+        strings = json.loads(re.search(r"\[.*\]", prompt, re.DOTALL).group())
+        calls.append(len(strings))
+        return json.dumps([s.upper() for s in strings], ensure_ascii=False)[:max_chars]
+    return llm, calls
+
+
+def lecture(n_cards=40, notes_lines=200):
+    return {
+        "notes": "\n".join(f"- point {i} about the lecture topic" for i in range(notes_lines)),
+        "qa": [], "quiz": [],
+        "flashcards": [{"front": f"term {i}", "back": f"definition number {i} of the term"} for i in range(n_cards)],
+    }
+
+
+def test_batches_are_smaller_for_scripts_that_need_more_tokens():
+    assert processor.translation_batch_chars("ta") < processor.translation_batch_chars("hi") \
+        < processor.translation_batch_chars("fr") == processor.TRANSLATION_BATCH_CHARS
+    assert processor.translation_batch_chars("xx") == processor.translation_batch_chars("ta")
+
+
+def test_long_fields_split_at_line_breaks_and_rejoin():
+    text = "\n".join(f"line {i}" for i in range(500)) + "\n\n"
+    pieces = processor._pieces(text, 300)
+    assert len(pieces) > 1 and all(len(p) <= 310 for p in pieces)
+    assert "\n".join(pieces) == text
+
+
+def test_truncated_batches_are_split_and_retried(monkeypatch):
+    llm, calls = fake_llm(max_chars=1600)
+    monkeypatch.setattr(processor, "_llm", llm)
+    result = lecture()
+    translated = processor.translate_result(result, "ta")
+    assert "translation_incomplete" not in translated
+    assert translated["notes"] == result["notes"].upper()
+    assert translated["flashcards"][7]["back"] == "DEFINITION NUMBER 7 OF THE TERM"
+    assert result["notes"] != translated["notes"]  # original untouched
+    units = len(processor._pieces(result["notes"], processor.translation_batch_chars("ta"))) + 2 * 40
+    assert sum(calls) > units  # some batch was cut off and sent again in halves
+
+
+def test_strings_that_never_fit_are_left_untranslated(monkeypatch):
+    llm, _ = fake_llm(max_chars=20)
+    monkeypatch.setattr(processor, "_llm", llm)
+    translated = processor.translate_result({"notes": "x" * 100, "flashcards": [{"front": "a", "back": "b"}]}, "hi")
+    assert translated["translation_incomplete"]
+    assert translated["notes"] == "x" * 100
+    assert translated["flashcards"][0] == {"front": "A", "back": "B"}